@@ -1,13 +1,34 @@
-from flask import Flask, request, url_for, render_template, redirect, send_file
+from flask import Flask, Request, request, url_for, render_template, redirect, send_file, jsonify
 import pandas as pd
+from pandas.io.parsers import TextParser
 import numpy as np
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
 import os
+import io
+import json
+import zipfile
+import uuid
+import hashlib
+import shutil
+import time
 import tempfile
-from datetime import datetime
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, date
 import re
+import argparse
 from werkzeug.utils import secure_filename
 
+# Use the faster calamine engine to read workbooks when it is installed and pandas supports it (pandas 2.2+)
+try:
+    import python_calamine
+    EXCEL_ENGINE = 'calamine' if tuple(int(part) for part in pd.__version__.split('.')[:2]) >= (2, 2) else None
+except ImportError:
+    EXCEL_ENGINE = None
+
 app = Flask(__name__)
 UPLOAD_FOLDER = 'uploads'
 
@@ -15,3215 +36,2433 @@ if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# Larger uploads are refused with 413 before they are read
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('GST_MAX_UPLOAD_BYTES', 256 * 1024 ** 2))
 
-def process_step1(file_path):
-    xls = pd.ExcelFile(file_path)
-    
-    df1 = pd.read_excel(xls, sheet_name="Outward supply")
-    df2 = pd.read_excel(xls, sheet_name="Doc. Series")
-    df3 = pd.read_excel(xls, sheet_name="Amendments(Invoices)")
-    df4 = pd.read_excel(xls, sheet_name="Debit&CreditNotes")
-    df5 = pd.read_excel(xls, sheet_name="Amendments (CDN)")
-    df6 = pd.read_excel(xls, sheet_name="Advances")
-    df7 = pd.read_excel(xls, sheet_name="Amendment(Advances)")
-
-    # -------------------------------------------* Processing of Doc. Series Sheet *----------------------------------------------------
-    
+# Every job works in its own folder under uploads/jobs/<job id>, with the uploaded files in input/ and the processed
+# workbook in output/, so concurrent jobs never share a file whatever the uploads are called
+JOB_FOLDER = os.path.join(UPLOAD_FOLDER, 'jobs')
+# Job folders (and their results) are removed once they have not been updated for this many seconds
+JOB_TTL = int(os.environ.get('GST_JOB_TTL', 24 * 60 * 60))
+
+if not os.path.exists(JOB_FOLDER):
+    os.makedirs(JOB_FOLDER)
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# -------------------------------------------* Columnar sheet bundles *----------------------------------------------------
+
+# Every stage can also save its sheets as Parquet or Arrow IPC tables in one zip next to the xlsx (set
+# GST_INTERMEDIATE_FORMAT to parquet or arrow, pyarrow is needed). The bundles are accepted as input by the next
+# stage, so chained runs keep their dtypes and skip Excel parsing.
+INTERMEDIATE_FORMATS = {'parquet': '.parquet.zip', 'arrow': '.arrow.zip'}
+INTERMEDIATE_FORMAT = os.environ.get('GST_INTERMEDIATE_FORMAT') or None
+
+if INTERMEDIATE_FORMAT is not None and INTERMEDIATE_FORMAT not in INTERMEDIATE_FORMATS:
+    raise ValueError(f"GST_INTERMEDIATE_FORMAT should be one of {', '.join(INTERMEDIATE_FORMATS)}")
+
+# Object columns holding only these kinds of values are stored as they are, other object columns (for example
+# document numbers mixing numbers and text) are stored as JSON text so every value comes back with its own type
+NATIVE_OBJECT_TYPES = ('string', 'empty', 'boolean', 'date')
+
+def intermediate_path(file_path, format):
+    return os.path.splitext(file_path)[0] + INTERMEDIATE_FORMATS[format]
+
+def is_intermediate(file_path):
+    return file_path.endswith(tuple(INTERMEDIATE_FORMATS.values()))
+
+# Name of an uploaded file without its extension (.xlsx or the bundle suffix)
+def upload_stem(filename):
+    for suffix in INTERMEDIATE_FORMATS.values():
+        if filename.endswith(suffix):
+            return filename[:-len(suffix)]
+    return os.path.splitext(filename)[0]
+
+# Function to convert a value of a mixed column to JSON text (None for blanks) and back
+def encode_value(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, datetime):
+        return json.dumps({'datetime': value.isoformat()})
+    if isinstance(value, date):
+        return json.dumps({'date': value.isoformat()})
+    if isinstance(value, (str, bool, int, float)):
+        return json.dumps(value)
+    return json.dumps(str(value))
+
+def decode_value(text):
+    if text is None:
+        return np.nan
+    value = json.loads(text)
+    if isinstance(value, dict):
+        if 'datetime' in value:
+            return datetime.fromisoformat(value['datetime'])
+        return date.fromisoformat(value['date'])
+    return value
+
+# Write the (sheet name, DataFrame) pairs to a bundle: one table per sheet, with columns stored by position and the
+# sheet names, column names and JSON encoded columns listed in sheets.json
+def write_intermediate(file_path, sheets, format):
+    manifest = []
+    with zipfile.ZipFile(file_path + '.tmp', 'w') as bundle:
+        for index, (sheet_name, df) in enumerate(sheets):
+            table = df.reset_index(drop=True)
+            table.columns = [str(position) for position in range(len(df.columns))]
+            encoded = []
+            for column in table.columns:
+                # Categories are stored as their values, like in the workbook, each stage applies its own schema
+                if isinstance(table[column].dtype, pd.CategoricalDtype):
+                    table[column] = table[column].astype(object)
+                if table[column].dtype == object and pd.api.types.infer_dtype(table[column], skipna=True) not in NATIVE_OBJECT_TYPES:
+                    table[column] = table[column].map(encode_value)
+                    encoded.append(column)
+
+            buffer = io.BytesIO()
+            if format == 'parquet':
+                table.to_parquet(buffer, index=False)
+            else:
+                table.to_feather(buffer)
+            table_name = f"{index}.{format}"
+            bundle.writestr(table_name, buffer.getvalue())
+            manifest.append({'sheet': sheet_name, 'table': table_name, 'encoded': encoded,
+                             'columns': [encode_value(column) for column in df.columns]})
+        bundle.writestr('sheets.json', json.dumps(manifest))
+    os.replace(file_path + '.tmp', file_path)
+
+# Headers made unique the way read_excel does it, repeats get a ".1", ".2", ... suffix
+def unique_headers(headers):
+    headers = list(headers)
+    counts = {}
+    for position, header in enumerate(headers):
+        count = counts.get(header, 0)
+        while count > 0:
+            counts[header] = count + 1
+            header = f"{header}.{count}"
+            count = counts.get(header, 0)
+        headers[position] = header
+        counts[header] = count + 1
+    return headers
+
+# Read the named sheets of a bundle, by sheet name. Headers are made unique as in the workbook, and with `columns`
+# (headers by sheet name) only those columns of a sheet are read.
+def read_intermediate(file_path, sheet_names, nrows=None, columns=None):
+    sheets = {}
+    with zipfile.ZipFile(file_path) as bundle:
+        manifest = {entry['sheet']: entry for entry in json.loads(bundle.read('sheets.json'))}
+        for sheet_name in sheet_names:
+            if sheet_name not in manifest:
+                raise ValueError(f"Worksheet named '{sheet_name}' not found")
+            entry = manifest[sheet_name]
+            headers = unique_headers(decode_value(column) for column in entry['columns'])
+            wanted = columns.get(sheet_name) if columns else None
+            positions = list(range(len(headers))) if wanted is None else [
+                position for position, header in enumerate(headers) if header in wanted]
+            stored = None if wanted is None else [str(position) for position in positions]
+            buffer = io.BytesIO(bundle.read(entry['table']))
+            if entry['table'].endswith('.parquet'):
+                table = pd.read_parquet(buffer, columns=stored)
+            else:
+                table = pd.read_feather(buffer, columns=stored)
+            if nrows is not None:
+                table = table.iloc[:nrows]
+            for column in table.columns:
+                if column in entry['encoded']:
+                    table[column] = table[column].map(decode_value)
+                elif table[column].dtype == object:
+                    # Blanks come back as None, Excel sheets give NaN
+                    table[column] = table[column].where(table[column].notna(), np.nan)
+            table.columns = [headers[position] for position in positions]
+            sheets[sheet_name] = table
+    return sheets
+
+# -------------------------------------------* Workbook reading *----------------------------------------------------
+
+# Read all the needed sheets of a workbook in a single pass over the file. Sheets are cached for the call, so a sheet
+# asked for twice is parsed once (later requests get a copy so changing one DataFrame never changes the other).
+# With `columns` (headers by sheet name) only those columns of the sheets it names are parsed.
+def read_sheets(file_path, sheet_names, nrows=None, columns=None):
+    if is_intermediate(file_path):
+        cache = read_intermediate(file_path, list(dict.fromkeys(sheet_names)), nrows=nrows, columns=columns)
+    elif columns is None:
+        cache = pd.read_excel(file_path, sheet_name=list(dict.fromkeys(sheet_names)), nrows=nrows, engine=EXCEL_ENGINE)
+    else:
+        cache = {}
+        with pd.ExcelFile(file_path, engine=EXCEL_ENGINE) as workbook:
+            for sheet_name in dict.fromkeys(sheet_names):
+                wanted = columns.get(sheet_name)
+                cache[sheet_name] = workbook.parse(sheet_name, nrows=nrows,
+                                                   usecols=None if wanted is None else lambda header: header in wanted)
+    sheets = []
+    for index, sheet_name in enumerate(sheet_names):
+        if sheet_name in sheet_names[:index]:
+            sheets.append(cache[sheet_name].copy())
+        else:
+            sheets.append(cache[sheet_name])
+    return sheets
+
+# -------------------------------------------* Sheet schemas *----------------------------------------------------
+
+# Values the status columns of the input templates are filled in with
+RECIPIENT_STATUSES = ['Registered', 'Unregistered']
+SUPPLY_TYPES = ['Regular', 'Regular B2B', 'Employee recoveries', 'SEZ supplies with payment', 'SEZ supplies without payment',
+                'Export with payment', 'Export without payment', "Export Oriented Unit ('EOU')", 'Advance Authorization Holder',
+                'EPCG license holder', 'Merchant exporter', 'Free Sample/Supply', 'ISD (For transfer of ITC)', 'UIN',
+                'Highseas sale', 'Sale from Bonded WH', 'Sales of motor vehicle in loss', 'Sale of MEIS Scripts']
+TAXABILITIES = ['Taxable', 'Exempt', 'Nil-rated', 'Non-GST', 'Taxable + Exempt/Nil-rated/Non-GST']
+NOTE_TYPES = ['Credit note', 'Debit note']
+
+# Declared type of the columns of the step 1 sheets, by header (categories list the values each column is filled in with). Document numbers, GSTINs and HSNs are left as entered:
+# an HSN typed as a number is checked (and written back) differently from one typed as text.
+SHEET_SCHEMAS = {
+    'Outward supply': {
+        'category': {'Status of recipient': RECIPIENT_STATUSES, 'Type of supply': SUPPLY_TYPES, 'Taxability': TAXABILITIES},
+        'number': ['Quantity', 'GST Rate (%)', 'Taxable Value (Rs.)', 'IGST \n(Rs.)', 'CGST \n(Rs.)', 'SGST/UTGST \n(Rs.)',
+                   'Cess Amount\n(Rs.)', 'Invoice value (Rs.)', 'Taxable value (Rs.) [as per shipping bill] ',
+                   'IGST (Rs.) \n[as per shipping bill] '],
+        'date': ['Document date', 'Shipping bill date', 'Receipt voucher date'],
+    },
+    'Amendments(Invoices)': {
+        'category': {'Original status of recipient': RECIPIENT_STATUSES, 'Original type of supply': SUPPLY_TYPES,
+                     'Original taxability': TAXABILITIES, 'Revised status of recipient': RECIPIENT_STATUSES,
+                     'Revised type of supply': SUPPLY_TYPES, 'Revised Taxability': TAXABILITIES},
+        'number': ['Revised Quantity', 'Revised rate (%)', 'Revised taxable Value (Rs.)', 'Revised IGST \n(Rs.)',
+                   'Revised CGST \n(Rs.)', 'Revised SGST/UTGST \n(Rs.)', 'Revised Cess Amount\n(Rs.)', 'Revised Invoice value (Rs.)',
+                   'Revised Taxable value (Rs.) [as per shipping bill] ', 'Revised IGST (Rs.) \n[as per shipping bill] '],
+        'date': ['Original document date', 'Revised document date', 'Revised shipping bill date'],
+    },
+    'Debit&CreditNotes': {
+        'category': {'Status of recipient': RECIPIENT_STATUSES, 'Type of supply': SUPPLY_TYPES, 'Taxability': TAXABILITIES,
+                     'Note type': NOTE_TYPES},
+        'number': ['Quantity', 'Rate (%)', 'Taxable Value (Rs.)', 'IGST \n(Rs.)', 'CGST \n(Rs.)', 'SGST/UTGST \n(Rs.)',
+                   'Cess \n(Rs.)', 'Invoice value (Rs.)'],
+        'date': ['Document date', 'Note date'],
+    },
+    'Amendments (CDN)': {
+        'category': {'Original status of recipient': RECIPIENT_STATUSES, 'Original type of supply': SUPPLY_TYPES,
+                     'Original taxability': TAXABILITIES, 'Original note type': NOTE_TYPES, 'Revised note type': NOTE_TYPES},
+        'number': ['Revised Quantity', 'Revised rate (%)', 'Taxable Value (Rs.)', 'IGST \n(Rs.)', 'CGST \n(Rs.)', 'SGST \n(Rs.)',
+                   'Cess\n(Rs.)', 'Invoice value (Rs.)'],
+        'date': ['Original document date', 'Original note date', 'Revised document date', 'Revised note date'],
+    },
+    'Advances': {
+        'category': {'Status of recipient': RECIPIENT_STATUSES, 'Type of supply': SUPPLY_TYPES, 'Taxability': TAXABILITIES},
+        'number': ['GST Rate(%)', 'Taxable Value (Rs.)', 'IGST \n(Rs.)', 'CGST \n(Rs.)', 'SGST/UTGST \n(Rs.)',
+                   'Cess Amount\n(Rs.)', 'Receipt voucher value (Rs.)'],
+        'date': ['Receipt voucher date', 'Document date'],
+    },
+    'Amendment(Advances)': {
+        'category': {'Original status of recipient': RECIPIENT_STATUSES, 'Original type of supply': SUPPLY_TYPES,
+                     'Original taxability': TAXABILITIES, 'Revised status of recipient': RECIPIENT_STATUSES,
+                     'Revised type of supply': SUPPLY_TYPES, 'Revised taxability': TAXABILITIES},
+        'number': ['Revised GST rate(%)', 'Revised taxable Value (Rs.)', 'Revised IGST \n(Rs.)', 'Revised CGST \n(Rs.)',
+                   'Revised SGST \n(Rs.)', 'Revised Cess\n(Rs.)', 'Revised receipt voucher  value (Rs.)'],
+        'date': ['Original document date', 'Revised receipt voucher date'],
+    },
+}
+
+# Categorical of text values over a fixed set of categories, extended with any other value found so nothing is lost.
+# Categories are kept in sorted order so sorting and grouping give the same order as on the plain text.
+def categorical(values, categories):
+    values = pd.Series(values)
+    return pd.Categorical(values, categories=sorted(set(categories).union(values.dropna())))
+
+# Values (as pandas infers them) a column may hold to be given each type, and the conversion
+SCHEMA_TYPES = {
+    'category': (('string',), lambda column, categories: pd.Series(categorical(column, categories), index=column.index, name=column.name)),
+    'number': (('integer', 'floating', 'mixed-integer-float', 'empty'), lambda column, _: pd.to_numeric(column)),
+    'date': (('datetime', 'datetime64', 'empty'), lambda column, _: pd.to_datetime(column)),
+}
+
+# Give the columns of a sheet their declared type once, as soon as the sheet is loaded. Only text columns whose every
+# filled cell fits the type are converted, so nothing written back changes and a column holding, say, text in an
+# amount is kept as it was read for the checks to report it. Repeated headers are all converted.
+def apply_schema(df, sheet):
+    types = {column: (kind, columns[column] if isinstance(columns, dict) else None)
+             for kind, columns in SHEET_SCHEMAS[sheet].items() for column in columns}
+    columns = {}
+    for position, name in enumerate(df.columns):
+        column = df.iloc[:, position]
+        kind, categories = types.get(name, (None, None))
+        if kind and column.dtype == object:
+            inferred, convert = SCHEMA_TYPES[kind]
+            if pd.api.types.infer_dtype(column, skipna=True) in inferred:
+                column = convert(column, categories)
+        columns[position] = column
+    typed = pd.DataFrame(columns, index=df.index)
+    typed.columns = df.columns
+    return typed
+
+# -------------------------------------------* Workbook writing *----------------------------------------------------
+
+# Same header look as pandas' to_excel: bold, thin border, centred
+HEADER_FONT = Font(bold=True)
+HEADER_BORDER = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+HEADER_ALIGNMENT = Alignment(horizontal='center', vertical='top')
+
+# Function to convert a DataFrame value to what is written in the cell (blank for NaN/NaT)
+def cell_value(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+# Write the (sheet name, DataFrame) pairs to a workbook in write-only mode. Rows are streamed to the file sheet by
+# sheet, so the output workbook is never built in memory the way pd.ExcelWriter(engine='openpyxl') builds it.
+# With an intermediate format the same sheets are saved as a columnar bundle next to the workbook.
+def write_sheets(file_path, sheets, intermediate_format=INTERMEDIATE_FORMAT):
+    workbook = Workbook(write_only=True)
+    for sheet_name, df in sheets:
+        worksheet = workbook.create_sheet(sheet_name)
+        header = []
+        for column in df.columns:
+            cell = WriteOnlyCell(worksheet, value=cell_value(column))
+            cell.font = HEADER_FONT
+            cell.border = HEADER_BORDER
+            cell.alignment = HEADER_ALIGNMENT
+            header.append(cell)
+        if header:
+            worksheet.append(header)
+        for row in df.itertuples(index=False, name=None):
+            worksheet.append([cell_value(value) for value in row])
+    workbook.save(file_path)
+    if intermediate_format:
+        write_intermediate(intermediate_path(file_path, intermediate_format), sheets, intermediate_format)
+
+# -------------------------------------------* Vectorized check helpers *----------------------------------------------------
+
+# Evaluate a check declared as an ordered list of (condition, result) rules over the whole DataFrame at once.
+# A condition is a boolean mask (or a function of the DataFrame returning one) and a result is a constant,
+# a column, or a function of the DataFrame. The first matching rule wins, exactly like an if/elif chain,
+# and rows that match no rule get the default. When every result is a fixed remark the check comes back as a
+# categorical over those remarks.
+def evaluate_rules(df, rules, default=None):
+    conditions = []
+    choices = []
+    remarks = [] if default is None or isinstance(default, str) else None
+    for condition, result in rules:
+        if callable(condition):
+            condition = condition(df)
+        if callable(result):
+            result = result(df)
+        if remarks is not None:
+            remarks = remarks + [result] if isinstance(result, str) else None
+        conditions.append(np.asarray(condition, dtype=bool))
+        choices.append(np.asarray(result, dtype=object))
+    values = np.select(conditions, choices, default=default)
+    if remarks is not None:
+        return pd.Series(categorical(values, remarks + ([default] if default is not None else [])), index=df.index)
+    return pd.Series(values, index=df.index, dtype=object)
+
+# Substring test on a text column, blank cells never match
+def contains_text(series, text):
+    return series.notna() & series.astype(str).str.contains(text, regex=False)
+
+# Length of every cell the way len(str(value)) counts it
+def text_length(series):
+    return series.astype(str).str.len()
+
+# Numeric view of a column, text such as "-" becomes NaN instead of raising
+def to_number(series):
+    return pd.to_numeric(series, errors='coerce')
+
+# 'Unique' / 'Not Unique' from the number of times each value occurs ('-' where the value is blank)
+def uniqueness_check(counts):
+    return np.select([counts == 1, counts > 1], ['Unique', 'Not Unique'], default='-')
+
+# Rows where any of the given cells is filled in but cannot be read as a number (float() would raise)
+def not_numeric(*columns):
+    return np.logical_or.reduce([column.notna() & to_number(column).isna() for column in columns])
+
+# Cell by cell equality of two columns whatever type each was loaded with (a date column against one holding text,
+# categories against plain text), the way the values compare in Python
+def same_values(first, second):
+    return first.astype(object) == second.astype(object)
+
+# Text of every cell the way str() shows the value read from the workbook, blanks (NaN or NaT) show as "nan"
+def cell_text(series):
+    return series.astype(object).where(series.notna(), np.nan).astype(str)
+
+# Compare an original and a revised value, reporting whichever of them is blank
+def comparison_rules(original, revised, both_blank, revised_blank, original_blank):
+    return [
+        (revised.isna() & original.isna(), both_blank),
+        (revised.isna(), revised_blank),
+        (original.isna(), original_blank),
+        (same_values(original, revised), "Match"),
+    ]
+
+
+# -------------------------------------------* Shared rule catalogue *----------------------------------------------------
+
+# GST rate as it may be entered (fraction or percent) and the rate in percent used to compute the GST difference
+GST_RATES = {0.28: 28, 28: 28, 0.18: 18, 18: 18, 0.12: 12, 12: 12, 0.05: 5, 5: 5,
+             0.025: 2.5, 2.5: 2.5, 0.01: 0.1, 0.03: 3, 3: 3}
+
+# Rate in percent for a whole rate column in one lookup, NaN where the entered rate is blank or not a known GST rate
+def normalize_gst_rate(rate):
+    return rate.map(GST_RATES).astype(float)
+
+# Column holding each logical field on the step 1 sheets, by header or by position where the header repeats
+SHEET_FIELDS = {
+    'Outward supply': {'gstin': 7, 'pos': 'Place Of Supply', 'hsn': 'HSN', 'rate': 'GST Rate (%)',
+                       'taxable_value': 19, 'igst': 20, 'cgst': 21, 'sgst': 22, 'date': 'Document date'},
+    'Amendments(Invoices)': {'gstin': 14, 'pos': 17, 'hsn': 'Revised HSN', 'rate': 'Revised rate (%)',
+                             'taxable_value': 'Revised taxable Value (Rs.)', 'igst': 27, 'cgst': 28, 'sgst': 29,
+                             'original_date': 'Original document date', 'date': 'Revised document date'},
+    'Debit&CreditNotes': {'gstin': 7, 'pos': 8, 'hsn': 'HSN ', 'rate': 15,
+                          'taxable_value': 16, 'igst': 17, 'cgst': 18, 'sgst': 19, 'date': 'Document date'},
+    'Amendments (CDN)': {'gstin': 13, 'hsn': 'Revised HSN', 'rate': 'Revised rate (%)',
+                         'taxable_value': 21, 'igst': 22, 'cgst': 23, 'sgst': 24,
+                         'original_date': 'Original document date', 'date': 'Revised document date'},
+    'Advances': {'gstin': 6, 'pos': 'Place Of Supply', 'hsn': 'HSN', 'rate': 'GST Rate(%)',
+                 'taxable_value': 14, 'igst': 15, 'cgst': 16, 'sgst': 17, 'date': 'Document date'},
+    'Amendment(Advances)': {'gstin': 12, 'pos': 'Revised place Of Supply', 'hsn': 'Revised HSN', 'rate': 'Revised GST rate(%)',
+                            'taxable_value': 20, 'igst': 21, 'cgst': 22, 'sgst': 23,
+                            'original_date': 'Original document date', 'date': 'Revised receipt voucher date'},
+}
+
+# Column of a step 1 sheet holding the given logical field
+def sheet_field(df, sheet, field):
+    column = SHEET_FIELDS[sheet][field]
+    if isinstance(column, int):
+        return df.iloc[:, column]
+    return df[column]
+
+# GSTIN should be 15 characters long, blank GSTINs have no length
+def gstin_rules(df, sheet):
+    gstin = sheet_field(df, sheet, 'gstin')
+    return [
+        (gstin.isna(), "GSTIN Cannot be blank in case of registered supply"),
+        (text_length(gstin) == 15, "Correct"),
+    ]
+
+# HSN should be more than 3 and at most 8 digits, `missing_is_blank` reports empty cells instead of 0 as blank
+def hsn_rules(df, sheet, missing_is_blank=False):
+    hsn = sheet_field(df, sheet, 'hsn')
+    number = to_number(hsn)
+    return [
+        (number > 99999999, "Need to mention correct HSN"),
+        (number > 999, "Correct"),
+        (hsn.isna() if missing_is_blank else number == 0, "HSN should not be blank"),
+    ]
+
+# Rate in percent for every GST rate entered either as a fraction or as a percent
+def gst_rate_rules(df, sheet, blank=None):
+    rate = sheet_field(df, sheet, 'rate')
+    percent = normalize_gst_rate(rate)
+    rules = [(percent.notna(), percent)]
+    if blank:
+        rules.append((rate.isna(), blank))
+    return rules
+
+# Tax expected at the normalized rate less the tax charged, rounded to the rupee. Only computed when the taxable value
+# is filled in (every amount with `all_required`), with a message the rows holding text or an unknown rate report it
+def gst_difference_rules(df, sheet, all_required=False, message=None):
+    taxable_value, igst, cgst, sgst = [sheet_field(df, sheet, field) for field in ('taxable_value', 'igst', 'cgst', 'sgst')]
+    rate = normalize_gst_rate(sheet_field(df, sheet, 'rate'))
+    required = [taxable_value, igst, cgst, sgst] if all_required else [taxable_value]
+    applicable = np.logical_and.reduce([column.notna() for column in required])
+    difference = (to_number(taxable_value) * rate / 100) - (to_number(igst) + to_number(cgst) + to_number(sgst))
+    rules = []
+    if message:
+        rules.append((applicable & (rate.isna() | not_numeric(taxable_value, igst, cgst, sgst)), message))
+    rules.append((applicable, difference.round(0)))
+    return rules
+
+# State code (first two digits) of the place of supply against the one of the recipient GSTIN
+def pos_rules(df, sheet, both_blank, pos_blank, gstin_blank):
+    pos_code = sheet_field(df, sheet, 'pos').str.extract(r'(\d{2})', expand=False)
+    gstin_code = sheet_field(df, sheet, 'gstin').str.extract(r'(\d{2})', expand=False)
+    return [
+        (pos_code == gstin_code, "Match"),
+        (pos_code.isna() & gstin_code.isna(), both_blank),
+        (pos_code.isna(), pos_blank),
+        (gstin_code.isna(), gstin_blank),
+    ]
+
+# Date should fall in the financial year given on the Doc. Series sheet
+def date_rules(df, sheet, message, date_field='date'):
+    date = sheet_field(df, sheet, date_field)
+    return [((date > df['End date']) | (date < df['Start date']), message)]
+
+# Shared checks keyed by the logical field they validate
+FIELD_RULES = {
+    'gstin': gstin_rules,
+    'hsn': hsn_rules,
+    'rate': gst_rate_rules,
+    'gst_difference': gst_difference_rules,
+    'pos': pos_rules,
+    'date': date_rules,
+}
+
+# Run the shared check of a logical field on a step 1 sheet
+def check_field(df, sheet, field, default=None, **options):
+    return evaluate_rules(df, FIELD_RULES[field](df, sheet, **options), default)
+
+
+# -------------------------------------------* Unusual transaction keywords *----------------------------------------------------
+
+# Keywords looked for in the description and the remark they raise, in order of priority
+DESCRIPTION_KEYWORDS = [
+    ("recovery", "Prima facie it is observed that some recovery made by the Company"),
+    ("reimb", "Prima facie it is observed that some reimbursement made by the Company"),
+    ("works contract", "Prima facie it is observed that works contract service provided by the Company"),
+    ("rent", "Prima facie it is observed that renting service provided by the Company (need to check the transaction)"),
+    ("scrap", "Prima facie it is observed that scrap sale is made by the Company"),
+    ("gift", "Prima facie it is observed that gift provided by the Company"),
+    ("dest", "Prima facie it is observed that material destroyed and sale made by the Company"),
+    ("stolen", "Prima facie it is observed that the material is stolen in the Company"),
+    ("lost", "Prima facie it is observed that some material is lost in the Company"),
+    ("disposed", "Prima facie it is observed that inputs/Capital goods disposed by the Company"),
+    ("free sample", "Prima facie it is observed that free sample supply made by the Company (Need to check whether ITC on the same is reversed)"),
+    ("written off", "Prima facie it is observed that made by the Company"),
+    ("cheque bounce", "Prima facie it is observed that recovery made by the Company"),
+    ("damage", "Prima facie it is observed that damage material sold by the Company"),
+    ("penalty", "Prima facie it is observed that penalty recovered by the Company"),
+    ("interest", "Prima facie it is observed that recovery made by the Company"),
+    ("delay", "Prima facie it is observed that recovery made by the Company"),
+]
+
+# Capitalized keywords checked after the lower case ones
+CAPITALIZED_DESCRIPTION_KEYWORDS = [
+    ("Interest", "Prima facie it is observed that penalty recovered by the Company"),
+    ("Works", "Prima facie it is observed that works contract service provided by the Company"),
+    ("Recovery", "Prima facie it is observed that some recovery made by the Company"),
+    ("Reimb", "Prima facie it is observed that some reimbursement made by the Company"),
+    ("Rent", "Prima facie it is observed that renting service provided by the Company (need to check the transaction)"),
+    ("Scrap", "Prima facie it is observed that scrap sale is made by the Company"),
+    ("Gift", "Prima facie it is observed that gift provided by the Company"),
+    ("Dest", "Prima facie it is observed that material destroyed and sale made by the Company"),
+    ("Stolen", "Prima facie it is observed that the material is stolen in the Company"),
+    ("Lost", "Prima facie it is observed that some material is lost in the Company"),
+    ("Disposed", "Prima facie it is observed that inputs/Capital goods disposed by the Company"),
+    ("Free sample", "Prima facie it is observed that free sample supply made by the Company (Need to check whether ITC on the same is reversed)"),
+    ("Written off", "Prima facie it is observed that made by the Company"),
+    ("Cheque", "Prima facie it is observed that recovery made by the Company"),
+    ("Damage", "Prima facie it is observed that damage material sold by the Company"),
+    ("Penalty", "Prima facie it is observed that penalty recovered by the Company"),
+    ("Delay", "Prima facie it is observed that recovery made by the Company"),
+]
+
+# Scanner built once from an ordered (keyword, remark) table. A single regex pass finds every keyword occurrence and
+# the keyword listed first wins, like the if/elif chain it replaces. Matching is case-sensitive as the remarks differ by case.
+def keyword_scanner(table):
+    pattern = re.compile('(?=(' + '|'.join(re.escape(keyword) for keyword, _ in table) + '))')
+    priority = {}
+    for keyword, _ in table:
+        priority.setdefault(keyword, len(priority))
+    return pattern, priority, [remark for _, remark in table]
+
+# Remark of the highest priority keyword found in each text (NaN where none is found), scanning every distinct text once
+def scan_keywords(series, scanner):
+    pattern, priority, remarks = scanner
+    texts = series.dropna().astype(str)
+    found = {}
+    for text in texts.unique():
+        matches = [priority[match.group(1)] for match in pattern.finditer(text)]
+        found[text] = remarks[min(matches)] if matches else np.nan
+    return texts.map(found).reindex(series.index)
+
+# Unusual HSN codes and their remark, loaded once from unusual_hsn.csv so new codes only need a new row there.
+# A code ending with "*" is a prefix matching the whole chapter/heading/subheading below it, other codes must match exactly.
+def load_unusual_hsn(path):
+    table = pd.read_csv(path, dtype=str, keep_default_na=False)
+    exact = {}
+    prefixes = {}
+    for hsn, remark in zip(table['hsn'].str.strip(), table['remark']):
+        if hsn.endswith('*'):
+            prefixes[hsn[:-1]] = remark
+        else:
+            exact[hsn] = remark
+    return exact, prefixes
+
+UNUSUAL_HSN = load_unusual_hsn(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'unusual_hsn.csv'))
+
+# HSN codes as text. `numeric` sheets only look up numbers (whole numbers like 9997.0 become "9997"),
+# the other sheets only look up text cells, the same way each sheet compared its HSN before.
+def hsn_codes(hsn, numeric):
+    if numeric:
+        number = to_number(hsn.where(hsn.map(lambda value: not isinstance(value, (str, bool)))))
+        number = number.where(number == np.floor(number))
+        return number.map(lambda value: str(int(value)), na_action='ignore')
+    return hsn.where(hsn.map(lambda value: isinstance(value, str)))
+
+# Remark of the unusual HSN table for every code (NaN where it is not listed), exact codes first then the longest prefix
+def unusual_hsn_remark(hsn, numeric=False):
+    exact, prefixes = UNUSUAL_HSN
+    codes = hsn_codes(hsn, numeric)
+    found = {}
+    for code in codes.dropna().unique():
+        remark = exact.get(code)
+        for length in range(len(code), 0, -1):
+            if remark is not None:
+                break
+            remark = prefixes.get(code[:length])
+        found[code] = remark if remark is not None else np.nan
+    return codes.map(found)
+
+# The Advances sheets word the free sample remark without a space before "(Need"
+ADVANCES_DESCRIPTION_SCANNER = keyword_scanner([(keyword, remark.replace("Company (Need", "Company(Need")) for keyword, remark in DESCRIPTION_KEYWORDS])
+AMENDMENT_DESCRIPTION_SCANNER = keyword_scanner(DESCRIPTION_KEYWORDS + CAPITALIZED_DESCRIPTION_KEYWORDS[:3])
+OUTWARD_DESCRIPTION_SCANNER = keyword_scanner(DESCRIPTION_KEYWORDS + CAPITALIZED_DESCRIPTION_KEYWORDS)
+
+# -------------------------------------------* Processing of Doc. Series Sheet *----------------------------------------------------
+
+def process_doc_series(df2, first_column):
     # It will keep only those rows where not all elements in the row are either NaN or empty strings
-    filtered_df = df2.apply(lambda row: not all(pd.isna(row) | (row == "")), axis=1)
+    filtered_df = ~(df2.isna() | (df2 == "")).all(axis=1)
     df2 = df2[filtered_df]
-    
-    # Delete first column
-    df2 = df2.drop(df1.columns[0], axis=1)
-    
+
+    # Delete first column (named like the first column of the Outward supply sheet)
+    df2 = df2.drop(first_column, axis=1)
+
     newvals = pd.to_datetime(df2.iloc[:, 1], errors="coerce").dt.date
     df2[df2.columns[1]] = newvals
-    
+
     new_header = df2.iloc[5]  # Get the 6th row as the new header
     df2 = df2[6:]  # Remove the first 5 rows
     df2.columns = new_header  # Set the new header
     df2.reset_index(drop=True, inplace=True)
-    
+
     # Remove all columns after the 2nd column
     df2 = df2.iloc[:, :2]
     # Remove all rows after the 2nd row
     df2 = df2.iloc[:2, :]
-    
+
     df2.insert(2, 'Column3', df2.iloc[:, 1])
     #  Transposes the DataFrame
     df2 = df2.T
-    
+
     # Promote the second row to be the column headers
     df2.columns = df2.iloc[0]
 
     # Remove the original first row (which is now redundant)
     df2 = df2.iloc[1:]
-    
-    
-    # -------------------------------------------* Processing of Amendment(Advances) Sheet *----------------------------------------------------
-    
+    return df2
+
+# -------------------------------------------* Processing of Amendment(Advances) Sheet *----------------------------------------------------
+
+def process_amendment_advances(df7, df2):
     df7 = df7.iloc[5:]
     # Step 3: Set the 6th row as the header.
     header_row = df7.iloc[0]
     df7 = df7[1:]
     df7.columns = header_row
-    
-    # to select data from 1st column to 29th column 
+
+    # to select data from 1st column to 29th column
     df7 = df7.iloc[:, 1:27]
-    
+    df7 = apply_schema(df7, 'Amendment(Advances)')
+
     # To check if duplicate entries of any Origional document number is present
     df7['Count'] = df7.groupby('Original document number')['Original document number'].transform('count')
-    df7['Duplicate Amendment(Advances) for original'] = df7['Count'].apply(lambda x: 'Unique' if x == 1 else 'Not Unique' if x > 1 else '-')
+    df7['Duplicate Amendment(Advances) for original'] = uniqueness_check(df7['Count'])
     df7.drop(columns=['Count'], inplace=True) # Remove Count column
-    
+
     # To check if duplicate entries of any Revised receipt voucher number is present
     df7['Count'] = df7.groupby('Revised receipt voucher number')['Revised receipt voucher number'].transform('count')
-    df7['Duplicate Amendment(Advances) for revised voucher'] = df7['Count'].apply(lambda x: 'Unique' if x == 1 else 'Not Unique' if x > 1 else '-')
+    df7['Duplicate Amendment(Advances) for revised voucher'] = uniqueness_check(df7['Count'])
     df7.drop(columns=['Count'], inplace=True) # Remove Count column
-    
-    # Function to check status of Recipient
-    def comp_status_of_recipient_check(row):
-        if row['Original status of recipient'] == row['Revised status of recipient']:
-            return 'Match'
-        elif pd.isna(row['Revised status of recipient']):
-            return 'It should not be blank'
-        elif row['Revised status of recipient'] == 'Unregistered':
-            return 'Changes made - Supply made to unregistered GSTN should be blank'
-        else:
-            return 'Changes made - Supply made to registered GSTN should not be blank'
 
-    df7['Comp. Status Of Recipient Check'] = df7.apply(comp_status_of_recipient_check, axis=1)
-    
-    # Function to check Type of Supply
-    def comp_type_of_supply_check(row):
-        if row['Original type of supply'] == row['Revised type of supply']:
-            return 'Match'
-        elif pd.isna(row['Revised type of supply']):
-            return 'It should not be blank'
-        elif 'SEZ supplies without' in str(row['Revised type of supply']) or 'SEZ without' in str(row['Revised type of supply']):
-            return 'Changes made - It is a Zero rated supply without payment all tax columns should be blank'
-        elif 'SEZ supplies with' in str(row['Revised type of supply']) or 'SEZ with' in str(row['Revised type of supply']):
-            return 'Changes made - It is an Zero rated supply CGST+SGST should be blank'
-        elif 'Export with' in str(row['Revised type of supply']) or 'Export supplies with' in str(row['Revised type of supply']):
-            return 'Changes made - It is an Zero rated supply CGST+SGST should be blank'
-        elif 'Exempt' in str(row['Revised type of supply']):
-            return 'Changes made - It is an exempt supply tax value should be blank'
-        elif 'Regular' in str(row['Revised type of supply']):
-            return 'Correct'
-        elif 'Export without' in str(row['Revised type of supply']) or 'Export supplies without' in str(row['Revised type of supply']):
-            return 'Changes made - It is a Zero rated supply without payment all tax columns should be blank'
-        else:
-            return 'Prima facie it observes that it is other than Regular supply'
+    # Rules to check status of Recipient
+    comp_status_of_recipient_rules = [
+        (lambda df: same_values(df['Original status of recipient'], df['Revised status of recipient']), 'Match'),
+        (lambda df: df['Revised status of recipient'].isna(), 'It should not be blank'),
+        (lambda df: df['Revised status of recipient'] == 'Unregistered', 'Changes made - Supply made to unregistered GSTN should be blank'),
+    ]
 
-    df7['Comp. Type OF Supply Check'] = df7.apply(comp_type_of_supply_check, axis=1)
-    
-    # Function to check Taxability
-    def comp_taxability_check(row):
-        if row['Original taxability'] == row['Revised taxability']:
-            return 'Match'
-        elif row['Revised taxability'] == 'Exempt':
-            return 'Changes made - Exempt supply made by the Company which attract reversal under rule 42 & 43 also tax amount should be zero'
-        elif row['Revised taxability'] == 'non GST':
-            return 'Changes made - It is a No GST supply hence tax amount should be zero'
-        elif pd.isna(row['Revised taxability']):
-            return 'It should not be blank'
-        elif row['Revised taxability'] == 'Taxable':
-            return 'Changes made - Normal taxable supply'
-        else:
-            return "Didn't match"
+    df7['Comp. Status Of Recipient Check'] = evaluate_rules(df7, comp_status_of_recipient_rules, 'Changes made - Supply made to registered GSTN should not be blank')
+
+    # Rules to check Type of Supply
+    revised_type_of_supply = df7['Revised type of supply']
+    comp_type_of_supply_rules = [
+        (same_values(df7['Original type of supply'], revised_type_of_supply), 'Match'),
+        (revised_type_of_supply.isna(), 'It should not be blank'),
+        (contains_text(revised_type_of_supply, 'SEZ supplies without') | contains_text(revised_type_of_supply, 'SEZ without'), 'Changes made - It is a Zero rated supply without payment all tax columns should be blank'),
+        (contains_text(revised_type_of_supply, 'SEZ supplies with') | contains_text(revised_type_of_supply, 'SEZ with'), 'Changes made - It is an Zero rated supply CGST+SGST should be blank'),
+        (contains_text(revised_type_of_supply, 'Export with') | contains_text(revised_type_of_supply, 'Export supplies with'), 'Changes made - It is an Zero rated supply CGST+SGST should be blank'),
+        (contains_text(revised_type_of_supply, 'Exempt'), 'Changes made - It is an exempt supply tax value should be blank'),
+        (contains_text(revised_type_of_supply, 'Regular'), 'Correct'),
+        (contains_text(revised_type_of_supply, 'Export without') | contains_text(revised_type_of_supply, 'Export supplies without'), 'Changes made - It is a Zero rated supply without payment all tax columns should be blank'),
+    ]
 
-    df7['Comp. Taxability Check'] = df7.apply(comp_taxability_check, axis=1)
-    
-    # Function to check Origional Document number and Revised receipt voucher number
-    def comp_document_number_check(row):
-        if row['Original document number'] == '0':
-            return 'It should not be blank'
-        elif row['Original document number'] == row['Revised receipt voucher number']:
-            return 'Match'
-        else:
-            return "Didn't match / Need to check the Invoice copy"
+    df7['Comp. Type OF Supply Check'] = evaluate_rules(df7, comp_type_of_supply_rules, 'Prima facie it observes that it is other than Regular supply')
 
-    df7['Comp. Document number Check'] = df7.apply(comp_document_number_check, axis=1)
-    
-    # Function to check Invoice Number
-    def invoice_number_check(row):
-        if len(str(row['Revised receipt voucher number'])) <= 16:
-            return 'Correct'
-        else:
-            return 'Need to check the Invoice copy'
+    # Rules to check Taxability
+    comp_taxability_rules = [
+        (lambda df: same_values(df['Original taxability'], df['Revised taxability']), 'Match'),
+        (lambda df: df['Revised taxability'] == 'Exempt', 'Changes made - Exempt supply made by the Company which attract reversal under rule 42 & 43 also tax amount should be zero'),
+        (lambda df: df['Revised taxability'] == 'non GST', 'Changes made - It is a No GST supply hence tax amount should be zero'),
+        (lambda df: df['Revised taxability'].isna(), 'It should not be blank'),
+        (lambda df: df['Revised taxability'] == 'Taxable', 'Changes made - Normal taxable supply'),
+    ]
 
-    df7['Invoice no. Check'] = df7.apply(invoice_number_check, axis=1)
-    
-    # Function to check Document Date
-    def document_date_check(row):
-        original_date = str(row['Original document date'])
-        revised_date = str(row['Revised receipt voucher date'])
-        
-        if original_date == revised_date:
-            return 'Match'
-        elif original_date == '0':
-            return 'It should not be blank'
-        else:
-            return "Didn't match"
+    df7['Comp. Taxability Check'] = evaluate_rules(df7, comp_taxability_rules, "Didn't match")
 
-    df7['Comp. Document Date Check'] = df7.apply(document_date_check, axis=1)
-    
-    # To extract first two Numbers from String
-    df7['Revised Recipients GSTIN - Copy'] = df7.iloc[:, 12].str.extract(r'(\d{2})')
-    df7['Revised place Of Supply - Copy'] = df7['Revised place Of Supply'].str.extract(r'(\d{2})')
-    
-    # Function to check Place of Supply and Recipient GSTIN 
-    def pos_recipient_check(row):
-        pos_copy = row['Revised place Of Supply - Copy']
-        gstin_copy = row['Revised Recipients GSTIN - Copy']
-        
-        if pos_copy == gstin_copy:
-            return "Match"
-        elif pd.isna(pos_copy):
-            if pd.isna(gstin_copy):
-                return "Place of Supply and Recipients GSTIN should not be blank"
-        elif pd.isna(gstin_copy):
-                return "Recipients GSTIN should not be blank"
-        else:
-            return "Place of Supply and Recipients GSTIN need to check"
+    # Rules to check Origional Document number and Revised receipt voucher number
+    comp_document_number_rules = [
+        (lambda df: df['Original document number'] == '0', 'It should not be blank'),
+        (lambda df: df['Original document number'] == df['Revised receipt voucher number'], 'Match'),
+    ]
 
-    df7['POS & Recipient check'] = df7.apply(pos_recipient_check, axis=1)
-    
-    df7 = df7.drop(columns=["Revised place Of Supply - Copy", "Revised Recipients GSTIN - Copy"]) #Remove specified columnns
-    
-    # Function to check Revised HSN
-    def hsn_check(row):
-        revised_hsn = row['Revised HSN']
-        
-        # Check if the value is NaN
-        if pd.notna(revised_hsn):
-            revised_hsn = int(revised_hsn)
-            
-            if revised_hsn == 99999999:
-                return 'Need to mention correct HSN'
-            elif revised_hsn == 999:
-                return 'Correct'
-            elif revised_hsn == 0:
-                return 'HSN should not be blank'
-            else:
-                return 'Need to mention correct HSN'
-        else:
-            return 'Revised HSN is NaN'  # Handle NaN values
+    df7['Comp. Document number Check'] = evaluate_rules(df7, comp_document_number_rules, "Didn't match / Need to check the Invoice copy")
 
-    df7['HSN check'] = df7.apply(hsn_check, axis=1)
-    
-    # Function to check and convert Revised GST Rate
-    def gst_rate_check(row):
-        revised_rate = row['Revised GST rate(%)']
-        
-        if revised_rate == 0.28:
-            return 28
-        elif revised_rate == 28:
-            return 28
-        elif revised_rate == 0.18:
-            return 18
-        elif revised_rate == 18:
-            return 18
-        elif revised_rate == 0.12:
-            return 12
-        elif revised_rate == 12:
-            return 12
-        elif revised_rate == 0.05:
-            return 5
-        elif revised_rate == 5:
-            return 5
-        elif revised_rate == 0.025:
-            return 2.5
-        elif revised_rate == 2.5:
-            return 2.5
-        elif revised_rate == 0.01:
-            return 0.1
-        elif revised_rate == 0.03:
-            return 3
-        elif revised_rate == 3:
-            return 3
-        elif pd.isna(revised_rate):
-            return "Should not be blank"
-        else:
-            return "Need to mention correct GST Rate"
+    # To check Invoice Number
+    df7['Invoice no. Check'] = np.where(text_length(df7['Revised receipt voucher number']) <= 16, 'Correct', 'Need to check the Invoice copy')
 
-    df7['GST Rate check'] = df7.apply(gst_rate_check, axis=1)
-    
-    # Function to Find GST Difference
-    def compute_gst_difference(row):
-        revised_taxable_value = row.iloc[20]
-        revised_igst = row.iloc[21]
-        revised_cgst = row.iloc[22]
-        revised_sgst_utgst = row.iloc[23]
-        gst_rate_check = row['GST Rate check']
-        
-        # To check for NaN values and convert columns to numeric types
-        if pd.notna(revised_taxable_value) and pd.notna(gst_rate_check):
-            # Handle the case where the conversion fails using try and except
-            try:
-                taxable_value = float(revised_taxable_value)
-                igst = float(revised_igst)
-                cgst = float(revised_cgst)
-                sgst_utgst = float(revised_sgst_utgst)
-                rate_check = float(gst_rate_check)
-                
-                return round((taxable_value * rate_check / 100) - (igst + cgst + sgst_utgst), 0)
-            except ValueError:
-                return "Revised taxable Value (Rs.)/ IGST/ Revised IGST/ Revised CGST/ Revised SGST/UTGST Should not be blank"  
-        else:
-            return None
+    # Rules to check Document Date
+    original_date = cell_text(df7['Original document date'])
+    revised_date = cell_text(df7['Revised receipt voucher date'])
+    document_date_rules = [
+        (original_date == revised_date, 'Match'),
+        (original_date == '0', 'It should not be blank'),
+    ]
+
+    df7['Comp. Document Date Check'] = evaluate_rules(df7, document_date_rules, "Didn't match")
+
+    # To check Place of Supply and Recipient GSTIN
+    df7['POS & Recipient check'] = check_field(df7, 'Amendment(Advances)', 'pos', "Place of Supply and Recipients GSTIN need to check",
+        both_blank="Place of Supply and Recipients GSTIN should not be blank", pos_blank=None, gstin_blank="Recipients GSTIN should not be blank")
+
+    # Rules to check Revised HSN (compared as a whole number)
+    revised_hsn = np.trunc(to_number(df7['Revised HSN']))
+    hsn_rules = [
+        (df7['Revised HSN'].isna(), 'Revised HSN is NaN'),  # Handle NaN values
+        (revised_hsn == 99999999, 'Need to mention correct HSN'),
+        (revised_hsn == 999, 'Correct'),
+        (revised_hsn == 0, 'HSN should not be blank'),
+    ]
+
+    df7['HSN check'] = evaluate_rules(df7, hsn_rules, 'Need to mention correct HSN')
+
+    # To check and convert Revised GST Rate
+    df7['GST Rate check'] = check_field(df7, 'Amendment(Advances)', 'rate', "Need to mention correct GST Rate", blank="Should not be blank")
+
+    # To Find GST Difference
+    df7['GST Difference'] = check_field(df7, 'Amendment(Advances)', 'gst_difference',
+        message="Revised taxable Value (Rs.)/ IGST/ Revised IGST/ Revised CGST/ Revised SGST/UTGST Should not be blank")
+
+    # Rules to check Origional and Revised GSTIN
+    gstin_of_recipient_rules = [
+        (lambda df: df['Original GSTIN of recipient'] == "0", "It should not be blank"),
+        (lambda df: df['Original GSTIN of recipient'] == df['Revised Recipients GSTIN (Billing party GSTIN)'], "Match"),
+    ]
+
+    df7['GSTIN of recipient check'] = evaluate_rules(df7, gstin_of_recipient_rules, "Didn't match")
+    df7['GSTIN length check'] = text_length(df7.iloc[:, 12])
+
+    # Rules to check Unusual transation by Revised HSN
+    revised_hsn = df7['Revised HSN']
+    hsn_remark = unusual_hsn_remark(revised_hsn)
+    unusual_transaction_rules = [
+        (revised_hsn.isna(), "HSN should not be blank"),
+        (hsn_remark.notna(), hsn_remark),
+    ]
+
+    df7['Identification of unusual transaction by HSN'] = evaluate_rules(df7, unusual_transaction_rules, "-")
+
+    # Rules to check Unusual transation by Revised description
+    revised_description = df7['Revised description']
+    description_remark = scan_keywords(revised_description, ADVANCES_DESCRIPTION_SCANNER)
+    unusual_description_rules = [
+        (revised_description.isna() | (revised_description == "-"), "Description should not be blank"),
+        (description_remark.notna(), description_remark),
+        (revised_description.isin(['Interest', 'Works', 'Recovery', 'Reimb', 'Rent', 'Scrap', 'Gift', 'Dest', 'Stolen', 'Lost', 'Disposed', 'Free sample', 'Written off', 'Cheque', 'Damage', 'Penalty', 'Delay']), "Prima facie it is observed that " + revised_description.astype(str)),
+    ]
+
+    df7['Identification of unusual transaction by Description'] = evaluate_rules(df7, unusual_description_rules, "Description need to check")
 
-    df7['GST Difference'] = df7.apply(compute_gst_difference, axis=1)
-    
-    # Function to check Origional and Revised GSTIN
-    def gstin_of_recipient_check(row):
-        original_gstin = row['Original GSTIN of recipient']
-        revised_gstin = row['Revised Recipients GSTIN (Billing party GSTIN)']
-        
-        if original_gstin == "0":
-            return "It should not be blank"
-        elif original_gstin == revised_gstin:
-            return "Match"
-        else:
-            return "Didn't match"
-        
-    df7['GSTIN of recipient check'] = df7.apply(gstin_of_recipient_check, axis=1)
-    df7['GSTIN length check'] = df7.apply(lambda row: len(str(row.iloc[12])), axis=1)
-    
-    # Function to check Unusual transation by Revised HSN
-    def identify_unusual_transaction(row):
-        revised_hsn = row['Revised HSN']
-        if pd.isna(revised_hsn):
-            return "HSN should not be blank"
-        elif revised_hsn == "9997":
-            return "This sort of recovery made need to check the transaction"
-        elif revised_hsn == "9965":
-            return "This sort of GTA Supply made need to check the transaction"
-        elif revised_hsn == "996601":
-            return "Motor vehicle provided on rent along with operator and cost of fuel is recovered in rent or Motor vehicle provided on rent along with operator but cost of fuel is not recovered in rent(Need to verify the GST Rate)"
-        elif revised_hsn == "9973":
-            return "Motor vehicle provided on rent without operator whether or not fuel cost is recovered in rent"
-        elif revised_hsn == "8703":
-            return "Prima facie it is sale of used car (Need to check the transaction)"
-        elif revised_hsn == "9972":
-            return "Prima facie it is renting of immovable property (Need to check the transaction)"
-        elif revised_hsn == "4902":
-            return "Prima facie it is supply of MEIS scripts (Need to check the transaction)"
-        elif revised_hsn == "8471":
-            return "Prima facie it is sale of used Laptops/Desktops (Need to check the transaction)"
-        elif revised_hsn == "997331":
-            return "Prima facie it is supply of Licensing services for the right to use computer software and databases (Need to check the transaction)"
-        elif revised_hsn == "9954":
-            return "Prima facie it is supply of works contract service (Need to check the transaction)"
-        else:
-            return "-"
-        
-    df7['Identification of unusual transaction by HSN'] = df7.apply(identify_unusual_transaction, axis=1)
-    
-    # Function to check Unusual transation by Revised description
-    def identify_unusual_transaction_by_description(row):
-        revised_description = row['Revised description']
-        if pd.isna(revised_description) or revised_description == "-":
-            return "Description should not be blank"
-        elif 'recovery' in revised_description:
-            return "Prima facie it is observed that some recovery made by the Company"
-        elif 'reimb' in revised_description:
-            return "Prima facie it is observed that some reimbursement made by the Company"
-        elif 'works contract' in revised_description:
-            return "Prima facie it is observed that works contract service provided by the Company"
-        elif 'rent' in revised_description:
-            return "Prima facie it is observed that renting service provided by the Company (need to check the transaction)"
-        elif 'scrap' in revised_description:
-            return "Prima facie it is observed that scrap sale is made by the Company"
-        elif 'gift' in revised_description:
-            return "Prima facie it is observed that gift provided by the Company"
-        elif 'dest' in revised_description:
-            return "Prima facie it is observed that material destroyed and sale made by the Company"
-        elif 'stolen' in revised_description:
-            return "Prima facie it is observed that the material is stolen in the Company"
-        elif 'lost' in revised_description:
-            return "Prima facie it is observed that some material is lost in the Company"
-        elif 'disposed' in revised_description:
-            return "Prima facie it is observed that inputs/Capital goods disposed by the Company"
-        elif 'free sample' in revised_description:
-            return "Prima facie it is observed that free sample supply made by the Company(Need to check whether ITC on the same is reversed)"
-        elif 'written off' in revised_description:
-            return "Prima facie it is observed that made by the Company"
-        elif 'cheque bounce' in revised_description:
-            return "Prima facie it is observed that recovery made by the Company"
-        elif 'damage' in revised_description:
-            return "Prima facie it is observed that damage material sold by the Company"
-        elif 'penalty' in revised_description:
-            return "Prima facie it is observed that penalty recovered by the Company"
-        elif 'interest' in revised_description:
-            return "Prima facie it is observed that recovery made by the Company"
-        elif 'delay' in revised_description:
-            return "Prima facie it is observed that recovery made by the Company"
-        elif revised_description in ['Interest', 'Works', 'Recovery', 'Reimb', 'Rent', 'Scrap', 'Gift', 'Dest', 'Stolen', 'Lost', 'Disposed', 'Free sample', 'Written off', 'Cheque', 'Damage', 'Penalty', 'Delay']:
-            return f"Prima facie it is observed that {revised_description}"
-        else:
-            return "Description need to check"
-        
-    df7['Identification of unusual transaction by Description'] = df7.apply(identify_unusual_transaction_by_description, axis=1)
-    
     df7.reset_index(inplace=True, drop=True)
     df2.reset_index(inplace=True, drop=True)
     # Merge Doc. Series and Amendment(Advances) sheet and Save in Amendment(Advances) sheet
     df7 = pd.concat([df2, df7], axis=1)
-    
+
     df7_columns = df7.columns.tolist()
     df7_new_columns = df7_columns[2:] + df7_columns[:2] # Move the first and second columns to the end
     df7 = df7[df7_new_columns] # Reorganize the DataFrame columns
-    
+
     # Extend Values for below cells  in Start date column
     df7_column_to_extend = 'Start date'
     df7_value_to_extend = df7.at[1, df7_column_to_extend]
     df7[df7_column_to_extend] = df7[df7_column_to_extend].fillna(df7_value_to_extend)
-    
+
     # Extend Values for below cells  in End date column
     df7_column_to_extend1 = 'End date'
     df7_value_to_extend1 = df7.at[1, df7_column_to_extend1]
     df7[df7_column_to_extend1] = df7[df7_column_to_extend1].fillna(df7_value_to_extend1)
-    
+
     df7['Original document date'] = pd.to_datetime(df7['Original document date'])
     df7['Revised receipt voucher date'] = pd.to_datetime(df7['Revised receipt voucher date'])
     df7['Start date'] = pd.to_datetime(df7['Start date'])
     df7['End date'] = pd.to_datetime(df7['End date'])
 
-    # Function to check Origional Document Date as it should be between start and end date
-    def origional_document_date_check(row):
-        if pd.isna('Original document date'):
-            return "Original document date is Blank"
-        elif pd.notna('Original document date'):
-            if row['Original document date'] > row['End date']:
-                return "Original document date is not pertaining to this FY"
-            elif row['Original document date'] < row['Start date']:
-                return "Original document date is not pertaining to this FY"
-            else:
-                return "Correct"
-        
-    df7['Original document date check'] = df7.apply(origional_document_date_check, axis=1)
-    
-    # Function to check Reviseed receipt voucher date as it should be between start and end date
-    def revised_document_date_check(row):
-        if pd.isna('Revised receipt voucher date'):
-            return "Revised receipt voucher date is Blank"
-        elif pd.notna('Revised receipt voucher date'):
-            if row['Revised receipt voucher date'] > row['End date']:
-                return "Revised receipt voucher date is not pertaining to this FY"
-            elif row['Revised receipt voucher date'] < row['Start date']:
-                return "Revised receipt voucher date is not pertaining to this FY"
-            else:
-                return "Correct"
-        
-    df7['Revised receipt voucher date check'] = df7.apply(revised_document_date_check, axis=1)
-    
+    # To check Origional Document Date as it should be between start and end date
+    df7['Original document date check'] = check_field(df7, 'Amendment(Advances)', 'date', "Correct",
+        message="Original document date is not pertaining to this FY", date_field='original_date')
+
+    # To check Reviseed receipt voucher date as it should be between start and end date
+    df7['Revised receipt voucher date check'] = check_field(df7, 'Amendment(Advances)', 'date', "Correct",
+        message="Revised receipt voucher date is not pertaining to this FY")
+
     df7 = df7.drop(columns=["Start date", "End date"]) # Remove the specified columns
     df7 = df7.dropna(subset=df7.columns[0:25], how='all') # Remove unnecessarily created checks even if rows not contains Data
-    
+    return df7
 
-    # -------------------------------------------* Processing of Advances Sheet *----------------------------------------------------
-    
+# -------------------------------------------* Processing of Advances Sheet *----------------------------------------------------
+
+def process_advances(df6, df2):
     df6 = df6.iloc[5:] # Set the 6th row as the header.
     header_row = df6.iloc[0]
     df6 = df6[1:]
     df6.columns = header_row
-    
-    # To select data from 1st column to 29th column 
+
+    # To select data from 1st column to 29th column
     df6 = df6.iloc[:, 1:30]
-    
+    df6 = apply_schema(df6, 'Advances')
+
     # To check if duplicate entries of any Receipt voucher number is present
     df6['Count'] = df6.groupby('Receipt voucher number')['Receipt voucher number'].transform('count')
-    df6['Duplicate receipt voucher no check'] = df6['Count'].apply(lambda x: 'Unique' if x == 1 else 'Not Unique' if x > 1 else '-')
+    df6['Duplicate receipt voucher no check'] = uniqueness_check(df6['Count'])
     df6.drop(columns=['Count'], inplace=True)
-    
-    # Function to create a new column 'Status of Recipient Check 1'
-    def check_status_of_recipient(row):
-        status_of_recipient = row['Status of recipient']
-        
-        if pd.notna(status_of_recipient) and "Unregistered" in status_of_recipient:
-            return row[6]
-        else:
-            return "Correct / Supply made to registered GSTN"
 
-    df6['Status of Recipient Check 1'] = df6.apply(check_status_of_recipient, axis=1)
-    
-    # Function to create a new column 'Status of Recipient Check 2'
-    def check_status_of_recipient(row):
-        status_of_recipient = row['Status of recipient']
-        
-        if pd.notna(status_of_recipient) and "Registered" in status_of_recipient:
-            return row[6]
-        else:
-            return "GST number should be blank"
+    status_of_recipient = df6['Status of recipient']
+    gstin = df6.iloc[:, 6]
 
-    df6['Status of Recipient Check 2'] = df6.apply(check_status_of_recipient, axis=1)
-    
-    # Function to check status of Recipient
-    def check_status_of_recipient(row):
-        status_check_1 = row['Status of Recipient Check 1']
-        status_check_2 = row['Status of Recipient Check 2']
-        gstin = row[6]
-
-        if status_check_1 == "-":
-            return "Correct"
-        elif status_check_2 == "-":
-            return "Incorrect / Supply made to registered GSTN should not be blank"
-        elif gstin == status_check_2:
-            return "Correct"
-        elif gstin == status_check_1:
-            return "Incorrect / GSTIN should be blank"
-        else:
-            return "-"
+    # 'Status of Recipient Check 1' and 'Status of Recipient Check 2' carry the GSTIN for unregistered / registered supplies
+    status_check_1 = gstin.where(contains_text(status_of_recipient, "Unregistered"), "Correct / Supply made to registered GSTN")
+    status_check_2 = gstin.where(contains_text(status_of_recipient, "Registered"), "GST number should be blank")
 
-    df6['Status of Recipient check'] = df6.apply(check_status_of_recipient, axis=1)
+    # Rules to check status of Recipient
+    status_of_recipient_rules = [
+        (status_check_1 == "-", "Correct"),
+        (status_check_2 == "-", "Incorrect / Supply made to registered GSTN should not be blank"),
+        (gstin == status_check_2, "Correct"),
+        (gstin == status_check_1, "Incorrect / GSTIN should be blank"),
+    ]
+
+    df6['Status of Recipient check'] = evaluate_rules(df6, status_of_recipient_rules, "-")
+
+    # Rules to check Type of supply
+    type_of_supply = df6["Type of supply"]
+    type_of_supply_rules = [
+        (contains_text(type_of_supply, "Regular"), "Correct"),
+        (contains_text(type_of_supply, "Export with"), "It is a Zero-rated supply CGST+SGST should be blank"),
+        (contains_text(type_of_supply, "SEZ without"), "It is a Zero-rated supply without payment; all tax columns should be blank. Zero-rated supply under Goods and Services Tax (GST) refers to the supplies of goods or services that are taxable but have a GST rate of 0%."),
+        (contains_text(type_of_supply, "Export without"), "It is a Zero-rated supply without payment; all tax columns should be blank. Zero-rated supply under Goods and Services Tax (GST) refers to the supplies of goods or services that are taxable but have a GST rate of 0%."),
+        (contains_text(type_of_supply, "SEZ with"), "It is a Zero-rated supply CGST+SGST should be blank"),
+        (contains_text(type_of_supply, "Exempt"), "It is an exempt supply; tax value should be blank"),
+        (type_of_supply == "-", "It should not be blank."),
+    ]
+
+    df6["Type of Supply Check"] = evaluate_rules(df6, type_of_supply_rules, "Prima facie it observes that it is other than Regular supply")
 
-    df6 = df6.drop(columns=["Status of Recipient Check 1", "Status of Recipient Check 2"]) # Remove specified columnns
-    
-    # Function to check Type of supply
-    def type_of_supply_check(row):
-        if isinstance(row, str):
-            if "Regular" in row:
-                return "Correct"
-            elif "Export with" in row:
-                return "It is a Zero-rated supply CGST+SGST should be blank"
-            elif "SEZ without" in row:
-                return "It is a Zero-rated supply without payment; all tax columns should be blank. Zero-rated supply under Goods and Services Tax (GST) refers to the supplies of goods or services that are taxable but have a GST rate of 0%."
-            elif "Export without" in row:
-                return "It is a Zero-rated supply without payment; all tax columns should be blank. Zero-rated supply under Goods and Services Tax (GST) refers to the supplies of goods or services that are taxable but have a GST rate of 0%."
-            elif "SEZ with" in row:
-                return "It is a Zero-rated supply CGST+SGST should be blank"
-            elif "Exempt" in row:
-                return "It is an exempt supply; tax value should be blank"
-            elif row == "-":
-                return "It should not be blank."
-        return "Prima facie it observes that it is other than Regular supply"
-
-    df6["Type of Supply Check"] = df6["Type of supply"].apply(type_of_supply_check)
-    
     # Creating column to check taxability
-    df6['Taxability Check'] = df6.apply(lambda row: 
-        "Exempt supply made by the Company which attaract reversal under rule 42 & 43"
-        if "Exempt" in str(row['Taxability']) else
-        "It is an No GST supply hence tax amount should be zero"
-        if str(row['Taxability']) == "non GST" else
-        "It should not be blank"
-        if str(row['Taxability']) == "-" else
-        "Normal taxable supply", axis=1)
-    
+    taxability = df6['Taxability'].astype(str)
+    df6['Taxability Check'] = evaluate_rules(df6, [
+        (taxability.str.contains("Exempt", regex=False), "Exempt supply made by the Company which attaract reversal under rule 42 & 43"),
+        (taxability == "non GST", "It is an No GST supply hence tax amount should be zero"),
+        (taxability == "-", "It should not be blank"),
+    ], "Normal taxable supply")
+
     # Creating column to check Length of Voucher number
-    df6['Voucher No Length Check'] = df6.apply(lambda row: 
-        "Correct" if len(str(row['Receipt voucher number'])) <= 16 else "Need to check the Invoice copy",
-        axis=1)
-    
+    df6['Voucher No Length Check'] = np.where(text_length(df6['Receipt voucher number']) <= 16, "Correct", "Need to check the Invoice copy")
+
     # Creating column to get Length of GST
-    df6['GST Length Check'] = df6.iloc[:, 6].apply(lambda x: len(x) if pd.notna(x) else None)
-    
-    # Function to check Length of GST Number(Should be Equal to 15)
-    def calculate_gstin_check(row):
-        gst_length = row['GST Length Check']
-        if pd.isnull(gst_length):
-            return "GSTIN Cannot be blank in case of registered supply"
-        elif gst_length == 15:
-            return "Correct"
-        else:
-            return "Need to mention the correct GST Number"
+    df6['GST Length Check'] = text_length(gstin).where(gstin.notna())
 
-    df6['GSTIN check'] = df6.apply(calculate_gstin_check, axis=1)
-    
-    # To extract first two Numbers from String
-    df6['Recipients GSTIN - Copy'] = df6.iloc[:, 6].str.extract(r'(\d{2})')
-    df6['Place Of Supply - Copy'] = df6['Place Of Supply'].str.extract(r'(\d{2})')
-    
-    # Function to check Place of Supply and Recipient GSTIN 
-    def pos_recipient_check(row):
-        pos_copy = row['Place Of Supply - Copy']
-        gstin_copy = row['Recipients GSTIN - Copy']
-        
-        if pos_copy == gstin_copy:
-            return "Match"
-        elif pd.isna(pos_copy):
-            if pd.isna(gstin_copy):
-                return "Place of Supply and Recipients GSTIN should not be blank"
-        elif pd.isna(gstin_copy):
-                return "Recipients GSTIN should not be blank"
-        else:
-            return "Place of Supply and Recipients GSTIN need to check"
+    # To check Length of GST Number(Should be Equal to 15)
+    df6['GSTIN check'] = check_field(df6, 'Advances', 'gstin', "Need to mention the correct GST Number")
 
-    df6['POS & Recipient check'] = df6.apply(pos_recipient_check, axis=1)
-    
-    df6 = df6.drop(columns=["Place Of Supply - Copy", "Recipients GSTIN - Copy"]) # Remove specified columnns
-    
-    # Function to check HSN
-    def hsn_check(row):
-        hsn = row['HSN']
-        
-        if hsn > 99999999:
-            return "Need to mention correct HSN"
-        elif hsn > 999:
-            return "Correct"
-        elif hsn == 0:
-            return "HSN should not be blank"
-        else:
-            return "Need to mention correct HSN"
+    # To check Place of Supply and Recipient GSTIN
+    df6['POS & Recipient check'] = check_field(df6, 'Advances', 'pos', "Place of Supply and Recipients GSTIN need to check",
+        both_blank="Place of Supply and Recipients GSTIN should not be blank", pos_blank=None, gstin_blank="Recipients GSTIN should not be blank")
 
-    df6['HSN check'] = df6.apply(hsn_check, axis=1)
-    
-    # Function to check Unusual transation by Description
-    def unusual_transaction_by_description(row):
-        description = row['Description']
-        
-        if pd.notna(description):
-            if "recovery" in description:
-                return "Prima facie it is observed that some recovery made by the Company"
-            elif "reimb" in description:
-                return "Prima facie it is observed that some reimbursement made by the Company"
-            elif "works contract" in description:
-                return "Prima facie it is observed that works contract service provided by the Company"
-            elif "rent" in description:
-                return "Prima facie it is observed that renting service provided by the Company (need to check the transaction)"
-            elif "scrap" in description:
-                return "Prima facie it is observed that scrap sale is made by the Company"
-            elif "gift" in description:
-                return "Prima facie it is observed that gift provided by the Company"
-            elif "dest" in description:
-                return "Prima facie it is observed that material destroyed and sale made by the Company"
-            elif "stolen" in description:
-                return "Prima facie it is observed that the material is stolen in the Company"
-            elif "lost" in description:
-                return "Prima facie it is observed that some material is lost in the Company"
-            elif "disposed" in description:
-                return "Prima facie it is observed that inputs/Capital goods disposed by the Company"
-            elif "free sample" in description:
-                return "Prima facie it is observed that free sample supply made by the Company(Need to check whether ITC on the same is reversed)"
-            elif "written off" in description:
-                return "Prima facie it is observed that made by the Company"
-            elif "cheque bounce" in description:
-                return "Prima facie it is observed that recovery made by the Company"
-            elif "damage" in description:
-                return "Prima facie it is observed that damage material sold by the Company"
-            elif "penalty" in description:
-                return "Prima facie it is observed that penalty recovered by the Company"
-            elif "interest" in description:
-                return "Prima facie it is observed that recovery made by the Company"
-            elif "delay" in description:
-                return "Prima facie it is observed that recovery made by the Company"
-            else:
-                return "Normal Description"
-        else:
-            return "Description should not be blank"
+    # To check HSN
+    df6['HSN check'] = check_field(df6, 'Advances', 'hsn', "Need to mention correct HSN")
 
-    df6['Unusual Transaction by Description'] = df6.apply(unusual_transaction_by_description, axis=1)
-    
-    # Function to check and convert Revised GST Rate
-    def gst_rate_check(row):
-        gst_rate = row['GST Rate(%)']
-        
-        if pd.notna(gst_rate):
-            if gst_rate == 0.28:
-                return 28
-            elif gst_rate == 28:
-                return 28
-            elif gst_rate == 0.18:
-                return 18
-            elif gst_rate == 18:
-                return 18
-            elif gst_rate == 0.12:
-                return 12
-            elif gst_rate == 12:
-                return 12
-            elif gst_rate == 0.05:
-                return 5
-            elif gst_rate == 5:
-                return 5
-            elif gst_rate == 0.025:
-                return 2.5
-            elif gst_rate == 2.5:
-                return 2.5
-            elif gst_rate == 0.01:
-                return 0.1
-            elif gst_rate == 0.03:
-                return 3
-            elif gst_rate == 3:
-                return 3
-            else:
-                return "Need to mention correct GST Rate"
-        else:
-            return "Should not be blank"
+    # Rules to check Unusual transation by Description
+    description = df6['Description']
+    description_remark = scan_keywords(description, ADVANCES_DESCRIPTION_SCANNER)
+    unusual_description_rules = [
+        (description.isna(), "Description should not be blank"),
+        (description_remark.notna(), description_remark),
+    ]
 
-    df6['GST Rate Check'] = df6.apply(gst_rate_check, axis=1)
-    
-    # Function to Find GST Difference
-    def compute_gst_difference(row):
-        taxable_value = row.iloc[14]
-        igst = row.iloc[15]
-        cgst = row.iloc[16]
-        sgst_utgst = row.iloc[17]
-        gst_rate_check = row['GST Rate Check']
-        
-        # Check for NaN values and convert columns to numeric types
-        if pd.notna(taxable_value) and pd.notna(gst_rate_check):
-            # Handle the case where the conversion fails using try and except
-            try:
-                taxable_value = float(taxable_value)
-                igst = float(igst)
-                cgst = float(cgst)
-                sgst_utgst = float(sgst_utgst)
-                rate_check = float(gst_rate_check)
-                
-                return round((taxable_value * rate_check / 100) - (igst + cgst + sgst_utgst), 0)
-            except ValueError:
-                return "taxable Value (Rs.)/ IGST/ Revised IGST/ Revised CGST/ Revised SGST/UTGST Should not be blank"
-        else:
-            return None
+    df6['Unusual Transaction by Description'] = evaluate_rules(df6, unusual_description_rules, "Normal Description")
 
-    df6['GST Difference'] = df6.apply(compute_gst_difference, axis=1)
-    
-    # Function to Check Document Type
-    def document_type_check(row):
-        document_type = row['Type of document']
-        
-        if pd.notna(document_type):
-            if "Invoice" in document_type:
-                return "Invoice date is after advance received"
-            elif "Invoice-cum-bill of supply" in document_type:
-                return "GST charge on taxable portion"
-            elif "Bill of supply" in document_type:
-                return "GST should not be charged"
-            elif "Refund voucher" in document_type:
-                return "Refund voucher should be after than advance received"
-            else:
-                return "Invalid Type of Document"
-        else:
-            return "It should not be blank"
+    # To check and convert GST Rate
+    df6['GST Rate Check'] = check_field(df6, 'Advances', 'rate', "Need to mention correct GST Rate", blank="Should not be blank")
 
-    df6['Type of Document check'] = df6.apply(document_type_check, axis=1)
-    
-    # Function to check Length of Document number(should be less than equal to 16)
-    def document_number_length_check(row):
-        document_number = str(row['Document number'])
-        if len(document_number) <= 16:
-            return "Correct"
-        else:
-            return "Need to check the Invoice copy"
+    # To Find GST Difference
+    df6['GST Difference'] = check_field(df6, 'Advances', 'gst_difference',
+        message="taxable Value (Rs.)/ IGST/ Revised IGST/ Revised CGST/ Revised SGST/UTGST Should not be blank")
+
+    # Rules to Check Document Type
+    document_type = df6['Type of document']
+    document_type_rules = [
+        (document_type.isna(), "It should not be blank"),
+        (contains_text(document_type, "Invoice"), "Invoice date is after advance received"),
+        (contains_text(document_type, "Invoice-cum-bill of supply"), "GST charge on taxable portion"),
+        (contains_text(document_type, "Bill of supply"), "GST should not be charged"),
+        (contains_text(document_type, "Refund voucher"), "Refund voucher should be after than advance received"),
+    ]
+
+    df6['Type of Document check'] = evaluate_rules(df6, document_type_rules, "Invalid Type of Document")
+
+    # To check Length of Document number(should be less than equal to 16)
+    df6['Document No Length Check'] = np.where(text_length(df6['Document number']) <= 16, "Correct", "Need to check the Invoice copy")
 
-    df6['Document No Length Check'] = df6.apply(document_number_length_check, axis=1)
-    
     df6.reset_index(inplace=True, drop=True)
     df2.reset_index(inplace=True, drop=True)
     # Merge Doc. Series and Amendment(Advances) sheet and Save in Amendment(Advances) sheet
     df6 = pd.concat([df2, df6], axis=1)
-    
+
     df6_columns = df6.columns.tolist()
     df6_new_columns = df6_columns[2:] + df6_columns[:2] # Move the first and second columns to the end
     df6 = df6[df6_new_columns] # Reorganize the DataFrame columns
-    
+
     # Extend Values for below cells  in Start date column
     df6_column_to_extend = 'Start date'
     df6_value_to_extend = df6.at[1, df6_column_to_extend]
     df6[df6_column_to_extend] = df6[df6_column_to_extend].fillna(df6_value_to_extend)
-    
+
     # Extend Values for below cells  in End date column
     df6_column_to_extend1 = 'End date'
     df6_value_to_extend1 = df6.at[1, df6_column_to_extend1]
     df6[df6_column_to_extend1] = df6[df6_column_to_extend1].fillna(df6_value_to_extend1)
-    
+
     df6['Document date'] = pd.to_datetime(df6['Document date'])
     df6['Start date'] = pd.to_datetime(df6['Start date'])
     df6['End date'] = pd.to_datetime(df6['End date'])
 
-    # Function to check Document Date as it should be between start and end date
-    def document_date_check(row):
-        if pd.isna('Document date'):
-            return "Document Date is Blank"
-        elif pd.notna('Document date'):
-            if row['Document date'] > row['End date']:
-                return "Document date is not pertaining to this FY"
-            elif row['Document date'] < row['Start date']:
-                return "Document date is not pertaining to this FY"
-            else:
-                return "Correct"
-        
-    df6['Document Date check'] = df6.apply(document_date_check, axis=1)
-    
+    # To check Document Date as it should be between start and end date
+    df6['Document Date check'] = check_field(df6, 'Advances', 'date', "Correct", message="Document date is not pertaining to this FY")
+
     df6 = df6.drop(columns=["Start date", "End date"]) # Remove specified columnns
     df6 = df6.dropna(subset=df6.columns[0:28], how='all') # Remove unnecessarily created checks even if rows not contains Data
-            
-    
-    # -------------------------------------------* Processing of Amendments (CDN) Sheet *----------------------------------------------------
-    
+    return df6
+
+# -------------------------------------------* Processing of Amendments (CDN) Sheet *----------------------------------------------------
+
+def process_amendments_cdn(df5, df2):
     df5 = df5.iloc[5:] # Step 3: Set the 6th row as the header.
     header_row = df5.iloc[0]
     df5 = df5[1:]
     df5.columns = header_row
-    
-    # to select data from 1st column to 29th column 
+
+    # to select data from 1st column to 29th column
     df5 = df5.iloc[:, 1:30]
-    
-    # Function to check Origional Document number and Revised Document number
-    def document_number_check(row):
-        original_doc_num = row['Original document number']
-        revised_doc_num = row['Revised document number']
-        
-        if pd.isna(revised_doc_num):
-            if pd.isna(original_doc_num):
-                return "Original document number and Revised document number should not be blank"
-            else:
-                return "Revised document number should not be blank"
-        elif pd.isna(original_doc_num):
-            return "Original document number should not be blank"
-        elif original_doc_num == revised_doc_num:
-                return "Match"
-        else :
-            return "Didn't Match"
-
-    df5['Comp. Document number Check'] = df5.apply(document_number_check, axis=1)
-    
-    # Function to check Invoice number(should be less than or equal to 16)
-    def invoice_number_check(row):
-        revised_doc_num = row['Revised document number']
-        
-        if pd.notna(revised_doc_num):
-            revised_doc_num_str = str(revised_doc_num)
-            if len(revised_doc_num_str) <= 16:
-                return "Correct"
-            else:
-                return "Need to mention Invoice copy"
-        else:
-            return "Revised document number should not be blank"
+    df5 = apply_schema(df5, 'Amendments (CDN)')
 
-    df5['Invoice no Check'] = df5.apply(invoice_number_check, axis=1)
-    
-    # Function to check Origional Document Date and Revised Document date
-    def document_date_check(row):
-        original_date = row['Original document date']
-        revised_date = row['Revised document date']
-        
-        if pd.isna(revised_date):
-            if pd.isna(original_date):
-                return "Original document date and Revised document date should not be blank"
-            else:
-                return "Revised document date should not be blank"
-        elif pd.isna(original_date):
-            return "Original document date should not be blank"
-        elif original_date == revised_date:
-                return "Match"
-        else :
-            return "Didn't Match"
-
-    df5['Comp. Document date Check'] = df5.apply(document_date_check, axis=1)
+    # Rules to check Origional Document number and Revised Document number
+    revised_doc_num = df5['Revised document number']
+    document_number_rules = comparison_rules(df5['Original document number'], revised_doc_num,
+        "Original document number and Revised document number should not be blank", "Revised document number should not be blank", "Original document number should not be blank")
+
+    df5['Comp. Document number Check'] = evaluate_rules(df5, document_number_rules, "Didn't Match")
+
+    # Rules to check Invoice number(should be less than or equal to 16)
+    invoice_number_rules = [
+        (revised_doc_num.isna(), "Revised document number should not be blank"),
+        (text_length(revised_doc_num) <= 16, "Correct"),
+    ]
+
+    df5['Invoice no Check'] = evaluate_rules(df5, invoice_number_rules, "Need to mention Invoice copy")
+
+    # Rules to check Origional Document Date and Revised Document date
+    document_date_rules = comparison_rules(df5['Original document date'], df5['Revised document date'],
+        "Original document date and Revised document date should not be blank", "Revised document date should not be blank", "Original document date should not be blank")
+
+    df5['Comp. Document date Check'] = evaluate_rules(df5, document_date_rules, "Didn't Match")
     df5['GSTN Length check'] = df5.iloc[:, 13].str.len()
-    
-    # Function to check Origional GSTIN of recipient and Revised GSTIN of recipient
-    def gstn_recipient_check(row):
-        original_gstin = row['Original GSTIN of recipient']
-        revised_gstin = row['Revised GSTIN of recipient']
-        gstn_length_check = row['GSTN Length check']
-        
-        if pd.isna(revised_gstin):
-            if pd.isna(original_gstin):
-                return "Origional and Revised GSTIN Cannot be blank in case of registered supply"
-            else:
-                return "Revised GSTIN Cannot be blank in case of registered supply"
-        elif pd.isna(original_gstin):
-                return "Origional GSTIN Cannot be blank in case of registered supply"
-        elif gstn_length_check != 15:
-            return "Need to mention the correct GST Number"
-        elif original_gstin == revised_gstin:
-            return "Match"
-        elif gstn_length_check == 15:
-            return "Incorrect length of Revised GSTIN of recipient / Didn't match"
-        else:
-            return "Didn't match / Need to mention the correct GST Number. GSTIN is a 15-digit alphanumeric code. The first two digits represent the state code, the next 10 digits represent the PAN (Permanent Account Number) of the taxpayer, the 13th digit represents the number of registrations the entity has within a state, the 14th digit is the default 'Z', and the last digit is a checksum digit calculated using the Modulus 10 algorithm"
 
-    df5['Comp. GSTN of Recipient Check'] = df5.apply(gstn_recipient_check, axis=1)
-    
-    # Function to check Origional note type and Revised note type
-    def note_type_check(row):
-        original_note_type = row['Original note type']
-        revised_note_type = row['Revised note type']
-    
-        if pd.isna(revised_note_type):
-            if pd.isna(original_note_type):
-                return "Original note type and Revised note type should not be blank"
-            else:
-                return "Revised note type should not be blank"
-        elif pd.isna(original_note_type):
-            return "Original note type should not be blank"
-        elif original_note_type == revised_note_type:
-                return "Match"
-        else :
-            return "Didn't Match"
-
-    df5['Comp. Note type Check'] = df5.apply(note_type_check, axis=1)
-    
-    # Function to check Origional note Number and Revised note Number
-    def note_number_check(row):
-        original_note_number = row['Original note number']
-        revised_note_number = row['Revised note number']
- 
-        if pd.isna(revised_note_number):
-            if pd.isna(original_note_number):
-                return "Original note number and Revised note number should not be blank"
-            else:
-                return "Revised note number should not be blank"
-        elif pd.isna(original_note_number):
-            return "Original note number should not be blank"
-        elif original_note_number == revised_note_number:
-                return "Match"
-        else :
-            return "Didn't Match"
-
-    df5['Comp. Note number Check'] = df5.apply(note_number_check, axis=1)
-    
-    # Function to check Origional note Date and Revised note Date    
-    def note_date_check(row):
-        original_note_date = row['Original note date']
-        revised_note_date = row['Revised note date']
- 
-        if pd.isna(revised_note_date):
-            if pd.isna(original_note_date):
-                return "Original note date and Revised note date should not be blank"
-            else:
-                return "Revised note date should not be blank"
-        elif pd.isna(original_note_date):
-            return "Original note date should not be blank"
-        elif original_note_date == revised_note_date:
-                return "Match"
-        else :
-            return "Didn't Match"
-
-    df5['Comp. Note date Check'] = df5.apply(note_date_check, axis=1)
-    
-    # Function to check Revised HSN
-    def hsn_check(row):
-        revised_hsn = row['Revised HSN']
-        
-        if pd.notna(revised_hsn):
-            if revised_hsn > 99999999:
-                return "Need to mention correct HSN"
-            elif revised_hsn > 999:
-                return "Correct"
-            elif revised_hsn == 0:
-                return "HSN should not be blank"
-        
-        return "Need to mention correct HSN."
-
-    df5['HSN Check'] = df5.apply(hsn_check, axis=1)
-    
-    # Function to check Revised GST Rate
-    def gst_rate_check(row):
-        revised_rate = row['Revised rate (%)']
-        
-        if pd.notna(revised_rate):
-            if revised_rate == 0.28:
-                return 28
-            elif revised_rate == 28:
-                return 28
-            elif revised_rate == 0.18:
-                return 18
-            elif revised_rate == 18:
-                return 18
-            elif revised_rate == 0.12:
-                return 12
-            elif revised_rate == 12:
-                return 12
-            elif revised_rate == 0.05:
-                return 5
-            elif revised_rate == 5:
-                return 5
-            elif revised_rate == 0.025:
-                return 2.5
-            elif revised_rate == 2.5:
-                return 2.5
-            elif revised_rate == 0.01:
-                return 0.1
-            elif revised_rate == 0.03:
-                return 3
-            elif revised_rate == 3:
-                return 3
-        
-        return "Need to mention correct GST Rate"
-
-    df5['GST Rate Check'] = df5.apply(gst_rate_check, axis=1)
-
-    # Function to Find GST Difference
-    def calculate_gst_difference(row):
-        taxable_value = row[21]
-        gst_rate_check = row['GST Rate Check']
-        igst = row[22]
-        cgst = row[23]
-        sgst = row[24]
-        
-        # Check if any of the relevant columns are NaN
-        if pd.notna(taxable_value) and pd.notna(gst_rate_check) and pd.notna(igst) and pd.notna(cgst) and pd.notna(sgst):
-            gst_difference = (taxable_value * gst_rate_check / 100) - (igst + cgst + sgst)
-            return round(gst_difference, 0)
-        
-        return None
+    # Rules to check Origional GSTIN of recipient and Revised GSTIN of recipient
+    original_gstin = df5['Original GSTIN of recipient']
+    revised_gstin = df5['Revised GSTIN of recipient']
+    gstn_length_check = df5['GSTN Length check']
+    gstn_recipient_rules = [
+        (revised_gstin.isna() & original_gstin.isna(), "Origional and Revised GSTIN Cannot be blank in case of registered supply"),
+        (revised_gstin.isna(), "Revised GSTIN Cannot be blank in case of registered supply"),
+        (original_gstin.isna(), "Origional GSTIN Cannot be blank in case of registered supply"),
+        (gstn_length_check != 15, "Need to mention the correct GST Number"),
+        (original_gstin == revised_gstin, "Match"),
+        (gstn_length_check == 15, "Incorrect length of Revised GSTIN of recipient / Didn't match"),
+    ]
+
+    df5['Comp. GSTN of Recipient Check'] = evaluate_rules(df5, gstn_recipient_rules, "Didn't match / Need to mention the correct GST Number. GSTIN is a 15-digit alphanumeric code. The first two digits represent the state code, the next 10 digits represent the PAN (Permanent Account Number) of the taxpayer, the 13th digit represents the number of registrations the entity has within a state, the 14th digit is the default 'Z', and the last digit is a checksum digit calculated using the Modulus 10 algorithm")
+
+    # Rules to check Origional note type and Revised note type
+    note_type_rules = comparison_rules(df5['Original note type'], df5['Revised note type'],
+        "Original note type and Revised note type should not be blank", "Revised note type should not be blank", "Original note type should not be blank")
+
+    df5['Comp. Note type Check'] = evaluate_rules(df5, note_type_rules, "Didn't Match")
+
+    # Rules to check Origional note Number and Revised note Number
+    note_number_rules = comparison_rules(df5['Original note number'], df5['Revised note number'],
+        "Original note number and Revised note number should not be blank", "Revised note number should not be blank", "Original note number should not be blank")
+
+    df5['Comp. Note number Check'] = evaluate_rules(df5, note_number_rules, "Didn't Match")
+
+    # Rules to check Origional note Date and Revised note Date
+    note_date_rules = comparison_rules(df5['Original note date'], df5['Revised note date'],
+        "Original note date and Revised note date should not be blank", "Revised note date should not be blank", "Original note date should not be blank")
+
+    df5['Comp. Note date Check'] = evaluate_rules(df5, note_date_rules, "Didn't Match")
+
+    # To check Revised HSN
+    df5['HSN Check'] = check_field(df5, 'Amendments (CDN)', 'hsn', "Need to mention correct HSN.")
+
+    # To check Revised GST Rate
+    df5['GST Rate Check'] = check_field(df5, 'Amendments (CDN)', 'rate', "Need to mention correct GST Rate")
+
+    # To Find GST Difference, only when none of the relevant columns are NaN
+    df5['GST Diffrence'] = check_field(df5, 'Amendments (CDN)', 'gst_difference', all_required=True)
 
-    df5['GST Diffrence'] = df5.apply(calculate_gst_difference, axis=1)
-    
     mask1 = df5.iloc[:, 7].notna() # Create a boolean mask for non-null values
     df5.loc[mask1, df5.columns[7]] = df5.loc[mask1, df5.columns[7]].astype(str) # Convert non-null values to strings
     mask2 = df5.iloc[:, 13].notna() # Create a boolean mask for non-null values
     df5.loc[mask2, df5.columns[13]] = df5.loc[mask2, df5.columns[13]].astype(str) # Convert non-null values to strings
-    
+
     # Apply the .str.extract() method to the modified column
     df5['Original GSTIN of recipient - Copy'] = df5.loc[mask1, df5.columns[7]].str.extract(r'(\d{2})')
     df5['Revised GSTIN of recipient - Copy'] = df5.loc[mask2, df5.columns[13]].str.extract(r'(\d{2})')
-    
-    # Function to Check Origional Recipient GSTIN and Revised Recipient GSTIN
-    def compute_pos_recipient_gstin_check(row):
-        revised_recipient_gstin = row['Revised GSTIN of recipient - Copy']
-        origional_recipient_gstin = row['Original GSTIN of recipient - Copy']
-        
-        if pd.isna(revised_recipient_gstin):
-            if pd.isna(origional_recipient_gstin):
-                return "Revised and Origional GSTIN of recipients should not be blank"
-            else:
-                return "Revised GSTIN of recipients should not be blank"
-        elif pd.isna(origional_recipient_gstin):
-                return "Origional GSTIN of recipients should not be blank"
-        elif revised_recipient_gstin == origional_recipient_gstin:
-            return "Match"
-        else:
-            return "Incorrect POS need to check"
 
-    df5['POS & recipient GSTIN Check'] = df5.apply(compute_pos_recipient_gstin_check, axis=1)
-    df5 = df5.drop(columns=["Original GSTIN of recipient - Copy", "Revised GSTIN of recipient - Copy"]) #Remove specified columnns
-    
-    # Function to check Unusual transation by Revised HSN
-    def identify_unusual_transaction(row):
-        revised_hsn = row['Revised HSN']
-        
-        if revised_hsn == "9997":
-            return "This sort of recovery made need to check the transaction"
-        elif revised_hsn == "9965":
-            return "This sort of GTA Supply made need to check the transaction"
-        elif revised_hsn == "996601":
-            return "Motor vehicle provided on rent along with operator and cost of fuel is recovered in rent or Motor vehicle provided on rent along with operator but cost of fuel is not recovered in rent(Need to verify the GST Rate)"
-        elif revised_hsn == "9973":
-            return "Motor vehicle provided on rent without operator whether or not fuel cost is recovered in rent"
-        elif revised_hsn == "8703":
-            return "Prima facie it is sale of used car (Need to check the transaction)"
-        elif revised_hsn == "9972":
-            return "Prima facie it is renting of immovable property (Need to check the transaction)"
-        elif revised_hsn == "4902":
-            return "Prima facie it is supply of MEIS scripts (Need to check the transaction)"
-        elif revised_hsn == "8471":
-            return "Prima facie it is sale of used Laptops/Desktops (Need to check the transaction)"
-        elif revised_hsn == "997331":
-            return "Prima facie it is supply of Licensing services for the right to use computer software and databases (Need to check the transaction)"
-        elif revised_hsn == "9954":
-            return "Prima facie it is supply of works contract service (Need to check the transaction)"
-        elif revised_hsn == "0":
-            return "HSN should not be blank"
-        else:
-            return "-"
+    # Rules to Check Origional Recipient GSTIN and Revised Recipient GSTIN
+    pos_recipient_gstin_rules = comparison_rules(df5['Original GSTIN of recipient - Copy'], df5['Revised GSTIN of recipient - Copy'],
+        "Revised and Origional GSTIN of recipients should not be blank", "Revised GSTIN of recipients should not be blank", "Origional GSTIN of recipients should not be blank")
 
-    df5['Identification of unusal transaction by HSN'] = df5.apply(identify_unusual_transaction, axis=1)
-    
-    # To check if duplicate entries of any Origional document number is present
-    df5['Count'] = df5.groupby('Original document number')['Original document number'].transform('count')
-    df5['Origional Invoice Duplicates'] = df5['Count'].apply(lambda x: 'Unique' if x == 1 else 'Not Unique' if x > 1 else '-')
-    df5.drop(columns=['Count'], inplace=True)
-    
-    # To check if duplicate entries of any Revised document number is present
-    df5['Count'] = df5.groupby('Revised document number')['Revised document number'].transform('count')
-    df5['Revised Invoice Duplicates'] = df5['Count'].apply(lambda x: 'Unique' if x == 1 else 'Not Unique' if x > 1 else '-')
-    df5.drop(columns=['Count'], inplace=True)
-    
-    df5.reset_index(inplace=True, drop=True)
-    df2.reset_index(inplace=True, drop=True)
-    # Merge Doc. Series and Amendments (CDN) sheet and Save in Amendment(CDN) sheet
-    df5 = pd.concat([df2, df5], axis=1)
-    
-    df5_columns = df5.columns.tolist()
-    df5_new_columns = df5_columns[2:] + df5_columns[:2] # Move the first and second columns to the end
-    df5 = df5[df5_new_columns] # Reorganize the DataFrame columns
-    
-    # Extend Values for below cells  in Start date column
-    df5_column_to_extend = 'Start date'
-    df5_value_to_extend = df5.at[1, df5_column_to_extend]
-    df5[df5_column_to_extend] = df5[df5_column_to_extend].fillna(df5_value_to_extend)
-    
-    # Extend Values for below cells  in End date column
-    df5_column_to_extend1 = 'End date'
-    df5_value_to_extend1 = df5.at[1, df5_column_to_extend1]
-    df5[df5_column_to_extend1] = df5[df5_column_to_extend1].fillna(df5_value_to_extend1)
-    
-    df5['Original document date'] = pd.to_datetime(df5['Original document date'])
-    df5['Revised document date'] = pd.to_datetime(df5['Revised document date'])
-    df5['Start date'] = pd.to_datetime(df5['Start date'])
-    df5['End date'] = pd.to_datetime(df5['End date'])
-
-    # Function to check Origional Document Date as it should be between start and end date
-    def origional_document_date_check(row):
-        if pd.isna('Original document date'):
-            return "Original document date is Blank"
-        elif pd.notna('Original document date'):
-            if row['Original document date'] > row['End date']:
-                return "Origional Document Date is not pertaining to this FY"
-            elif row['Original document date'] < row['Start date']:
-                return "Origional Document Date is not pertaining to this FY"
-            else:
-                return "Correct"
-        
-    df5['Original document date check'] = df5.apply(origional_document_date_check, axis=1)
-    
-    # Function to check Revised Document Date as it should be between start and end date
-    def revised_document_date_check(row):
-        if pd.isna('Revised document date'):
-            return "Revised document date is Blank" 
-        elif pd.notna('Revised document date'):
-            if row['Revised document date'] > row['End date']:
-                return "Revised document date is not pertaining to this FY"
-            elif row['Revised document date'] < row['Start date']:
-                return "Revised document date is not pertaining to this FY"
-            else:
-                return "Correct"
-        
-    df5['Revised document date check'] = df5.apply(revised_document_date_check, axis=1)
-    
-    df5 = df5.drop(columns=["Start date", "End date"]) # Remove specified columnns
-    df5 = df5.dropna(subset=df5.columns[0:28], how='all') # Remove unnecessarily created checks even if rows not contains Data
-
-
-
-    # -------------------------------------------* Processing of Debit&CreditNotes Sheet *----------------------------------------------------
-    df4 = df4.iloc[4:]
-
-    # Step 3: Set the 6th row as the header.
-    header_row = df4.iloc[0]
-    df4 = df4[1:]
-    df4.columns = header_row
-    
-    # to select data from 1st column to 24th column 
-    df4 = df4.iloc[:, 1:25]
-    
-    # To check if duplicate entries of any Receipt voucher number is present
-    cndn_df4 = df4.groupby('Document number').size().reset_index(name='Count')
-    cndn_df4['Invoice Duplicates'] = cndn_df4['Count'].apply(lambda x: 'Unique' if x == 1 else 'Not Unique')
-    df4 = df4.merge(cndn_df4[['Document number', 'Invoice Duplicates']], on='Document number', how='left')
-    print(df4)
-    
-    # Function to check the length of GSTIN Number(Should be equal to 15)
-    def gstn_check(row):
-        if pd.notna(row[7]):
-            gst_length = len(str(row[7]))
-            if pd.isna(gst_length):
-                return "GSTIN Cannot be blank in case of registered supply"
-            elif gst_length == 15:
-                return "Correct"
-        return ""
-
-    df4['GSTN Check'] = df4.apply(gstn_check, axis=1)
-    
-    # Function to check Type of supply
-    def type_of_supply_check(row):
-        type_of_supply = row['Type of supply']
-
-        if pd.notna(type_of_supply):
-            if "Regular" in type_of_supply:
-                return "Correct"
-            elif "Export with" in type_of_supply:
-                return "It is a Zero-rated supply CGST+SGST should be blank"
-            elif "SEZ without" in type_of_supply:
-                return "It is a Zero-rated supply without payment all tax columns should be blank. Zero-rated supply under Goods and Services Tax (GST) refers to the supplies of goods or services that are taxable but have a GST rate of 0%."
-            elif "Export without" in type_of_supply:
-                return "It is a Zero-rated supply without payment all tax columns should be blank. Zero-rated supply under Goods and Services Tax (GST) refers to the supplies of goods or services that are taxable but have a GST rate of 0%."
-            elif "SEZ with" in type_of_supply:
-                return "It is a Zero-rated supply CGST+SGST should be blank"
-            elif "Exempt" in type_of_supply:
-                return "It is an exempt supply tax value should be blank"
-            else:
-                return "Prima facie it observes that it is other than Regular supply"
-        else :
-            return "It should not be blank"
-
-    df4['Type of Supply check'] = df4.apply(type_of_supply_check, axis=1)
-    
-    # Function to check Document Number(Should be less than or equal to 16)
-    def invoice_no_check(row):
-        document_number = row['Document number']
-        
-        if pd.notna(document_number) and len(str(document_number)) <= 16:
-            return "Correct"
-        else:
-            return "Need to check the Invoice copy"
-
-    df4['Invoice No Check'] = df4.apply(invoice_no_check, axis=1)
-    
-    # Function to check HSN
-    def hsn_check(row):
-        hsn_value = row['HSN ']
-        
-        if pd.notna(hsn_value):
-            if hsn_value > 99999999:
-                return "Need to mention correct HSN"
-            elif hsn_value > 999:
-                return "Correct"
-            elif hsn_value == 0:
-                return "HSN should not be blank"
-        
-        return "Need to mention correct HSN"
-
-    df4['HSN check'] = df4.apply(hsn_check, axis=1)
-    
-    # Function which converts any type of gst Rate into Number
-    def gst_rate_check(row):
-        rate_percent = row[15]
-        
-        if pd.notna(rate_percent):
-            if rate_percent == 0.28:
-                return 28
-            elif rate_percent == 28:
-                return 28
-            elif rate_percent == 0.18:
-                return 18
-            elif rate_percent == 18:
-                return 18
-            elif rate_percent == 0.12:
-                return 12
-            elif rate_percent == 12:
-                return 12
-            elif rate_percent == 0.05:
-                return 5
-            elif rate_percent == 5:
-                return 5
-            elif rate_percent == 0.025:
-                return 2.5
-            elif rate_percent == 2.5:
-                return 2.5
-            elif rate_percent == 0.01:
-                return 0.1
-            elif rate_percent == 0.03:
-                return 3
-            elif rate_percent == 3:
-                return 3
-        
-        return "Need to mention correct GST Rate"
-
-    df4['GST Rate Check'] = df4.apply(gst_rate_check, axis=1)
-    
-    # Function to Find GST Difference
-    def compute_gst_difference(row):
-        taxable_value = row[16]
-        igst = row[17]
-        cgst = row[18]
-        sgst_utgst = row[19]
-        gst_rate_check = row['GST Rate Check']
-        
-        # Check for NaN values and convert columns to numeric types
-        if pd.notna(taxable_value) and pd.notna(gst_rate_check):
-            return round((float(taxable_value) * float(gst_rate_check) / 100) - (float(igst) + float(cgst) + float(sgst_utgst)), 0)
-        else:
-            return None
-
-    df4['GST Difference'] = df4.apply(compute_gst_difference, axis=1)
-    
-    # Function to check Place of Supply and Recipients GSTIN
-    def compute_pos_recipient_gstin_check(row):
-        place_of_supply = row.iloc[8]
-        recipient_gstin = row.iloc[7]
-        
-        if pd.isna(place_of_supply):
-            if pd.isna(recipient_gstin):
-                return "Place of supply and GSTIN of recipients should not be blank"
-            else:
-                return "Place of supply should not be blank"
-        elif pd.isna(recipient_gstin):
-                return "GSTIN of recipients should not be blank"
-        elif place_of_supply == recipient_gstin:
-            return "Match"
-        else:
-            return "Incorrect POS need to check"
-
-    df4['POS & Recipient GSTIN Check'] = df4.apply(compute_pos_recipient_gstin_check, axis=1)
-    
-    # Function to check Unusual transation by HSN
-    def unusual_transaction_by_hsn(row):
-        hsn_value = row['HSN ']
-        
-        if hsn_value == 9997:
-            return "This sort of recovery made need to check the transaction"
-        elif hsn_value == 9965:
-            return "This sort of GTA Supply made need to check the transaction"
-        elif hsn_value == 996601:
-            return "Motor vehicle provided on rent along with operator and cost of fuel is recovered in rent or Motor vehicle provided on rent along with operator but cost of fuel is not recovered in rent (Need to verify the GST Rate)"
-        elif hsn_value == 9973:
-            return "Motor vehicle provided on rent without operator whether or not fuel cost is recovered in rent"
-        elif hsn_value == 8703:
-            return "Prima facie it is sale of used car (Need to check the transaction)"
-        elif hsn_value == 9972:
-            return "Prima facie it is renting of immovable property (Need to check the transaction)"
-        elif hsn_value == 4902:
-            return "Prima facie it is supply of MEIS scripts (Need to check the transaction)"
-        elif hsn_value == 8471:
-            return "Prima facie it is sale of used Laptops/Desktops (Need to check the transaction)"
-        elif hsn_value == 997331:
-            return "Prima facie it is supply of Licensing services for the right to use computer software and databases (Need to check the transaction)"
-        elif hsn_value == 9954:
-            return "Prima facie it is supply of works contract service (Need to check the transaction)"
-        else:
-            return "-"
-
-    df4['Identification of Unusual Transaction by HSN'] = df4.apply(unusual_transaction_by_hsn, axis=1)
-    
-    # Function to check Taxability
-    def taxability_check(row):
-        taxability_value = row['Taxability']
-        
-        if pd.notna(taxability_value):
-            if "Exempt" in taxability_value:
-                return "Exempt supply made by the Company which attracts reversal under rule 42 & 43"
-            elif taxability_value == "non GST":
-                return "It is a No GST supply hence tax amount should be zero"
-            elif taxability_value == "-":
-                return "It should not be blank"
-        
-        return "Normal taxable supply"
-
-    df4['Taxability Check'] = df4.apply(taxability_check, axis=1)
-    
-    df4.reset_index(inplace=True, drop=True)
-    df2.reset_index(inplace=True, drop=True)
-    # Merge Doc. Series and Debit&CreditNotes sheet and Save in Debit&CreditNotes sheet
-    df4 = pd.concat([df2, df4], axis=1)
-    
-    df4_columns = df4.columns.tolist()
-    df4_new_columns = df4_columns[2:] + df4_columns[:2] # Move the first and second columns to the end
-    df4 = df4[df4_new_columns] # Reorganize the DataFrame columns
-    
-    # Extend Values for below cells  in Start date column
-    df4_column_to_extend = 'Start date'
-    df4_value_to_extend = df4.at[1, df4_column_to_extend]
-    df4[df4_column_to_extend] = df4[df4_column_to_extend].fillna(df4_value_to_extend)
-    
-    # Extend Values for below cells  in End date column
-    df4_column_to_extend1 = 'End date'
-    df4_value_to_extend1 = df4.at[1, df4_column_to_extend1]
-    df4[df4_column_to_extend1] = df4[df4_column_to_extend1].fillna(df4_value_to_extend1)
-    
-    df4['Document date'] = pd.to_datetime(df4['Document date'])
-    df4['Start date'] = pd.to_datetime(df4['Start date'])
-    df4['End date'] = pd.to_datetime(df4['End date'])
-
-    # Function to check Document Date as it should be between start and end date
-    def document_date_check(row):
-        if pd.isna('Document date'):
-            return "Document Date is Blank"
-        elif pd.notna('Document date'):
-            if row['Document date'] > row['End date']:
-                return "Document date is not pertaining to this FY"
-            elif row['Document date'] < row['Start date']:
-                return "Document date is not pertaining to this FY"
-            else:
-                return "Correct"
-        
-    df4['Document Date check'] = df4.apply(document_date_check, axis=1)
-    df4 = df4.drop(columns=["Start date", "End date"]) # Remove specified columnns
-    
-    # function to check Reasons for issue
-    def reasons_for_issue_check(row):
-        reasons_value = row['Reasons for issue of credit/debit note']
-        
-        if pd.isna(reasons_value):
-            return "-"
-        else:
-            return "correct"
-
-    # Apply the function to create a new column 'Reasons for issue check'
-    df4['Reasons for issue check'] = df4.apply(reasons_for_issue_check, axis=1)
-    
-    df4 = df4.dropna(subset=df4.columns[0:23], how='all') # Remove unnecessarily created checks even if rows not contains Data
-    
-        
-    # -------------------------------------------* Processing of Amendments(Invoices) Sheet *----------------------------------------------------
-    
-    df3 = df3.iloc[5:]
-    # Step 3: Set the 6th row as the header.
-    header_row = df3.iloc[0]
-    df3 = df3[1:]
-    df3.columns = header_row
-    
-    # Remove the 1st to 37th column from the DataFrame
-    df3 = df3.iloc[:, 1:38]
-    
-    
-    # To check if duplicate entries of any Origional document number is present
-    dn_df3 = df3.groupby('Original document number').size().reset_index(name='Count')
-    dn_df3['Original Invoice Duplicates'] = dn_df3['Count'].apply(lambda x: 'Unique' if x == 1 else 'Not Unique')
-    df3 = df3.merge(dn_df3[['Original document number', 'Original Invoice Duplicates']], on='Original document number', how='left')
-    print(df3)
-    
-    # To check if duplicate entries of any Revised document number is present
-    rdn_df3 = df3.groupby('Revised document number').size().reset_index(name='Count')
-    rdn_df3['Revised Invoice Duplicates'] = rdn_df3['Count'].apply(lambda x: 'Unique' if x == 1 else 'Not Unique')
-    df3 = df3.merge(rdn_df3[['Revised document number', 'Revised Invoice Duplicates']], on='Revised document number', how='left')
-    print(df3)
-    
-    # Function to check the Origional and Revised Status of recipient
-    def compute_comp_status(row):
-        if row['Original status of recipient'] == row['Revised status of recipient']:
-            return "Match"
-        elif pd.isnull(row['Revised status of recipient']):
-            return "It should not be blank"
-        elif row['Revised status of recipient'] == "Unregister":
-            return "Changes made - Supply made to unregistered GSTN should be blank"
-        else:
-            return "Changes made - Supply made to registered GSTN should not be blank"
-
-    df3['Comp. Status Of Recipient Check'] = df3.apply(compute_comp_status, axis=1)
-    
-    # Function to check the Origional and Revised type of Supply
-    def compute_comp_type_of_supply(row):
-        revised_type_of_supply = row['Revised type of supply']
-        
-        if row['Original type of supply'] == revised_type_of_supply:
-            return "Match"
-        elif pd.isnull(revised_type_of_supply):
-            return "It should not be blank"
-        elif "SEZ supplies without" in revised_type_of_supply or "SEZ without" in revised_type_of_supply:
-            return "Changes made - It is a Zero-rated supply without payment all tax columns should be blank"
-        elif "SEZ supplies with" in revised_type_of_supply or "SEZ with" in revised_type_of_supply or "Export with" in revised_type_of_supply:
-            return "Changes made - It is a Zero-rated supply CGST+SGST should be blank"
-        elif "Exempt" in revised_type_of_supply:
-            return "Changes made - It is an exempt supply tax value should be blank"
-        elif "Regular" in revised_type_of_supply:
-            return "Correct"
-        elif "Export without" in revised_type_of_supply or "Export supplies without" in revised_type_of_supply:
-            return "Changes made - It is a Zero-rated supply without payment all tax columns should be blank"
-        else:
-            return "Prima facie it observes that it is other than Regular supply"
-
-    df3['Comp. Type Of Supply Check'] = df3.apply(compute_comp_type_of_supply, axis=1)
-    
-    # Function to check Taxibility
-    def compute_comp_taxability_check(row):
-        revised_taxability = row['Revised Taxability']
-        
-        if row['Original taxability'] == revised_taxability:
-            return "Match"
-        elif pd.isna(revised_taxability):
-            return "Should not be blank"
-        elif pd.notna(revised_taxability):
-            if "Exempt" in revised_taxability:
-                return "Changes made - Exempt supply made by the Company which attracts reversal under rule 42 & 43 also tax amount should be zero"
-            elif "non GST" in revised_taxability:
-                return "Changes made - It is a No GST supply hence tax amount should be zero"
-            elif revised_taxability == "-":
-                return "It should not be blank"
-            elif "Taxable" in revised_taxability:
-                return "Changes made - Normal taxable supply"
-        return "Didn't match"
-
-    df3['Comp. Taxability Check'] = df3.apply(compute_comp_taxability_check, axis=1)
-    
-    # Function to check the Origional and Revised type of Document
-    def compute_comp_type_of_document_check(row):
-        revised_type_of_document = row['Revised type of document']
-        
-        if row['Original type of documents'] == revised_type_of_document:
-            return "Match"
-        elif pd.isna(revised_type_of_document):
-            return "Should not be blank"
-        else:
-            return "Didn't match"
-
-    df3['Comp. Type of Document Check'] = df3.apply(compute_comp_type_of_document_check, axis=1)
-    
-    # Function to check the Origional and Revised Document Number
-    def compute_comp_document_number_check(row):
-        revised_document_number = row['Revised document number']
-        
-        if row['Original document number'] == revised_document_number:
-            return "Match"
-        elif pd.isna(revised_document_number):
-            return "It should not be blank"
-        else:
-            return "Didn't match / Need to check the Invoice copy"
-
-    df3['Comp. Document number Check'] = df3.apply(compute_comp_document_number_check, axis=1)
-    
-    # Function to check the length of Revised document Number
-    def compute_revised_doc_no_check(row):
-        revised_document_number = row['Revised document number']
-        
-        if len(str(revised_document_number)) <= 16:
-            return "Correct"
-        elif pd.isna(revised_document_number):
-            return "It should not be blank"
-        else:
-            return "Need to check the Invoice copy"
-
-    df3['Invoice no. Check'] = df3.apply(compute_revised_doc_no_check, axis=1)
-    
-    # Function to check the Origional and Revised Document Date
-    def compute_comp_document_date_check(row):
-        original_document_date = row['Original document date']
-        revised_document_date = row['Revised document date']
-        
-        if original_document_date == revised_document_date:
-            return "Match"
-        elif pd.isna(original_document_date):
-            return "It should not be blank"
-        else:
-            return "Didn't match"
-
-    df3['Comp. Document Date Check'] = df3.apply(compute_comp_document_date_check, axis=1)
-    
-    # Check the length of GST Number
-    df3['GSTN Length check'] = df3.iloc[14].apply(lambda x: len(str(x)))
-    
-    # Function to check the Origional GSTIN and Revised GSTIN
-    def compute_comp_gstn_of_recipient_check(row):
-        gstn_length_check = row['GSTN Length check']
-        original_gstin = row.iloc[7]
-        revised_gstin = row.iloc[14]
-        
-        if pd.isna(gstn_length_check):
-            return "GSTIN Cannot be blank in case of registered supply"
-        elif gstn_length_check != 15:
-            return "Need to mention the correct GST Number"
-        elif original_gstin == revised_gstin:
-            return "Match"
-        elif gstn_length_check == 15:
-            return "Revised Length Correct / Didn't match"
-        else:
-            return (
-                "Didn't match / Need to mention the correct GST Number, GSTIN is a 15-digit alphanumeric code. The first two digits represent the state code, the next 10 digits represent the PAN (Permanent Account Number) of the taxpayer, the 13th digit represents the number of registrations the entity has within a state, the 14th digit is the default 'Z', and the last digit is a checksum digit calculated using the Modulus 10 algorithm")
-
-    df3['Comp. GSTN of Recipient Check'] = df3.apply(compute_comp_gstn_of_recipient_check, axis=1)
-    
-    # Function to Check Revised HSN
-    def compute_hsn_check(row):
-        revised_hsn = row['Revised HSN']
-        
-        if revised_hsn > 99999999:
-            return "Need to mention correct HSN"
-        elif revised_hsn > 999:
-            return "Correct"
-        elif pd.isna(revised_hsn):
-            return "HSN should not be blank"
-        else:
-            return "Need to mention correct HSN"
-
-    df3['HSN Check'] = df3.apply(compute_hsn_check, axis=1)
-
-    # Function which converts any type of gst Rate into Number
-    def gst_rate_check(row):
-        rate_percent = row['Revised rate (%)']
-        
-        if pd.notna(rate_percent):
-            if rate_percent == 0.28:
-                return 28
-            elif rate_percent == 28:
-                return 28
-            elif rate_percent == 0.18:
-                return 18
-            elif rate_percent == 18:
-                return 18
-            elif rate_percent == 0.12:
-                return 12
-            elif rate_percent == 12:
-                return 12
-            elif rate_percent == 0.05:
-                return 5
-            elif rate_percent == 5:
-                return 5
-            elif rate_percent == 0.025:
-                return 2.5
-            elif rate_percent == 2.5:
-                return 2.5
-            elif rate_percent == 0.01:
-                return 0.1
-            elif rate_percent == 0.03:
-                return 3
-            elif rate_percent == 3:
-                return 3
-        
-        return "Need to mention correct GST Rate"
-
-    df3['GST Rate Check'] = df3.apply(gst_rate_check, axis=1)
-    
-    # Function to check the GST Difference
-    def compute_gst_difference(row):
-        revised_taxable_value = row['Revised taxable Value (Rs.)']
-        revised_igst = row.iloc[27]
-        revised_cgst = row.iloc[28]
-        revised_sgst_utgst = row.iloc[29]
-        gst_rate_check = row['GST Rate Check']
-        
-        # Check for NaN values and convert columns to numeric types
-        if pd.notna(revised_taxable_value) and pd.notna(gst_rate_check):
-            # Handle the case where the conversion fails using try and except
-            try:
-                taxable_value = float(revised_taxable_value)
-                igst = float(revised_igst)
-                cgst = float(revised_cgst)
-                sgst_utgst = float(revised_sgst_utgst)
-                rate_check = float(gst_rate_check)
-                
-                return round((taxable_value * rate_check / 100) - (igst + cgst + sgst_utgst), 0)
-            except ValueError:
-                return "Revised taxable Value (Rs.)/ IGST/ Revised IGST/ Revised CGST/ Revised SGST/UTGST Should not be blank"  
-        else:
-            return None
-
-    df3['GST Difference'] = df3.apply(compute_gst_difference, axis=1)
-    
-    # Function to check Revised Place of supply and Revised Recipients GSTIN
-    def compute_pos_recipient_gstin_check(row):
-        revised_place_of_supply = row.iloc[17]
-        revised_recipient_gstin = row.iloc[14]
-        
-        if pd.isna(revised_place_of_supply):
-            if pd.isna(revised_recipient_gstin):
-                return "Revised Place of supply and Revised GSTIN of recipients should not be blank"
-            else:
-                return "Revised Place of supply should not be blank"
-        elif pd.isna(revised_recipient_gstin):
-                return "Revised GSTIN of recipients should not be blank"
-        elif revised_place_of_supply == revised_recipient_gstin:
-            return "Match"
-        else:
-            return "Incorrect POS need to check"
-
-    df3['POS & Recipient GSTIN Check'] = df3.apply(compute_pos_recipient_gstin_check, axis=1)
-    
-    # Function to check Unusual transation by Revised HSN
-    def identify_unusual_transaction_by_hsn(row):
-        revised_hsn = row['Revised HSN']
-        
-        if revised_hsn == "9997":
-            return "This sort of recovery made need to check the transaction"
-        elif revised_hsn == "9965":
-            return "This sort of GTA Supply made need to check the transaction"
-        elif revised_hsn == "996601":
-            return "Motor vehicle provided on rent along with operator and cost of fuel is recovered in rent or Motor vehicle provided on rent along with operator but cost of fuel is not recovered in rent(Need to verify the GST Rate)"
-        elif revised_hsn == "9973":
-            return "Motor vehicle provided on rent without operator whether or not fuel cost is recovered in rent"
-        elif revised_hsn == "8703":
-            return "Prima facie it is sale of used car (Need to check the transaction)"
-        elif revised_hsn == "9972":
-            return "Prima facie it is renting of immovable property (Need to check the transaction)"
-        elif revised_hsn == "4902":
-            return "Prima facie it is supply of MEIS scripts (Need to check the transaction)"
-        elif revised_hsn == "8471":
-            return "Prima facie it is sale of used Laptops/Desktops (Need to check the transaction)"
-        elif revised_hsn == "997331":
-            return "Prima facie it is supply of Licensing services for the right to use computer software and databases (Need to check the transaction)"
-        elif revised_hsn == "9954":
-            return "Prima facie it is supply of works contract service (Need to check the transaction)"
-        elif pd.isna(revised_hsn):
-            return "HSN should not be blank"
-        else:
-            return "-"
-
-    df3['Identification of unusal transaction by HSN'] = df3.apply(identify_unusual_transaction_by_hsn, axis=1)
-    
-    # Function to check Unusual transation by Description
-    def identify_unusual_transaction_by_description(row):
-        revised_description = row['Revised description']
-        
-        if pd.notna(revised_description):
-            if "recovery" in revised_description:
-                return "Prima facie it is observed that some recovery made by the Company"
-            elif "reimb" in revised_description:
-                return "Prima facie it is observed that some reimbursement made by the Company"
-            elif "works contract" in revised_description:
-                return "Prima facie it is observed that works contract service provided by the Company"
-            elif "rent" in revised_description:
-                return "Prima facie it is observed that renting service provided by the Company (need to check the transaction)"
-            elif "scrap" in revised_description:
-                return "Prima facie it is observed that scrap sale is made by the Company"
-            elif "gift" in revised_description:
-                return "Prima facie it is observed that gift provided by the Company"
-            elif "dest" in revised_description:
-                return "Prima facie it is observed that material destroyed and sale made by the Company"
-            elif "stolen" in revised_description:
-                return "Prima facie it is observed that the material is stolen in the Company"
-            elif "lost" in revised_description:
-                return "Prima facie it is observed that some material is lost in the Company"
-            elif "disposed" in revised_description:
-                return "Prima facie it is observed that inputs/Capital goods disposed by the Company"
-            elif "free sample" in revised_description:
-                return "Prima facie it is observed that free sample supply made by the Company (Need to check whether ITC on the same is reversed)"
-            elif "written off" in revised_description:
-                return "Prima facie it is observed that made by the Company"
-            elif "cheque bounce" in revised_description:
-                return "Prima facie it is observed that recovery made by the Company"
-            elif "damage" in revised_description:
-                return "Prima facie it is observed that damage material sold by the Company"
-            elif "penalty" in revised_description:
-                return "Prima facie it is observed that penalty recovered by the Company"
-            elif "interest" in revised_description:
-                return "Prima facie it is observed that recovery made by the Company"
-            elif "delay" in revised_description:
-                return "Prima facie it is observed that recovery made by the Company"
-            elif "Interest" in revised_description:
-                return "Prima facie it is observed that penalty recovered by the Company"
-            elif "Works" in revised_description:
-                return "Prima facie it is observed that works contract service provided by the Company"
-            elif "Recovery" in revised_description:
-                return "Prima facie it is observed that some recovery made by the Company"
-        
-        return "Description should not be blank"
-
-    df3['Identification of unusual transaction by Description'] = df3.apply(identify_unusual_transaction_by_description, axis=1)
-    
-    # To check if duplicate entries of any Origional document number is present
-    df3['Count'] = df3.groupby('Original document number')['Original document number'].transform('count')
-    df3['Origional Invoice Duplicates'] = df3['Count'].apply(lambda x: 'Unique' if x == 1 else 'Not Unique' if x > 1 else '-')
-    df3.drop(columns=['Count'], inplace=True)
-    
-    # To check if duplicate entries of any Revised document number is present
-    df3['Count'] = df3.groupby('Revised document number')['Revised document number'].transform('count')
-    df3['Revised Invoice Duplicates'] = df3['Count'].apply(lambda x: 'Unique' if x == 1 else 'Not Unique' if x > 1 else '-')
-    df3.drop(columns=['Count'], inplace=True)
-    
-    # Function to check Revised Reverse Charge
-    def reverse_charge_check(row):
-        revised_reverse_charge = row['Revised applicability of Reverse Charge']
-        
-        if revised_reverse_charge in ["Yes", "Y", "y", "yes"]:
-            return "Prima facie it is observed that this transaction covered under reverse charge (Need to check)"
-        elif pd.isna(revised_reverse_charge):
-            return "It should not be blank"
-        else:
-            return "Forward Charge Supply"
-
-    df3['Reverse Charge Check'] = df3.apply(reverse_charge_check, axis=1)
-    
-    # Function to check Bill to Ship party GSTIN
-    def bill_to_ship_party_gstin_check(row):
-        bill_to_gstin = row.iloc[14]
-        ship_to_gstin = row.iloc[15]
-        
-        if bill_to_gstin == ship_to_gstin:
-            return "Same"
-        elif pd.isna(bill_to_gstin):
-            return "It shouldn't be blank"
-        else:
-            return "It is observed that bill to GST number is different than Ship to GST number"
-
-    df3['Bill to Ship party GSTIN Check'] = df3.apply(bill_to_ship_party_gstin_check, axis=1)
-    
-    # Function to check Revised shipping bill number
-    def shipping_bill_check(row):
-        shipping_bill_number = row['Revised shipping bill number']
-        
-        if pd.notna(shipping_bill_number):
-            if len(str(shipping_bill_number)) == 7:
-                return "Correct"
-            else:
-                return "Incorrect shipping bill details mentioned, need to correct the same"
-        else:
-            return "It should not be blank"
-
-    df3['Shipping bill Check'] = df3.apply(shipping_bill_check, axis=1)
-    
-    # Function to check Revised port code
-    def port_code_check(row):
-        port_code = row['Revised port code']
-        
-        if pd.notna(port_code):
-            if len(str(port_code)) == 6:
-                return "Correct"
-            else:
-                return "Need to mention correct port code"
-        else:
-            return "It should not be blank"
-
-    df3['Port Code Check'] = df3.apply(port_code_check, axis=1)
-    
-    df3.reset_index(inplace=True, drop=True)
-    df2.reset_index(inplace=True, drop=True)
-    # Merge Doc. Series and Amendments(Invoices) sheet and Save in Amendments(Invoices) sheet
-    df3 = pd.concat([df2, df3], axis=1)
-    
-    df3_columns = df3.columns.tolist()
-    df3_new_columns = df3_columns[2:] + df3_columns[:2] # Move the first and second columns to the end
-    df3 = df3[df3_new_columns] # Reorganize the DataFrame columns
-    
-    # Extend Values for below cells  in Start date column
-    df3_column_to_extend = 'Start date'
-    df3_value_to_extend = df3.at[1, df3_column_to_extend]
-    df3[df3_column_to_extend] = df3[df3_column_to_extend].fillna(df3_value_to_extend)
-    
-    # Extend Values for below cells  in End date column
-    df3_column_to_extend1 = 'End date'
-    df3_value_to_extend1 = df3.at[1, df3_column_to_extend1]
-    df3[df3_column_to_extend1] = df3[df3_column_to_extend1].fillna(df3_value_to_extend1)
-    
-    df3['Original document date'] = pd.to_datetime(df3['Original document date'])
-    df3['Revised document date'] = pd.to_datetime(df3['Revised document date'])
-    df3['Start date'] = pd.to_datetime(df3['Start date'])
-    df3['End date'] = pd.to_datetime(df3['End date'])
-
-    # Function to check Origional Document Date as it should be between start and end date
-    def origional_document_date_check(row):
-        if pd.isna('Original document date'):
-            return "Original document date is Blank"
-        elif pd.notna('Original document date'):
-            if row['Original document date'] > row['End date']:
-                return "Origional Document Date is not pertaining to this FY"
-            elif row['Original document date'] < row['Start date']:
-                return "Origional Document Date is not pertaining to this FY"
-            else:
-                return "Correct"
-        
-    df3['Original document date check'] = df3.apply(origional_document_date_check, axis=1)
-    
-    # Function to check Revised Document Date as it should be between start and end date
-    def revised_document_date_check(row):
-        if pd.isna('Revised document date'):
-            return "Revised document date is Blank"
-        elif pd.notna('Revised document date'):
-            if row['Revised document date'] > row['End date']:
-                return "Revised document date is not pertaining to this FY"
-            elif row['Revised document date'] < row['Start date']:
-                return "Revised document date is not pertaining to this FY"
-            else:
-                return "Correct"
-         
-    df3['Revised document date check'] = df3.apply(revised_document_date_check, axis=1)
-    
-    df3 = df3.drop(columns=["Start date", "End date"]) # Remove specified columnns
-    df3 = df3.dropna(subset=df3.columns[0:38], how='all') # Remove unnecessarily created checks even if rows not contains Data
-    
-    
-    # -------------------------------------------* Processing of Outward supply Sheet *----------------------------------------------------
-    
-    df1 = df1.iloc[5:]
-    # Step 3: Set the 6th row as the header.
-    header_row = df1.iloc[0]
-    df1 = df1[1:]
-    df1.columns = header_row
-    
-    # to select data from 1st column to 29th column
-    df1 = df1.iloc[:, 1:40]
-    
-    # Convert the "Document date" column to datetime, if it's not already
-    df1['Document date'] = pd.to_datetime(df1['Document date'])
-
-    # Extract only the date portion and overwrite the column
-    df1['Document date'] = df1['Document date'].dt.date
-    
-    # To check if duplicate entries of any Document number is present
-    result_df = df1.groupby('Document number').size().reset_index(name='Count')
-    result_df['Invoice duplicates check'] = result_df['Count'].apply(lambda x: 'Unique' if x == 1 else 'Not Unique')
-    df1 = df1.merge(result_df[['Document number', 'Invoice duplicates check']], on='Document number', how='left')
-    print(df1)
-    
-    # Checking GSTN is less than 16 only if Status of recipient is Registered
-    def check_gstn(status, gstin):
-        if status == 'Registered':
-            if len(str(gstin)) <= 15:
-                return 'Correct'
-            else:
-                return 'Incorrect / GSTIN should be blank'
-        else:
-            return ''
-
-    df1.loc['GSTN Check'] = df1.apply(lambda row: check_gstn(row.iloc[1], row.iloc[7]), axis=1)
-
-    # Function to check type of supply
-    def type_of_supply_check(type_of_supply):
-        if pd.notna(type_of_supply):
-            if "Regular" in type_of_supply:
-                return "Correct"
-            elif "Export with" in type_of_supply:
-                return "It is an Zero rated supply CGST+SGST should be blank."
-            elif "SEZ without" in type_of_supply:
-                return "It is a Zero rated supply without payment all tax columns should be blank. Zero-rated supply under Goods and Services Tax (GST) refers to the supplies of goods or services that are taxable but have a GST rate of 0%"
-            elif "Export without" in type_of_supply:
-                return "It is a Zero rated supply without payment all tax columns should be blank. Zero-rated supply under Goods and Services Tax (GST) refers to the supplies of goods or services that are taxable but have a GST rate of 0%"
-            elif "SEZ with" in type_of_supply:
-                return "It is an Zero rated supply CGST+SGST should be blank"
-            elif "Exempt" in type_of_supply:
-                return "It is an exempt supply tax value should be blank"
-            else:
-                return "Prima facie it observes that it is other than Regular supply"
-        else:
-            return "It should not be blank."
-
-    df1['Type of Supply check'] = df1['Type of supply'].apply(type_of_supply_check)
-    
-    # Adding the "Invoice No Length Check" column
-    df1['Invoice Check'] = df1['Document number'].apply(lambda x: 'It should not be blank' if pd.notna(x) and len(str(x)) > 0 else ('Correct' if len(str(x)) < 16 else 'Need to check the Invoice copy'))
-
-    
-    # Function to check HSN
-    def hsn_check(hsn):
-        if hsn > 99999999:
-            return "Need to mention correct HSN"
-        elif hsn > 999:
-            return "Correct"
-        elif hsn == 0:
-            return "HSN should not be blank"
-        else:
-            return "Need to mention correct HSN"
-
-    df1['HSN check'] = df1['HSN'].apply(hsn_check)
-    
-    # Function to check and convert Revised GST Rate
-    def gst_rate_check(row):
-        revised_rate = row['GST Rate (%)']
-        
-        if pd.notna(revised_rate):
-            if revised_rate == 0.28:
-                return 28
-            elif revised_rate == 28:
-                return 28
-            elif revised_rate == 0.18:
-                return 18
-            elif revised_rate == 18:
-                return 18
-            elif revised_rate == 0.12:
-                return 12
-            elif revised_rate == 12:
-                return 12
-            elif revised_rate == 0.05:
-                return 5
-            elif revised_rate == 5:
-                return 5
-            elif revised_rate == 0.025:
-                return 2.5
-            elif revised_rate == 2.5:
-                return 2.5
-            elif revised_rate == 0.01:
-                return 0.1
-            elif revised_rate == 0.03:
-                return 3
-            elif revised_rate == 3:
-                return 3
-        
-        return "Need to mention correct GST Rate"
-
-    df1['GST Rate Check'] = df1.apply(gst_rate_check, axis=1)
-    
-    # Function to calculate GST Difference
-    def compute_gst_difference(row):
-        taxable_value = row.iloc[19]
-        igst = row.iloc[20]
-        cgst = row.iloc[21]
-        sgst_utgst = row.iloc[22]
-        gst_rate_check = row['GST Rate Check']
-        
-        # Check for NaN values and convert columns to numeric types
-        if pd.notna(taxable_value) and pd.notna(gst_rate_check):
-            # Handle the case where the conversion fails using try and except
-            try:
-                taxable_value_f = float(taxable_value)
-                igst_f = float(igst)
-                cgst_f = float(cgst)
-                sgst_utgst_f = float(sgst_utgst)
-                rate_check = float(gst_rate_check)
-                
-                return round((taxable_value_f * rate_check / 100) - (igst_f + cgst_f + sgst_utgst_f), 0)
-            except ValueError:
-                return "Revised taxable Value (Rs.)/ IGST/ Revised IGST/ Revised CGST/ Revised SGST/UTGST Should not be blank"  
-        else:
-            return None
-
-    df1['GST Difference'] = df1.apply(compute_gst_difference, axis=1)
-    
-    mask = df1.iloc[:, 7].notna() # Create a boolean mask for non-null values
-    df1.loc[mask, df1.columns[7]] = df1.loc[mask, df1.columns[7]].astype(str) # Convert non-null values to strings
-    
-    # Apply the .str.extract() method to the modified column
-    df1['Recipients GSTIN - Copy'] = df1.loc[mask, df1.columns[7]].str.extract(r'(\d{2})')
-    df1['Place Of Supply - Copy'] = df1['Place Of Supply'].str.extract(r'(\d{2})')
-    
-    # Function to check Revised Place of supply and Revised Recipients GSTIN
-    def pos_recipient_check(row):
-        pos_copy = row['Place Of Supply - Copy']
-        gstin_copy = row['Recipients GSTIN - Copy']
-        
-        if pos_copy == gstin_copy:
-            return "Match"
-        elif pd.isna(pos_copy):
-            if pd.isna(gstin_copy):
-                return "Place of Supply and Recipients GSTIN need to check"
-            else:
-                return "Place of Supply need to check"
-        elif pd.isna(gstin_copy):
-                return "Recipients GSTIN need to check"
-
-    df1['POS & Recipient check'] = df1.apply(pos_recipient_check, axis=1)
-    
-    # Function to check Unusual transaction by HSN
-    def identify_unusual_transaction_by_hsn(hsn):
-        if pd.isna(hsn):
-            return "HSN should not be blank"
-        elif hsn == 9997:
-            return "This sort of recovery made need to check the transaction"
-        elif hsn == 9965:
-            return "This sort of GTA Supply made need to check the transaction"
-        elif hsn == 996601:
-            return "Motor vehicle provided on rent along with operator and cost of fuel is recovered in rent or Motor vehicle provided on rent along with operator but cost of fuel is not recovered in rent(Need to verify the GST Rate)"
-        elif hsn == 9973:
-            return "Motor vehicle provided on rent without operator whether or not fuel cost is recovered in rent"
-        elif hsn == 8703:
-            return "Prima facie it is sale of used car (Need to check the transaction)"
-        elif hsn == 9972:
-            return "Prima facie it is renting of immovable property (Need to check the transaction)"
-        elif hsn == 4902:
-            return "Prima facie it is supply of MEIS scripts (Need to check the transaction)"
-        elif hsn == 8471:
-            return "Prima facie it is sale of used Laptops/Desktops (Need to check the transaction)"
-        elif hsn == 997331:
-            return "Prima facie it is supply of Licensing services for the right to use computer software and databases (Need to check the transaction)"
-        elif hsn == 9954:
-            return "Prima facie it is supply of works contract service (Need to check the transaction)"
-        else:
-            return "-"  # Default case, modify this according to your requirement
-
-    df1['Identification of Unusal Transaction by HSN'] = df1['HSN'].apply(identify_unusual_transaction_by_hsn)
-    
-    
-    # Function to check Unusual transaction by Description
-    def identify_unusual_description(description):
-        if isinstance(description, str):
-            if "recovery" in description:
-                return "Prima facie it is observed that some recovery made by the Company"
-            elif "reimb" in description:
-                return "Prima facie it is observed that some reimbursement made by the Company"
-            elif "works contract" in description:
-                return "Prima facie it is observed that works contract service provided by the Company"
-            elif "rent" in description:
-                return "Prima facie it is observed that renting service provided by the Company (need to check the transaction)"
-            elif "scrap" in description:
-                return "Prima facie it is observed that scrap sale is made by the Company"
-            elif "gift" in description:
-                return "Prima facie it is observed that gift provided by the Company"
-            elif "dest" in description:
-                return "Prima facie it is observed that material destroyed and sale made by the Company"
-            elif "stolen" in description:
-                return "Prima facie it is observed that the material is stolen in the Company"
-            elif "lost" in description:
-                return "Prima facie it is observed that some material is lost in the Company"
-            elif "disposed" in description:
-                return "Prima facie it is observed that inputs/Capital goods disposed by the Company"
-            elif "free sample" in description:
-                return "Prima facie it is observed that free sample supply made by the Company (Need to check whether ITC on the same is reversed)"
-            elif "written off" in description:
-                return "Prima facie it is observed that made by the Company"
-            elif "cheque bounce" in description:
-                return "Prima facie it is observed that recovery made by the Company"
-            elif "damage" in description:
-                return "Prima facie it is observed that damage material sold by the Company"
-            elif "penalty" in description:
-                return "Prima facie it is observed that penalty recovered by the Company"
-            elif "interest" in description:
-                return "Prima facie it is observed that recovery made by the Company"
-            elif "delay" in description:
-                return "Prima facie it is observed that recovery made by the Company"
-            elif "Interest" in description:
-                return "Prima facie it is observed that penalty recovered by the Company"
-            elif "Works" in description:
-                return "Prima facie it is observed that works contract service provided by the Company"
-            elif "Recovery" in description:
-                return "Prima facie it is observed that some recovery made by the Company"
-            elif "Reimb" in description:
-                return "Prima facie it is observed that some reimbursement made by the Company"
-            elif "Rent" in description:
-                return "Prima facie it is observed that renting service provided by the Company (need to check the transaction)"
-            elif "Scrap" in description:
-                return "Prima facie it is observed that scrap sale is made by the Company"
-            elif "Gift" in description:
-                return "Prima facie it is observed that gift provided by the Company"
-            elif "Dest" in description:
-                return "Prima facie it is observed that material destroyed and sale made by the Company"
-            elif "Stolen" in description:
-                return "Prima facie it is observed that the material is stolen in the Company"
-            elif "Lost" in description:
-                return "Prima facie it is observed that some material is lost in the Company"
-            elif "Disposed" in description:
-                return "Prima facie it is observed that inputs/Capital goods disposed by the Company"
-            elif "Free sample" in description:
-                return "Prima facie it is observed that free sample supply made by the Company (Need to check whether ITC on the same is reversed)"
-            elif "Written off" in description:
-                return "Prima facie it is observed that made by the Company"
-            elif "Cheque" in description:
-                return "Prima facie it is observed that recovery made by the Company"
-            elif "Damage" in description:
-                return "Prima facie it is observed that damage material sold by the Company"
-            elif "Penalty" in description:
-                return "Prima facie it is observed that penalty recovered by the Company"
-            elif "Delay" in description:
-                return "Prima facie it is observed that recovery made by the Company"
-        return "-"
-
-    df1['Identification of Unusual Transaction by Description'] = df1['Description'].apply(identify_unusual_description)
-    
-    # Function to check Bill to ship party GSTIN
-    def bill_to_ship_party_gstin_check(row):
-        if pd.isna(row.iloc[7]) or pd.isna(row.iloc[8]):
-            return "-"
-        elif row.iloc[7] == row.iloc[8]:
-            return "Same"
-        else:
-            return "It is observed that bill to GST number is different than Ship to GST number"
-
-    df1['Bill to Ship Party GSTIN Check'] = df1.apply(bill_to_ship_party_gstin_check, axis=1)
-    
-    # Function to check Taxability
-    def taxability_check(row):
-        # Convert 'Taxability' column to string data type within the function
-        taxability = str(row["Taxability"])
-
-        if "Exempt" in taxability:
-            return "Exempt supply made by the Company which attracts reversal under rule 42 & 43 also tax amount should be zero. Exempt supply under Goods and Services Tax (GST) refers to the supply of goods or services that are not taxable under GST."
-        elif taxability == "non GST":
-            return "It is a No GST supply hence tax amount should be zero"
-        else:
-            return "Normal taxable supply"
-
-    df1['Taxability Check'] = df1.apply(taxability_check, axis=1)
-
-    # Function to check Reverse Charge
-    def reverse_charge_check(row):
-        value = row["Applicability of Reverse Charge"]
-        if pd.isna(value):
-            return "It should not be blank"
-        elif value.lower() in ["yes", "y"]:
-            return "Prima facie it is observed that this transaction is covered under reverse charge (Need to check)"
-        else:
-            return "Forward Charge Supply"
-
-    df1['Reverse Charge Check'] = df1.apply(reverse_charge_check, axis=1)
-    
-    # Calculating length of Shipping bill number
-    df1['SB Length'] = df1['Shipping bill number'].apply(lambda x: len(str(x)) if pd.notna(x) and str(x) != '-' else None)
-
-    # Function to check Shipping bill number
-    def shipping_bill_check(row):
-        value = row["SB Length"]
-        if pd.isna(value):
-            return "-"
-        elif value == 7:
-            return "Correct"
-        else:
-            return "Incorrect shipping bill details mentioned, need to correct the same"
-
-    df1['Shipping bill check'] = df1.apply(shipping_bill_check, axis=1)
-
-    df1['Port Code Length'] = df1['Port code'].str.len()
-    
-    # Function to check port code length(Should be equa to 6)
-    def port_code_check(row):
-        value = row["Port Code Length"]
-        if pd.isna(value):
-            return "It should not be blank"
-        elif value == 6:
-            return "Correct"
-        else:
-            return "Need to mention correct port code"
-
-    df1['Port code check'] = df1.apply(port_code_check, axis=1)
-    df1 = df1.drop(columns=["SB Length", "Port Code Length"])
-    
-    print(df1.index.duplicated().any())
-    
-    df1.reset_index(inplace=True, drop=True)
-    df2.reset_index(inplace=True, drop=True)
-    # Merge Doc. Series and Outward supply sheet and Save in Outward supply sheet
-    df1 = pd.concat([df2, df1], axis=1)
-    
-    df1_columns = df1.columns.tolist()
-    df1_new_columns = df1_columns[2:] + df1_columns[:2] # Move the first and second columns to the end
-    df1 = df1[df1_new_columns] # Reorganize the DataFrame columns
-    
-    # Extend Values for below cells  in Start date column
-    df1_column_to_extend = 'Start date'
-    df1_value_to_extend = df1.at[1, df1_column_to_extend]
-    df1[df1_column_to_extend] = df1[df1_column_to_extend].fillna(df1_value_to_extend)
-    
-    # Extend Values for below cells  in End date column
-    df1_column_to_extend1 = 'End date'
-    df1_value_to_extend1 = df1.at[1, df1_column_to_extend1]
-    df1[df1_column_to_extend1] = df1[df1_column_to_extend1].fillna(df1_value_to_extend1)
-    
-    df1['Document date'] = pd.to_datetime(df1['Document date'])
-    df1['Start date'] = pd.to_datetime(df1['Start date'])
-    df1['End date'] = pd.to_datetime(df1['End date'])
+    df5['POS & recipient GSTIN Check'] = evaluate_rules(df5, pos_recipient_gstin_rules, "Incorrect POS need to check")
+    df5 = df5.drop(columns=["Original GSTIN of recipient - Copy", "Revised GSTIN of recipient - Copy"]) #Remove specified columnns
 
-    # Function to check Document Date as it should be between start and end date
-    def document_date_check(row):
-        if pd.isna('Document date'):
-            return "Document Date is Blank"
-        elif pd.notna('Document date'):
-            if row['Document date'] > row['End date']:
-                return "Document date is not pertaining to this FY"
-            elif row['Document date'] < row['Start date']:
-                return "Document date is not pertaining to this FY"
-            else:
-                return "Correct"
-        
-    df1['Document Date check'] = df1.apply(document_date_check, axis=1)
-    
-    df1 = df1.drop(columns=["Start date", "End date"]) # Remove specified columnns
-    df1 = df1.dropna(subset=df1.columns[0:38], how='all') # Remove unnecessarily created checks even if rows not contains Data
-    # columns_to_remove_df1 = [20, 22, 26,28, 29, 37, 39, 41, 43, 45]
-    # df1 = df1.drop(df1.columns[columns_to_remove_df1], axis=1)
+    # Rules to check Unusual transation by Revised HSN
+    revised_hsn = df5['Revised HSN']
+    hsn_remark = unusual_hsn_remark(revised_hsn)
+    unusual_transaction_rules = [
+        (hsn_remark.notna(), hsn_remark),
+        (revised_hsn == "0", "HSN should not be blank"),
+    ]
 
-    with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
-        df1.to_excel(writer, sheet_name='Outward supply', index=False)
-        df3.to_excel(writer, sheet_name='Amendments(Invoices)', index=False)
-        df4.to_excel(writer, sheet_name='Debit&CreditNotes', index=False)
-        df5.to_excel(writer, sheet_name='Amendments (CDN)', index=False)
-        df6.to_excel(writer, sheet_name='Advances', index=False)
-        df7.to_excel(writer, sheet_name='Amendment(Advances)', index=False)
-    return file_path
-
-def process_step2(file_path):
-    xls = pd.ExcelFile(file_path)
-    
-    df1 = pd.read_excel(xls, sheet_name="Outward supply")
-    df3 = pd.read_excel(xls, sheet_name="Amendments(Invoices)")
-    df4 = pd.read_excel(xls, sheet_name="Debit&CreditNotes")
-    df5 = pd.read_excel(xls, sheet_name="Amendments (CDN)")
-    df6 = pd.read_excel(xls, sheet_name="Advances")
-    df7 = pd.read_excel(xls, sheet_name="Amendment(Advances)")
-    
+    df5['Identification of unusal transaction by HSN'] = evaluate_rules(df5, unusual_transaction_rules, "-")
+
+    # To check if duplicate entries of any Origional document number is present
+    df5['Count'] = df5.groupby('Original document number')['Original document number'].transform('count')
+    df5['Origional Invoice Duplicates'] = uniqueness_check(df5['Count'])
+    df5.drop(columns=['Count'], inplace=True)
+
+    # To check if duplicate entries of any Revised document number is present
+    df5['Count'] = df5.groupby('Revised document number')['Revised document number'].transform('count')
+    df5['Revised Invoice Duplicates'] = uniqueness_check(df5['Count'])
+    df5.drop(columns=['Count'], inplace=True)
 
-    b2b = df1.loc[df1['Taxability'] == 'Taxable']
+    df5.reset_index(inplace=True, drop=True)
+    df2.reset_index(inplace=True, drop=True)
+    # Merge Doc. Series and Amendments (CDN) sheet and Save in Amendment(CDN) sheet
+    df5 = pd.concat([df2, df5], axis=1)
 
-    # Dataframe will contain Selected columns only
-    selected_columns_indices = [1, 2, 5, 6, 7, 9, 10, 12, 13, 18, 19, 21, 23, 25, 27, 29]  # Indices of the columns you want to select (0-based index)
-    b2b = b2b.iloc[:, selected_columns_indices]
+    df5_columns = df5.columns.tolist()
+    df5_new_columns = df5_columns[2:] + df5_columns[:2] # Move the first and second columns to the end
+    df5 = df5[df5_new_columns] # Reorganize the DataFrame columns
 
-    b2b["Applicable % of Tax Rate"] = None
+    # Extend Values for below cells  in Start date column
+    df5_column_to_extend = 'Start date'
+    df5_value_to_extend = df5.at[1, df5_column_to_extend]
+    df5[df5_column_to_extend] = df5[df5_column_to_extend].fillna(df5_value_to_extend)
 
-    # Selected entries from particular column will be deleted
-    values_to_remove = ['Employee recoveries', 'Export with payment', 'Export without payment']
-    b2b = b2b[~b2b['Type of supply'].isin(values_to_remove)]
+    # Extend Values for below cells  in End date column
+    df5_column_to_extend1 = 'End date'
+    df5_value_to_extend1 = df5.at[1, df5_column_to_extend1]
+    df5[df5_column_to_extend1] = df5[df5_column_to_extend1].fillna(df5_value_to_extend1)
 
-    # Selected entries from particular column will be remained in the dataframe
-    b2b = b2b.loc[b2b['Status of recipient'] == 'Registered']
+    df5['Original document date'] = pd.to_datetime(df5['Original document date'])
+    df5['Revised document date'] = pd.to_datetime(df5['Revised document date'])
+    df5['Start date'] = pd.to_datetime(df5['Start date'])
+    df5['End date'] = pd.to_datetime(df5['End date'])
 
-    # Dataframe will contain Selected columns with the given order
-    selected_columns_reordered = [4,5,2,3,15,6,7,16,1,8,9,10,14,11,12,13,0]  # Indices of the columns you want to select (0-based index)
-    b2b = b2b.iloc[:, selected_columns_reordered]
+    # To check Origional Document Date as it should be between start and end date
+    df5['Original document date check'] = check_field(df5, 'Amendments (CDN)', 'date', "Correct",
+        message="Origional Document Date is not pertaining to this FY", date_field='original_date')
 
+    # To check Revised Document Date as it should be between start and end date
+    df5['Revised document date check'] = check_field(df5, 'Amendments (CDN)', 'date', "Correct",
+        message="Revised document date is not pertaining to this FY")
 
-    b2cs = df1.loc[df1['Taxability'] == 'Taxable']
+    df5 = df5.drop(columns=["Start date", "End date"]) # Remove specified columnns
+    df5 = df5.dropna(subset=df5.columns[0:28], how='all') # Remove unnecessarily created checks even if rows not contains Data
+    return df5
 
-    # Selected entries from particular column will be remained in the dataframe
-    b2cs = b2cs[(b2cs['Type of supply'].isin(['Employee recoveries', 'Regular', 'Regular B2B'])) & (b2cs['Status of recipient'] == 'Unregistered')]
+# -------------------------------------------* Processing of Debit&CreditNotes Sheet *----------------------------------------------------
 
-    b2cs = b2cs[b2cs.iloc[:, 29] <= 250000]
+def process_debit_credit_notes(df4, df2):
+    df4 = df4.iloc[4:]
 
-    b2cs["Applicable % of Tax Rate"] = None
-    b2cs['blank column'] = None
+    # Step 3: Set the 6th row as the header.
+    header_row = df4.iloc[0]
+    df4 = df4[1:]
+    df4.columns = header_row
 
-    selected_columns_reordered1 = [67,10,18,66,19,27,13,21,23,25,2,1]  # Indices of the columns you want to select (0-based index)
-    b2cs = b2cs.iloc[:, selected_columns_reordered1]
+    # to select data from 1st column to 24th column
+    df4 = df4.iloc[:, 1:25]
+    df4 = apply_schema(df4, 'Debit&CreditNotes')
 
-    # Selected entries from particular column will be remained in the dataframe
-    b2cl = df1.loc[df1['Taxability'] == 'Taxable']
-    # Selected entries from particular column will be remained in the dataframe
-    b2cl = b2cl[(b2cl['Type of supply'] == 'Regular') | (b2cl['Type of supply'] == 'Regular B2B')]
-    b2cl = b2cl.loc[b2cl['Status of recipient'] == 'Unregistered']
+    # To check if duplicate entries of any Receipt voucher number is present
+    cndn_df4 = df4.groupby('Document number').size().reset_index(name='Count')
+    cndn_df4['Invoice Duplicates'] = np.where(cndn_df4['Count'] == 1, 'Unique', 'Not Unique')
+    df4 = df4.merge(cndn_df4[['Document number', 'Invoice Duplicates']], on='Document number', how='left')
+    print(df4)
 
-    b2cl["Applicable % of Tax Rate"] = None
+    # To check the length of GSTIN Number(Should be equal to 15)
+    df4['GSTN Check'] = np.where(df4.iloc[:, 7].notna() & (text_length(df4.iloc[:, 7]) == 15), "Correct", "")
+
+    # Rules to check Type of supply
+    type_of_supply = df4['Type of supply']
+    type_of_supply_rules = [
+        (type_of_supply.isna(), "It should not be blank"),
+        (contains_text(type_of_supply, "Regular"), "Correct"),
+        (contains_text(type_of_supply, "Export with"), "It is a Zero-rated supply CGST+SGST should be blank"),
+        (contains_text(type_of_supply, "SEZ without"), "It is a Zero-rated supply without payment all tax columns should be blank. Zero-rated supply under Goods and Services Tax (GST) refers to the supplies of goods or services that are taxable but have a GST rate of 0%."),
+        (contains_text(type_of_supply, "Export without"), "It is a Zero-rated supply without payment all tax columns should be blank. Zero-rated supply under Goods and Services Tax (GST) refers to the supplies of goods or services that are taxable but have a GST rate of 0%."),
+        (contains_text(type_of_supply, "SEZ with"), "It is a Zero-rated supply CGST+SGST should be blank"),
+        (contains_text(type_of_supply, "Exempt"), "It is an exempt supply tax value should be blank"),
+    ]
 
-    def categorize_type(row):
-        if "Regular" in row['Type of supply']:
-            return "Unreg/Regular"
-        elif "Regular B2B" in row['Type of supply']:
-            return "Unreg/Regular"
-        elif "Export with payment" in row['Type of supply']:
-            return "EWP/EWOP"
-        elif "Export without payment" in row['Type of supply']:
-            return "EWP/EWOP"
-        else:
-            return None
+    df4['Type of Supply check'] = evaluate_rules(df4, type_of_supply_rules, "Prima facie it observes that it is other than Regular supply")
 
-    b2cl['Type'] = b2cl.apply(categorize_type, axis=1)
+    # To check Document Number(Should be less than or equal to 16)
+    document_number = df4['Document number']
+    df4['Invoice No Check'] = np.where(document_number.notna() & (text_length(document_number) <= 16), "Correct", "Need to check the Invoice copy")
 
-    def categorize_custom(row):
-        if row['Type'] == 'EWP/EWOP':
-            return row['Type']
-        elif row['Invoice value (Rs.)'] >= 250000:
-            return row['Type']
-        else:
-            return None
+    # To check HSN
+    df4['HSN check'] = check_field(df4, 'Debit&CreditNotes', 'hsn', "Need to mention correct HSN")
 
-    b2cl['Custom'] = b2cl.apply(categorize_custom, axis=1)
+    # Converts any type of gst Rate into Number
+    df4['GST Rate Check'] = check_field(df4, 'Debit&CreditNotes', 'rate', "Need to mention correct GST Rate")
 
-    b2cl = b2cl[b2cl['Custom'].notnull()]
+    # To Find GST Difference
+    df4['GST Difference'] = check_field(df4, 'Debit&CreditNotes', 'gst_difference')
 
-    selected_columns_reordered2 = [5,6,29,10,66,18,19,27,13,21,23,25,2,1]  # Indices of the columns you want to select (0-based index)
-    b2cl = b2cl.iloc[:, selected_columns_reordered2]
+    # Rules to check Place of Supply and Recipients GSTIN
+    pos_recipient_gstin_rules = comparison_rules(sheet_field(df4, 'Debit&CreditNotes', 'gstin'), sheet_field(df4, 'Debit&CreditNotes', 'pos'),
+        "Place of supply and GSTIN of recipients should not be blank", "Place of supply should not be blank", "GSTIN of recipients should not be blank")
 
-    b2ba = df3.copy()
-    b2ba["Applicable % of Tax Rate"] = None
+    df4['POS & Recipient GSTIN Check'] = evaluate_rules(df4, pos_recipient_gstin_rules, "Incorrect POS need to check")
 
-    b2ba = b2ba[
-    (b2ba['Revised type of supply'].notnull()) &
-    (b2ba['Revised type of supply'] != 'Export with payment') &
-    (b2ba['Revised type of supply'] != 'Export without payment') &
-    (b2ba['Revised type of supply'] != 'Highseas sale') &
-    (b2ba['Revised status of recipient'] == 'Registered')
+    # Rules to check Unusual transation by HSN
+    hsn_value = df4['HSN ']
+    # Debit&CreditNotes words the 996601 remark with a space before "(Need"
+    hsn_remark = unusual_hsn_remark(hsn_value, numeric=True)
+    hsn_remark = hsn_remark.where(hsn_remark.isna(), hsn_remark.astype(str).str.replace("rent(Need", "rent (Need", regex=False))
+    unusual_transaction_rules = [
+        (hsn_remark.notna(), hsn_remark),
     ]
-    
-    selected_columns_reordered2 = [14,16,5,6,12,13,31,17,19,61,9,20,25,26,30,27,28,29,1,2,8]  # Indices of the columns you want to select (0-based index)
-    b2ba = b2ba.iloc[:, selected_columns_reordered2]
-
-    b2cla = df3.copy()
-    b2cla["Applicable % of Tax Rate"] = None
-
-    b2cla = b2cla[
-    (b2cla['Revised type of supply'].notnull()) |
-    (b2cla['Revised type of supply'] == 'Export with payment') |
-    (b2cla['Revised type of supply'] == 'Export without payment') |
-    (b2cla['Revised type of supply'] == 'Regular') |
-    (b2cla['Revised type of supply'] == 'Regular B2B')
+
+    df4['Identification of Unusual Transaction by HSN'] = evaluate_rules(df4, unusual_transaction_rules, "-")
+
+    # Rules to check Taxability
+    taxability_value = df4['Taxability']
+    taxability_rules = [
+        (contains_text(taxability_value, "Exempt"), "Exempt supply made by the Company which attracts reversal under rule 42 & 43"),
+        (taxability_value == "non GST", "It is a No GST supply hence tax amount should be zero"),
+        (taxability_value == "-", "It should not be blank"),
     ]
 
-    b2cla = b2cla[(b2cla['Revised status of recipient'] == 'Unregistered')]
-
-    def categorize_type(row):
-        if row['Revised type of supply'] == 'Regular':
-            return 'Unregistered/Regular'
-        elif row['Revised type of supply'] == 'Regular B2B':
-            return 'Unregistered/Regular'
-        elif row['Revised type of supply'] == 'Export with payment':
-            return 'EWP/EWOP'
-        elif row['Revised type of supply'] == 'Export without payment':
-            return 'EWP/EWOP'
-        else:
-            return None
+    df4['Taxability Check'] = evaluate_rules(df4, taxability_rules, "Normal taxable supply")
 
-    b2cla['Type'] = b2cla.apply(categorize_type, axis=1)
+    df4.reset_index(inplace=True, drop=True)
+    df2.reset_index(inplace=True, drop=True)
+    # Merge Doc. Series and Debit&CreditNotes sheet and Save in Debit&CreditNotes sheet
+    df4 = pd.concat([df2, df4], axis=1)
 
-    def categorize_custom(row):
-        if row['Type'] == 'EWP/EWOP':
-            return row['Type']
-        elif row['Revised Invoice value (Rs.)'] >= 250000:
-            return row['Type']
-        else:
-            return None
+    df4_columns = df4.columns.tolist()
+    df4_new_columns = df4_columns[2:] + df4_columns[:2] # Move the first and second columns to the end
+    df4 = df4[df4_new_columns] # Reorganize the DataFrame columns
 
-    b2cla['Custom'] = b2cla.apply(categorize_custom, axis=1)
+    # Extend Values for below cells  in Start date column
+    df4_column_to_extend = 'Start date'
+    df4_value_to_extend = df4.at[1, df4_column_to_extend]
+    df4[df4_column_to_extend] = df4[df4_column_to_extend].fillna(df4_value_to_extend)
 
-    b2cla = b2cla[b2cla['Custom'].notnull()]
+    # Extend Values for below cells  in End date column
+    df4_column_to_extend1 = 'End date'
+    df4_value_to_extend1 = df4.at[1, df4_column_to_extend1]
+    df4[df4_column_to_extend1] = df4[df4_column_to_extend1].fillna(df4_value_to_extend1)
 
-    selected_columns_reordered3 = [5,6,17,12,13,31,25,26,27,28,29,30,8,9,61]  # Indices of the columns you want to select (0-based index)
-    b2cla = b2cla.iloc[:, selected_columns_reordered3]
+    df4['Document date'] = pd.to_datetime(df4['Document date'])
+    df4['Start date'] = pd.to_datetime(df4['Start date'])
+    df4['End date'] = pd.to_datetime(df4['End date'])
 
-    exp=df1.copy()
+    # To check Document Date as it should be between start and end date
+    df4['Document Date check'] = check_field(df4, 'Debit&CreditNotes', 'date', "Correct", message="Document date is not pertaining to this FY")
+    df4 = df4.drop(columns=["Start date", "End date"]) # Remove specified columnns
 
-    exp = exp[(exp['Type of supply'] == 'Export with payment') | (exp['Type of supply'] == 'Export without payment')]
+    # To check Reasons for issue
+    df4['Reasons for issue check'] = np.where(df4['Reasons for issue of credit/debit note'].isna(), "-", "correct")
 
-    selected_columns_reordered3 = [2,5,6,29,32,30,31,18,19,27,21,23,25,1]  # Indices of the columns you want to select (0-based index)
-    exp = exp.iloc[:, selected_columns_reordered3]
+    df4 = df4.dropna(subset=df4.columns[0:23], how='all') # Remove unnecessarily created checks even if rows not contains Data
+    return df4
 
-    exemp = df1.loc[df1['Taxability'] == 'Taxable']
-    selected_columns_reordered4 = [1,2,3,19]  # Indices of the columns you want to select (0-based index)
-    exemp = exemp.iloc[:, selected_columns_reordered4]
+# -------------------------------------------* Processing of Amendments(Invoices) Sheet *----------------------------------------------------
 
-    expa = df3.copy()
+def process_amendments_invoices(df3, df2):
+    df3 = df3.iloc[5:]
+    # Step 3: Set the 6th row as the header.
+    header_row = df3.iloc[0]
+    df3 = df3[1:]
+    df3.columns = header_row
 
-    expa = expa[(expa['Revised type of supply'] == 'Export with payment') | (expa['Revised type of supply'] == 'Export without payment') | (expa['Revised type of supply'] == 'WOPAY') | (expa['Revised type of supply'] == 'WPAY')]
+    # Remove the 1st to 37th column from the DataFrame
+    df3 = df3.iloc[:, 1:38]
+    df3 = apply_schema(df3, 'Amendments(Invoices)')
 
-    selected_columns_reordered4 = [11,5,6,12,13,31,34,32,25,26,27,30,33]  # Indices of the columns you want to select (0-based index)
-    expa = expa.iloc[:, selected_columns_reordered4]
 
-    hsn_OUTWARD = df1.copy()
+    # To check if duplicate entries of any Origional document number is present
+    dn_df3 = df3.groupby('Original document number').size().reset_index(name='Count')
+    dn_df3['Original Invoice Duplicates'] = np.where(dn_df3['Count'] == 1, 'Unique', 'Not Unique')
+    df3 = df3.merge(dn_df3[['Original document number', 'Original Invoice Duplicates']], on='Original document number', how='left')
+    print(df3)
 
-    hsn_OUTWARD.at[0, "Type"] = 'HSN'
+    # To check if duplicate entries of any Revised document number is present
+    rdn_df3 = df3.groupby('Revised document number').size().reset_index(name='Count')
+    rdn_df3['Revised Invoice Duplicates'] = np.where(rdn_df3['Count'] == 1, 'Unique', 'Not Unique')
+    df3 = df3.merge(rdn_df3[['Revised document number', 'Revised Invoice Duplicates']], on='Revised document number', how='left')
+    print(df3)
 
-    sum_tv = pd.to_numeric(hsn_OUTWARD.iloc[:, 19]).sum()
-    hsn_OUTWARD.at[0, 'Taxable_count'] = sum_tv
+    # Rules to check the Origional and Revised Status of recipient
+    comp_status_rules = [
+        (lambda df: same_values(df['Original status of recipient'], df['Revised status of recipient']), "Match"),
+        (lambda df: df['Revised status of recipient'].isna(), "It should not be blank"),
+        (lambda df: df['Revised status of recipient'] == "Unregister", "Changes made - Supply made to unregistered GSTN should be blank"),
+    ]
 
-    sum_igst = pd.to_numeric(hsn_OUTWARD.iloc[:, 21]).sum()
-    hsn_OUTWARD.at[0, 'IGST_count'] = sum_igst
+    df3['Comp. Status Of Recipient Check'] = evaluate_rules(df3, comp_status_rules, "Changes made - Supply made to registered GSTN should not be blank")
+
+    # Rules to check the Origional and Revised type of Supply
+    revised_type_of_supply = df3['Revised type of supply']
+    comp_type_of_supply_rules = [
+        (same_values(df3['Original type of supply'], revised_type_of_supply), "Match"),
+        (revised_type_of_supply.isna(), "It should not be blank"),
+        (contains_text(revised_type_of_supply, "SEZ supplies without") | contains_text(revised_type_of_supply, "SEZ without"), "Changes made - It is a Zero-rated supply without payment all tax columns should be blank"),
+        (contains_text(revised_type_of_supply, "SEZ supplies with") | contains_text(revised_type_of_supply, "SEZ with") | contains_text(revised_type_of_supply, "Export with"), "Changes made - It is a Zero-rated supply CGST+SGST should be blank"),
+        (contains_text(revised_type_of_supply, "Exempt"), "Changes made - It is an exempt supply tax value should be blank"),
+        (contains_text(revised_type_of_supply, "Regular"), "Correct"),
+        (contains_text(revised_type_of_supply, "Export without") | contains_text(revised_type_of_supply, "Export supplies without"), "Changes made - It is a Zero-rated supply without payment all tax columns should be blank"),
+    ]
 
-    sum_cgst = pd.to_numeric(hsn_OUTWARD.iloc[:, 23]).sum()
-    hsn_OUTWARD.at[0, 'CGST_count'] = sum_cgst
+    df3['Comp. Type Of Supply Check'] = evaluate_rules(df3, comp_type_of_supply_rules, "Prima facie it observes that it is other than Regular supply")
+
+    # Rules to check Taxibility
+    revised_taxability = df3['Revised Taxability']
+    comp_taxability_rules = [
+        (same_values(df3['Original taxability'], revised_taxability), "Match"),
+        (revised_taxability.isna(), "Should not be blank"),
+        (contains_text(revised_taxability, "Exempt"), "Changes made - Exempt supply made by the Company which attracts reversal under rule 42 & 43 also tax amount should be zero"),
+        (contains_text(revised_taxability, "non GST"), "Changes made - It is a No GST supply hence tax amount should be zero"),
+        (revised_taxability == "-", "It should not be blank"),
+        (contains_text(revised_taxability, "Taxable"), "Changes made - Normal taxable supply"),
+    ]
 
-    sum_sgst = pd.to_numeric(hsn_OUTWARD.iloc[:, 25]).sum()
-    hsn_OUTWARD.at[0, 'SGST_count'] = sum_sgst
+    df3['Comp. Taxability Check'] = evaluate_rules(df3, comp_taxability_rules, "Didn't match")
 
-    hsn_OUTWARD['Total duty'] = hsn_OUTWARD['IGST_count'] + hsn_OUTWARD['CGST_count'] + hsn_OUTWARD['SGST_count']
+    # Rules to check the Origional and Revised type of Document
+    comp_type_of_document_rules = [
+        (lambda df: df['Original type of documents'] == df['Revised type of document'], "Match"),
+        (lambda df: df['Revised type of document'].isna(), "Should not be blank"),
+    ]
 
-    hsn_OUTWARD['Total value'] = hsn_OUTWARD['Taxable_count'] + hsn_OUTWARD['IGST_count'] + hsn_OUTWARD['CGST_count'] + hsn_OUTWARD['SGST_count']
+    df3['Comp. Type of Document Check'] = evaluate_rules(df3, comp_type_of_document_rules, "Didn't match")
 
-    selected_columns_reordered5 = [66,67,68,69,70,71,72]  # Indices of the columns you want to select (0-based index)
-    hsn_OUTWARD = hsn_OUTWARD.iloc[:, selected_columns_reordered5]
+    # Rules to check the Origional and Revised Document Number
+    comp_document_number_rules = [
+        (lambda df: df['Original document number'] == df['Revised document number'], "Match"),
+        (lambda df: df['Revised document number'].isna(), "It should not be blank"),
+    ]
 
-    hsn_CDNR = df4.copy()
+    df3['Comp. Document number Check'] = evaluate_rules(df3, comp_document_number_rules, "Didn't match / Need to check the Invoice copy")
 
-    selected_columns_reordered6 = [9,16,17,18,19]  # Indices of the columns you want to select (0-based index)
-    hsn_CDNR = hsn_CDNR.iloc[:, selected_columns_reordered6]
+    # To check the length of Revised document Number
+    df3['Invoice no. Check'] = np.where(text_length(df3['Revised document number']) <= 16, "Correct", "Need to check the Invoice copy")
 
-    numeric_columns = hsn_CDNR.columns[1:5]
-    hsn_CDNR[numeric_columns] = hsn_CDNR[numeric_columns].apply(pd.to_numeric)
+    # Rules to check the Origional and Revised Document Date
+    comp_document_date_rules = [
+        (lambda df: same_values(df['Original document date'], df['Revised document date']), "Match"),
+        (lambda df: df['Original document date'].isna(), "It should not be blank"),
+    ]
 
-    # Group by 'Note type' and calculate the sums for each column
-    hsn_CDNR = hsn_CDNR.groupby('Note type')[numeric_columns].sum().reset_index()
+    df3['Comp. Document Date Check'] = evaluate_rules(df3, comp_document_date_rules, "Didn't match")
 
-    new_column_names = ['Type', 'Taxable_count', 'IGST_count', 'CGST_count', 'SGST_count']
-    # Assign new column names to the DataFrame
-    hsn_CDNR.columns = new_column_names
+    # Check the length of GST Number
+    df3['GSTN Length check'] = text_length(df3.iloc[14])
+
+    # Rules to check the Origional GSTIN and Revised GSTIN
+    gstn_length_check = df3['GSTN Length check']
+    comp_gstn_of_recipient_rules = [
+        (gstn_length_check.isna(), "GSTIN Cannot be blank in case of registered supply"),
+        (gstn_length_check != 15, "Need to mention the correct GST Number"),
+        (df3.iloc[:, 7] == df3.iloc[:, 14], "Match"),
+        (gstn_length_check == 15, "Revised Length Correct / Didn't match"),
+    ]
 
+    df3['Comp. GSTN of Recipient Check'] = evaluate_rules(df3, comp_gstn_of_recipient_rules,
+                "Didn't match / Need to mention the correct GST Number, GSTIN is a 15-digit alphanumeric code. The first two digits represent the state code, the next 10 digits represent the PAN (Permanent Account Number) of the taxpayer, the 13th digit represents the number of registrations the entity has within a state, the 14th digit is the default 'Z', and the last digit is a checksum digit calculated using the Modulus 10 algorithm")
 
-    # Add a new column 'Total duty' by summing up 'IGST_count', 'CGST_count', and 'SGST_count'
-    hsn_CDNR['Total duty'] = hsn_CDNR['IGST_count'] + hsn_CDNR['CGST_count'] + hsn_CDNR['SGST_count']
+    # To Check Revised HSN
+    df3['HSN Check'] = check_field(df3, 'Amendments(Invoices)', 'hsn', "Need to mention correct HSN", missing_is_blank=True)
 
-    # Add a new column 'Total value' by summing up 'Taxable_count', 'IGST_count', 'CGST_count', and 'SGST_count'
-    hsn_CDNR['Total value'] = hsn_CDNR['Taxable_count'] + hsn_CDNR['IGST_count'] + hsn_CDNR['CGST_count'] + hsn_CDNR['SGST_count']
+    # Converts any type of gst Rate into Number
+    df3['GST Rate Check'] = check_field(df3, 'Amendments(Invoices)', 'rate', "Need to mention correct GST Rate")
 
+    # To check the GST Difference
+    df3['GST Difference'] = check_field(df3, 'Amendments(Invoices)', 'gst_difference',
+        message="Revised taxable Value (Rs.)/ IGST/ Revised IGST/ Revised CGST/ Revised SGST/UTGST Should not be blank")
 
-    docs_1 = df1['Document number']
+    # Rules to check Revised Place of supply and Revised Recipients GSTIN
+    pos_recipient_gstin_rules = comparison_rules(sheet_field(df3, 'Amendments(Invoices)', 'gstin'), sheet_field(df3, 'Amendments(Invoices)', 'pos'),
+        "Revised Place of supply and Revised GSTIN of recipients should not be blank", "Revised Place of supply should not be blank", "Revised GSTIN of recipients should not be blank")
 
-    # Sort the Series using a lambda function to handle mixed data types
-    docs_1 = sorted(docs_1, key=lambda x: (int(x) if str(x).isdigit() else float('inf'), x))
-    # Convert the sorted list back to a pandas Series
-    docs_1 = pd.Series(docs_1)
-    # Convert the sorted Series back to a DataFrame, reset index, and rename the columns
-    docs_1 = docs_1.to_frame().reset_index(drop=True)
-    docs_1.columns = ['Document number']  # Replace column name
+    df3['POS & Recipient GSTIN Check'] = evaluate_rules(df3, pos_recipient_gstin_rules, "Incorrect POS need to check")
 
-    docs_1 = docs_1.drop_duplicates()
+    # Rules to check Unusual transation by Revised HSN
+    revised_hsn = df3['Revised HSN']
+    hsn_remark = unusual_hsn_remark(revised_hsn)
+    unusual_transaction_rules = [
+        (hsn_remark.notna(), hsn_remark),
+        (revised_hsn.isna(), "HSN should not be blank"),
+    ]
 
-    # Replace "-" with an empty string in the specified column
-    docs_1['Document number'] = docs_1['Document number'].replace("-", "", regex=True)
-    docs_1['Document number'] = docs_1['Document number'].replace("/", "", regex=True)
+    df3['Identification of unusal transaction by HSN'] = evaluate_rules(df3, unusual_transaction_rules, "-")
 
-    # Convert the column to strings
-    docs_1['Document number'] = docs_1['Document number'].astype(str)
+    # To check Unusual transation by Description
+    df3['Identification of unusual transaction by Description'] = scan_keywords(df3['Revised description'], AMENDMENT_DESCRIPTION_SCANNER).fillna("Description should not be blank")
 
-    # Split the column into two columns at positions 0 and 4
-    docs_1['Invoice Number - Copy.1'] = docs_1['Document number'].astype(str).str[:-4]  # Extract without last four digits
-    docs_1['Invoice Number - Copy.2'] = docs_1['Document number'].astype(str).str[-4:]
+    # To check if duplicate entries of any Origional document number is present
+    df3['Count'] = df3.groupby('Original document number')['Original document number'].transform('count')
+    df3['Origional Invoice Duplicates'] = uniqueness_check(df3['Count'])
+    df3.drop(columns=['Count'], inplace=True)
 
-    # Drop the original column
-    docs_1.drop(columns=['Document number'], inplace=True)
+    # To check if duplicate entries of any Revised document number is present
+    df3['Count'] = df3.groupby('Revised document number')['Revised document number'].transform('count')
+    df3['Revised Invoice Duplicates'] = uniqueness_check(df3['Count'])
+    df3.drop(columns=['Count'], inplace=True)
 
-    docs_1 = (
-    docs_1.groupby('Invoice Number - Copy.1')
-    .agg(start=('Invoice Number - Copy.2', 'min'),
-         end=('Invoice Number - Copy.2', 'max'),
-         count=('Invoice Number - Copy.2', 'size'))
-    .reset_index()
-    )
+    # Rules to check Revised Reverse Charge
+    revised_reverse_charge = df3['Revised applicability of Reverse Charge']
+    reverse_charge_rules = [
+        (revised_reverse_charge.isin(["Yes", "Y", "y", "yes"]), "Prima facie it is observed that this transaction covered under reverse charge (Need to check)"),
+        (revised_reverse_charge.isna(), "It should not be blank"),
+    ]
 
-    docs_1.rename(columns={'Invoice Number - Copy.1': 'Invoice Number',}, inplace=True)
+    df3['Reverse Charge Check'] = evaluate_rules(df3, reverse_charge_rules, "Forward Charge Supply")
 
-    # Assuming 'grouped_df' is your DataFrame
-    docs_1['start'] = docs_1['start'].astype(float)  # Convert 'Start' column to numeric
-    docs_1['end'] = docs_1['end'].astype(float)  # Convert 'End' column to numeric
+    # Rules to check Bill to Ship party GSTIN
+    bill_to_ship_party_gstin_rules = [
+        (lambda df: df.iloc[:, 14] == df.iloc[:, 15], "Same"),
+        (lambda df: df.iloc[:, 14].isna(), "It shouldn't be blank"),
+    ]
 
-    # Assuming 'grouped_df' is your DataFrame and 'Start', 'End', and 'Count' are columns in it
-    docs_1['Cancelled'] = docs_1['end'] - docs_1['start'] - docs_1['count']
+    df3['Bill to Ship party GSTIN Check'] = evaluate_rules(df3, bill_to_ship_party_gstin_rules, "It is observed that bill to GST number is different than Ship to GST number")
 
-    # Assuming 'grouped_df' is your DataFrame
-    docs_1['Cancelled'] = docs_1['Cancelled'].replace(-1, 0)
+    # Rules to check Revised shipping bill number
+    shipping_bill_number = df3['Revised shipping bill number']
+    shipping_bill_rules = [
+        (shipping_bill_number.isna(), "It should not be blank"),
+        (text_length(shipping_bill_number) == 7, "Correct"),
+    ]
 
+    df3['Shipping bill Check'] = evaluate_rules(df3, shipping_bill_rules, "Incorrect shipping bill details mentioned, need to correct the same")
 
-    docs_2 = df4['Document number']
-    docs_2 = docs_2.drop_duplicates()
+    # Rules to check Revised port code
+    port_code = df3['Revised port code']
+    port_code_rules = [
+        (port_code.isna(), "It should not be blank"),
+        (text_length(port_code) == 6, "Correct"),
+    ]
 
-    docs_2 = docs_2.to_frame().reset_index(drop=True)
-    docs_2.columns = ['Document number']  # Replace column name
+    df3['Port Code Check'] = evaluate_rules(df3, port_code_rules, "Need to mention correct port code")
 
-    # Replace "-" with an empty string in the specified column
-    docs_2['Document number'] = docs_2['Document number'].replace("-", "", regex=True)
-    docs_2['Document number'] = docs_2['Document number'].replace("/", "", regex=True)
+    df3.reset_index(inplace=True, drop=True)
+    df2.reset_index(inplace=True, drop=True)
+    # Merge Doc. Series and Amendments(Invoices) sheet and Save in Amendments(Invoices) sheet
+    df3 = pd.concat([df2, df3], axis=1)
 
-    docs_2['Document number'] = docs_2['Document number'].apply(lambda x: str(x) if pd.notnull(x) else x)
-    docs_2.sort_values(by='Document number', ascending=True, inplace=True, na_position='last')
+    df3_columns = df3.columns.tolist()
+    df3_new_columns = df3_columns[2:] + df3_columns[:2] # Move the first and second columns to the end
+    df3 = df3[df3_new_columns] # Reorganize the DataFrame columns
 
-    # Split the column into two columns at positions 0 and 4
-    docs_2['Invoice Number - Copy.1'] = docs_2['Document number'].astype(str).str[:-4]  # Extract without last four digits
-    docs_2['Invoice Number - Copy.2'] = docs_2['Document number'].astype(str).str[-4:]
+    # Extend Values for below cells  in Start date column
+    df3_column_to_extend = 'Start date'
+    df3_value_to_extend = df3.at[1, df3_column_to_extend]
+    df3[df3_column_to_extend] = df3[df3_column_to_extend].fillna(df3_value_to_extend)
 
-    docs_2 = (
-    docs_2.groupby('Invoice Number - Copy.1')
-    .agg(start=('Invoice Number - Copy.2', 'min'),
-         end=('Invoice Number - Copy.2', 'max'),
-         count=('Invoice Number - Copy.2', 'size'))
-    .reset_index()
-    )
+    # Extend Values for below cells  in End date column
+    df3_column_to_extend1 = 'End date'
+    df3_value_to_extend1 = df3.at[1, df3_column_to_extend1]
+    df3[df3_column_to_extend1] = df3[df3_column_to_extend1].fillna(df3_value_to_extend1)
 
-    docs_2.rename(columns={'Invoice Number - Copy.1': 'Invoice Number',}, inplace=True)
+    df3['Original document date'] = pd.to_datetime(df3['Original document date'])
+    df3['Revised document date'] = pd.to_datetime(df3['Revised document date'])
+    df3['Start date'] = pd.to_datetime(df3['Start date'])
+    df3['End date'] = pd.to_datetime(df3['End date'])
 
-    # Assuming 'grouped_df' is your DataFrame
-    docs_2['start'] = docs_2['start'].astype(float)  # Convert 'Start' column to numeric
-    docs_2['end'] = docs_2['end'].astype(float)  # Convert 'End' column to numeric
+    # To check Origional Document Date as it should be between start and end date
+    df3['Original document date check'] = check_field(df3, 'Amendments(Invoices)', 'date', "Correct",
+        message="Origional Document Date is not pertaining to this FY", date_field='original_date')
 
-    # Assuming 'grouped_df' is your DataFrame and 'Start', 'End', and 'Count' are columns in it
-    docs_2['Cancelled'] = docs_2['end'] - docs_2['start'] - docs_2['count']
+    # To check Revised Document Date as it should be between start and end date
+    df3['Revised document date check'] = check_field(df3, 'Amendments(Invoices)', 'date', "Correct",
+        message="Revised document date is not pertaining to this FY")
 
-    # Assuming 'grouped_df' is your DataFrame
-    docs_2['Cancelled'] = docs_2['Cancelled'].replace(-1, 0)
+    df3 = df3.drop(columns=["Start date", "End date"]) # Remove specified columnns
+    df3 = df3.dropna(subset=df3.columns[0:38], how='all') # Remove unnecessarily created checks even if rows not contains Data
+    return df3
 
-    docs_2 = docs_2.dropna(subset=['Invoice Number'])
+# -------------------------------------------* Processing of Outward supply Sheet *----------------------------------------------------
 
+def process_outward_supply(df1, df2):
+    df1 = df1.iloc[5:]
+    # Step 3: Set the 6th row as the header.
+    header_row = df1.iloc[0]
+    df1 = df1[1:]
+    df1.columns = header_row
 
-    docs_3 = df6['Document number']
-    docs_3 = docs_3.drop_duplicates()
+    # to select data from 1st column to 29th column
+    df1 = df1.iloc[:, 1:40]
+    df1 = apply_schema(df1, 'Outward supply')
 
-    docs_3 = docs_3.to_frame().reset_index(drop=True)
-    docs_3.columns = ['Document number']  # Replace column name
+    # Convert the "Document date" column to datetime, if it's not already
+    df1['Document date'] = pd.to_datetime(df1['Document date'])
 
-    # Replace "-" with an empty string in the specified column
-    docs_3['Document number'] = docs_3['Document number'].replace("-", "", regex=True)
-    docs_3['Document number'] = docs_3['Document number'].replace("/", "", regex=True)
+    # Extract only the date portion and overwrite the column
+    df1['Document date'] = df1['Document date'].dt.date
 
-    # Split the column into two columns at positions 0 and 4
-    docs_3['Invoice Number - Copy.1'] = docs_3['Document number'].astype(str).str[:-4]  # Extract without last four digits
-    docs_3['Invoice Number - Copy.2'] = docs_3['Document number'].astype(str).str[-4:]
+    # To check if duplicate entries of any Document number is present
+    result_df = df1.groupby('Document number').size().reset_index(name='Count')
+    result_df['Invoice duplicates check'] = np.where(result_df['Count'] == 1, 'Unique', 'Not Unique')
+    df1 = df1.merge(result_df[['Document number', 'Invoice duplicates check']], on='Document number', how='left')
+    print(df1)
 
-    docs_3 = (
-    docs_3.groupby('Invoice Number - Copy.1')
-    .agg(start=('Invoice Number - Copy.2', 'min'),
-         end=('Invoice Number - Copy.2', 'max'),
-         count=('Invoice Number - Copy.2', 'size'))
-    .reset_index()
-    )
+    # Checking GSTN is less than 16 only if Status of recipient is Registered
+    gstn_rules = [
+        (lambda df: (df.iloc[:, 1] == 'Registered') & (text_length(df.iloc[:, 7]) <= 15), 'Correct'),
+        (lambda df: df.iloc[:, 1] == 'Registered', 'Incorrect / GSTIN should be blank'),
+    ]
 
-    docs_3.rename(columns={'Invoice Number - Copy.1': 'Invoice Number',}, inplace=True)
+    df1.loc['GSTN Check'] = evaluate_rules(df1, gstn_rules, '')
+
+    # Rules to check type of supply
+    type_of_supply = df1['Type of supply']
+    type_of_supply_rules = [
+        (type_of_supply.isna(), "It should not be blank."),
+        (contains_text(type_of_supply, "Regular"), "Correct"),
+        (contains_text(type_of_supply, "Export with"), "It is an Zero rated supply CGST+SGST should be blank."),
+        (contains_text(type_of_supply, "SEZ without"), "It is a Zero rated supply without payment all tax columns should be blank. Zero-rated supply under Goods and Services Tax (GST) refers to the supplies of goods or services that are taxable but have a GST rate of 0%"),
+        (contains_text(type_of_supply, "Export without"), "It is a Zero rated supply without payment all tax columns should be blank. Zero-rated supply under Goods and Services Tax (GST) refers to the supplies of goods or services that are taxable but have a GST rate of 0%"),
+        (contains_text(type_of_supply, "SEZ with"), "It is an Zero rated supply CGST+SGST should be blank"),
+        (contains_text(type_of_supply, "Exempt"), "It is an exempt supply tax value should be blank"),
+    ]
 
-    # Assuming 'grouped_df' is your DataFrame
-    docs_3['start'] = docs_3['start'].astype(float)  # Convert 'Start' column to numeric
-    docs_3['end'] = docs_3['end'].astype(float)  # Convert 'End' column to numeric
+    df1['Type of Supply check'] = evaluate_rules(df1, type_of_supply_rules, "Prima facie it observes that it is other than Regular supply")
 
-    # Assuming 'grouped_df' is your DataFrame and 'Start', 'End', and 'Count' are columns in it
-    docs_3['Cancelled'] = docs_3['end'] - docs_3['start'] - docs_3['count']
+    # Adding the "Invoice No Length Check" column
+    document_number = df1['Document number']
+    df1['Invoice Check'] = evaluate_rules(df1, [
+        (document_number.notna() & (text_length(document_number) > 0), 'It should not be blank'),
+        (text_length(document_number) < 16, 'Correct'),
+    ], 'Need to check the Invoice copy')
 
-    # Assuming 'grouped_df' is your DataFrame
-    docs_3['Cancelled'] = docs_3['Cancelled'].replace(-1, 0)
 
-    docs_3.dropna(subset=['Invoice Number'], inplace=True)
+    # To check HSN
+    df1['HSN check'] = check_field(df1, 'Outward supply', 'hsn', "Need to mention correct HSN")
 
+    # To check and convert GST Rate
+    df1['GST Rate Check'] = check_field(df1, 'Outward supply', 'rate', "Need to mention correct GST Rate")
 
-    cdnr = df4.copy()
-    cdnr["Applicability of Reverse charge"] = 'N'
-    cdnr["blank1"] = None
-    cdnr["blank2"] = None
+    # To calculate GST Difference
+    df1['GST Difference'] = check_field(df1, 'Outward supply', 'gst_difference',
+        message="Revised taxable Value (Rs.)/ IGST/ Revised IGST/ Revised CGST/ Revised SGST/UTGST Should not be blank")
 
-    cdnr = cdnr[(cdnr['Type of supply'] != 'Export with payment') & (cdnr['Type of supply'] != 'Export without payment')]
-    cdnr = cdnr[(cdnr['Status of recipient'] == 'Registered')]
+    mask = df1.iloc[:, 7].notna() # Create a boolean mask for non-null values
+    df1.loc[mask, df1.columns[7]] = df1.loc[mask, df1.columns[7]].astype(str) # Convert non-null values to strings
 
-    selected_columns_reordered7 = [7,37,10,11,9,8,36,2,21,38,15,16,17,18,19,20,5,6,1]  # Indices of the columns you want to select (0-based index)
-    cdnr = cdnr.iloc[:, selected_columns_reordered7]
+    # Apply the .str.extract() method to the modified column
+    df1['Recipients GSTIN - Copy'] = df1.loc[mask, df1.columns[7]].str.extract(r'(\d{2})')
+    df1['Place Of Supply - Copy'] = df1['Place Of Supply'].str.extract(r'(\d{2})')
 
-    cdnur = df4.copy()
-    cdnur["Applicability of Reverse charge"] = 'N'
-    cdnur["blank1"] = None
-    cdnur["blank2"] = None
+    # To check Place of supply and Recipients GSTIN
+    df1['POS & Recipient check'] = check_field(df1, 'Outward supply', 'pos',
+        both_blank="Place of Supply and Recipients GSTIN need to check", pos_blank="Place of Supply need to check", gstin_blank="Recipients GSTIN need to check")
 
-    cdnur = cdnur[
-    (cdnur['Type of supply'] == 'Export with payment') |
-    (cdnur['Type of supply'] == 'Export without payment') |
-    (cdnur['Type of supply'] == 'Regular') |
-    (cdnur['Type of supply'] == 'Regular B2B')
+    # Rules to check Unusual transaction by HSN
+    hsn = df1['HSN']
+    hsn_remark = unusual_hsn_remark(hsn, numeric=True)
+    unusual_transaction_rules = [
+        (hsn.isna(), "HSN should not be blank"),
+        (hsn_remark.notna(), hsn_remark),
     ]
-    
-    cdnur = cdnur[(cdnur['Status of recipient'] == 'Unregistered')]
 
-    cdnur['Type'] = cdnur['Type of supply'].apply(lambda x: 'Unreg/Regular' if 'Regular' in x else 
-                                            'Unreg/Regular' if 'Regular B2B' in x else 
-                                            'EWP/EWOP' if 'Export with payment' in x else 
-                                            'EWP/EWOP' if 'Export without payment' in x else 
-                                            None)
-    
-    cdnur['Custom'] = cdnur.apply(lambda row: row['Type'] if row['Type'] == 'EWP/EWOP' else
-                                       row['Type'] if row['Invoice value (Rs.)'] >= 250000 else
-                                       None, axis=1)
-    
-    cdnur.dropna(subset=['Custom'], inplace=True)
+    df1['Identification of Unusal Transaction by HSN'] = evaluate_rules(df1, unusual_transaction_rules, "-")  # Default case, modify this according to your requirement
 
-    selected_columns_reordered8 = [2,10,11,9,8,21,37,15,16,20,17,18,19,5,6,1]  # Indices of the columns you want to select (0-based index)
-    cdnur = cdnur.iloc[:, selected_columns_reordered8]
 
-    cdnur_b2cs = df4.copy()
-    cdnur_b2cs["Applicability of Reverse charge"] = 'N'
-    cdnur_b2cs["blank1"] = None
-    cdnur_b2cs["blank2"] = None
+    # To check Unusual transaction by Description
+    df1['Identification of Unusual Transaction by Description'] = scan_keywords(df1['Description'], OUTWARD_DESCRIPTION_SCANNER).fillna("-")
 
-    cdnur_b2cs = cdnur_b2cs[
-    (cdnur_b2cs['Type of supply'] == 'Export with payment') |
-    (cdnur_b2cs['Type of supply'] == 'Export without payment') |
-    (cdnur_b2cs['Type of supply'] == 'Regular') |
-    (cdnur_b2cs['Type of supply'] == 'Regular B2B')
+    # Rules to check Bill to ship party GSTIN
+    bill_to_ship_party_gstin_rules = [
+        (lambda df: df.iloc[:, 7].isna() | df.iloc[:, 8].isna(), "-"),
+        (lambda df: df.iloc[:, 7] == df.iloc[:, 8], "Same"),
     ]
 
-    cdnur_b2cs = cdnur_b2cs[(cdnur_b2cs['Status of recipient'] == 'Unregistered')]
+    df1['Bill to Ship Party GSTIN Check'] = evaluate_rules(df1, bill_to_ship_party_gstin_rules, "It is observed that bill to GST number is different than Ship to GST number")
 
-    cdnur_b2cs['Type'] = cdnur_b2cs['Type of supply'].apply(lambda x: 'Unreg/Regular' if 'Regular' in x else 
-                                            'Unreg/Regular' if 'Regular B2B' in x else 
-                                            'EWP/EWOP' if 'Export with payment' in x else 
-                                            'EWP/EWOP' if 'Export without payment' in x else 
-                                            None)
-    
-    cdnur_b2cs['Custom'] = cdnur_b2cs.apply(lambda row: row['Type'] if row['Type'] == 'EWP/EWOP' else
-                                       row['Type'] if row['Invoice value (Rs.)'] <= 250000 else
-                                       None, axis=1)
+    # Rules to check Taxability
+    taxability = df1["Taxability"].astype(str)
+    taxability_rules = [
+        (taxability.str.contains("Exempt", regex=False), "Exempt supply made by the Company which attracts reversal under rule 42 & 43 also tax amount should be zero. Exempt supply under Goods and Services Tax (GST) refers to the supply of goods or services that are not taxable under GST."),
+        (taxability == "non GST", "It is a No GST supply hence tax amount should be zero"),
+    ]
 
-    cdnur_b2cs = cdnur_b2cs[cdnur_b2cs['Custom'] == 'Unreg/Regular']
+    df1['Taxability Check'] = evaluate_rules(df1, taxability_rules, "Normal taxable supply")
 
-    selected_columns_reordered9 = [2,10,11,9,8,21,37,15,16,20,17,18,19,5,6,1]  # Indices of the columns you want to select (0-based index)
-    cdnur_b2cs = cdnur_b2cs.iloc[:, selected_columns_reordered9]
+    # Rules to check Reverse Charge
+    reverse_charge = df1["Applicability of Reverse Charge"]
+    reverse_charge_rules = [
+        (reverse_charge.isna(), "It should not be blank"),
+        (reverse_charge.astype(str).str.lower().isin(["yes", "y"]), "Prima facie it is observed that this transaction is covered under reverse charge (Need to check)"),
+    ]
 
-    cdnra = df5.copy()
+    df1['Reverse Charge Check'] = evaluate_rules(df1, reverse_charge_rules, "Forward Charge Supply")
 
-    cdnra['Place of Supply'] = cdnra['Revised GSTIN of recipient'].str[:2]
-    cdnra["Reverse Charge"] = None
-    cdnra["Blank1"] = None
-    cdnra["Applicable Rate"] = None
+    # Calculating length of Shipping bill number
+    shipping_bill_number = df1['Shipping bill number']
+    sb_length = text_length(shipping_bill_number).where(shipping_bill_number.notna() & (shipping_bill_number.astype(str) != '-'))
 
-    cdnra = cdnra[(cdnra['Original status of recipient'] == 'Unregistered')]
+    # Rules to check Shipping bill number
+    shipping_bill_rules = [
+        (sb_length.isna(), "-"),
+        (sb_length == 7, "Correct"),
+    ]
 
-    selected_columns_reordered10 = [13,48,11,12,15,16,14,46,47,2,26,49,20,21,25,22,23,24,1]  # Indices of the columns you want to select (0-based index)
-    cdnra = cdnra.iloc[:, selected_columns_reordered10]
+    df1['Shipping bill check'] = evaluate_rules(df1, shipping_bill_rules, "Incorrect shipping bill details mentioned, need to correct the same")
 
-    cdnura = df5.copy()
-    cdnura['Place of Supply'] = None
-    cdnura["blank1"] = None
+    port_code_length = df1['Port code'].str.len()
 
-    cdnura = cdnura[
-        ((cdnura['Original type of supply'] == 'Export with payment') |
-        (cdnura['Original type of supply'] == 'Export without payment') |
-        (cdnura['Original type of supply'] == 'Regular') |
-        (cdnura['Original type of supply'] == 'Regular B2B'))
+    # Rules to check port code length(Should be equa to 6)
+    port_code_rules = [
+        (port_code_length.isna(), "It should not be blank"),
+        (port_code_length == 6, "Correct"),
     ]
-    cdnura = cdnura[(cdnura['Original status of recipient'] == 'Unregistered')]
 
-    cdnura['Type'] = cdnura['Original type of supply'].apply(lambda x: 'Unreg/Regular' if x in ['Regular', 'Regular B2B'] else
-                                                           'EWP/EWOP' if x in ['Export with payment', 'Export without payment'] else
-                                                           None)
-    
-    cdnura['Custom'] = cdnura.apply(lambda row: row['Type'] if row['Type'] == 'EWP/EWOP' else
-                                       row['Type'] if row['Invoice value (Rs.)'] >= 250000 else
-                                       None, axis=1)
-
-    cdnura.dropna(subset=['Custom'], inplace=True)
+    df1['Port code check'] = evaluate_rules(df1, port_code_rules, "Need to mention correct port code")
 
-    selected_columns_reordered11 = [2,9,10,15,16,14,46,26,47,25,20,21,22,1]  # Indices of the columns you want to select (0-based index)
-    cdnura = cdnura.iloc[:, selected_columns_reordered11]
+    print(df1.index.duplicated().any())
 
-    at = df6.copy()
-    at["Applicable Rate"] = None
+    df1.reset_index(inplace=True, drop=True)
+    df2.reset_index(inplace=True, drop=True)
+    # Merge Doc. Series and Outward supply sheet and Save in Outward supply sheet
+    df1 = pd.concat([df2, df1], axis=1)
 
-    selected_columns_reordered12 = [9,52,13,14,22,16,18,20,2,4,5]  # Indices of the columns you want to select (0-based index)
-    at = at.iloc[:, selected_columns_reordered12]
+    df1_columns = df1.columns.tolist()
+    df1_new_columns = df1_columns[2:] + df1_columns[:2] # Move the first and second columns to the end
+    df1 = df1[df1_new_columns] # Reorganize the DataFrame columns
 
-    atadj = df6.copy()
-    atadj["Applicable Rate"] = None
+    # Extend Values for below cells  in Start date column
+    df1_column_to_extend = 'Start date'
+    df1_value_to_extend = df1.at[1, df1_column_to_extend]
+    df1[df1_column_to_extend] = df1[df1_column_to_extend].fillna(df1_value_to_extend)
 
-    selected_columns_reordered13 = [9,13,52,15,35,29,32,21,2,24,26,25]  # Indices of the columns you want to select (0-based index)
-    atadj = atadj.iloc[:, selected_columns_reordered13]
+    # Extend Values for below cells  in End date column
+    df1_column_to_extend1 = 'End date'
+    df1_value_to_extend1 = df1.at[1, df1_column_to_extend1]
+    df1[df1_column_to_extend1] = df1[df1_column_to_extend1].fillna(df1_value_to_extend1)
 
-    ata = df7.copy()
-    ata["Applicable Rate"] = None
+    df1['Document date'] = pd.to_datetime(df1['Document date'])
+    df1['Start date'] = pd.to_datetime(df1['Start date'])
+    df1['End date'] = pd.to_datetime(df1['End date'])
 
-    selected_columns_reordered14 = [5,15,44,19,20,24,21,22,23,6,4]  # Indices of the columns you want to select (0-based index)
-    ata = ata.iloc[:, selected_columns_reordered14]
+    # To check Document Date as it should be between start and end date
+    df1['Document Date check'] = check_field(df1, 'Outward supply', 'date', "Correct", message="Document date is not pertaining to this FY")
 
-    atadja = df7.copy()
-    atadja["Applicable Rate"] = None
+    df1 = df1.drop(columns=["Start date", "End date"]) # Remove specified columnns
+    df1 = df1.dropna(subset=df1.columns[0:38], how='all') # Remove unnecessarily created checks even if rows not contains Data
+    # columns_to_remove_df1 = [20, 22, 26,28, 29, 37, 39, 41, 43, 45]
+    # df1 = df1.drop(df1.columns[columns_to_remove_df1], axis=1)
+    return df1
+
+# Sheets written by step 1 and the function that processes each of them, in the order they are written
+STEP1_SHEETS = {
+    'Outward supply': process_outward_supply,
+    'Amendments(Invoices)': process_amendments_invoices,
+    'Debit&CreditNotes': process_debit_credit_notes,
+    'Amendments (CDN)': process_amendments_cdn,
+    'Advances': process_advances,
+    'Amendment(Advances)': process_amendment_advances,
+}
+
+# Number of worker processes that process the step 1 sheets side by side (0 processes them one after another)
+STEP1_WORKERS = int(os.environ.get('GST_STEP1_WORKERS', 0))
+
+# Runs in a worker process: read one step 1 sheet and process it
+def process_step1_sheet(file_path, sheet_name, df2):
+    df, = read_sheets(file_path, [sheet_name])
+    return STEP1_SHEETS[sheet_name](df, df2)
+
+# Every stage has a function returning its output as (sheet name, DataFrame) pairs and a function that writes them.
+# The processed workbook is written to output_path, or over the uploaded file when no output path is given.
+def process_step1(file_path, output_path=None, workers=STEP1_WORKERS):
+    if output_path is None:
+        output_path = file_path
+    write_sheets(output_path, step1_sheets(file_path, workers))
+    return output_path
+
+def step1_sheets(file_path, workers=STEP1_WORKERS):
+    sheet_names = list(STEP1_SHEETS)
+
+    # The start and end dates of Doc. Series are the only thing the sheets share, so they are worked out first
+    if workers:
+        df2, = read_sheets(file_path, ["Doc. Series"])
+        first_column = read_sheets(file_path, ["Outward supply"], nrows=0)[0].columns[0]
+        df2 = process_doc_series(df2, first_column)
+
+        # Each worker reads its own sheet, so only the Doc. Series dates and the processed sheets are sent between processes
+        with ProcessPoolExecutor(max_workers=min(workers, len(sheet_names))) as pool:
+            futures = [pool.submit(process_step1_sheet, file_path, sheet_name, df2) for sheet_name in sheet_names]
+            sheets = [future.result() for future in futures]
+    else:
+        df2, *sheets = read_sheets(file_path, ["Doc. Series"] + sheet_names)
+        df2 = process_doc_series(df2, sheets[0].columns[0])
+        sheets = [STEP1_SHEETS[sheet_name](df, df2) for sheet_name, df in zip(sheet_names, sheets)]
+
+    return list(zip(sheet_names, sheets))
+
+# Sheets of the step 1 workbook read by step 2, in the order step2_sheets takes them
+STEP2_INPUT_SHEETS = ["Outward supply", "Amendments(Invoices)", "Debit&CreditNotes", "Amendments (CDN)", "Advances", "Amendment(Advances)"]
+
+# Supply types of exports, and of the unregistered invoices reported by invoice value (b2cl or b2cs)
+EXPORT_SUPPLIES = ['Export with payment', 'Export without payment']
+REGULAR_SUPPLIES = ['Regular', 'Regular B2B']
+
+# Unregistered invoices of more than GST_B2CL_LIMIT rupees go to b2cl (and their notes to cdnur), the others to b2cs.
+# The limit is 2.5 lakh by default, it is 1 lakh for invoices from August 2024.
+B2CL_LIMIT = float(os.environ.get('GST_B2CL_LIMIT', 250000))
+
+# Supply type and invoice value columns the B2C class of a sheet's rows is told by
+B2C_CLASS_COLUMNS = {
+    "Outward supply": ('Type of supply', 'Invoice value (Rs.)'),
+    "Amendments(Invoices)": ('Revised type of supply', 'Revised Invoice value (Rs.)'),
+    "Debit&CreditNotes": ('Type of supply', 'Invoice value (Rs.)'),
+    "Amendments (CDN)": ('Original type of supply', 'Invoice value (Rs.)'),
+}
+
+# B2C class of every row: "EXPORT" for exports, "B2CL" for regular supplies above the limit and "B2CS" for regular
+# supplies and employee recoveries up to it (blank for the other rows and blank invoice values)
+def b2c_classes(df, supply_column, value_column, limit=B2CL_LIMIT):
+    supply_type = df[supply_column]
+    value = to_number(df[value_column])
+    return evaluate_rules(df, [
+        (supply_type.isin(EXPORT_SUPPLIES), 'EXPORT'),
+        (supply_type.isin(REGULAR_SUPPLIES) & (value > limit), 'B2CL'),
+        (supply_type.isin(REGULAR_SUPPLIES + ['Employee recoveries']) & (value <= limit), 'B2CS'),
+    ])
+
+# Rows of the GSTR-1 sections step 2 takes from part of a step 1 sheet, by sheet, from the row and its B2C class. A row
+# can be in more than one section: an unregistered export is in b2cla and in expa.
+GSTR1_SECTIONS = {
+    "Outward supply": {
+        'b2b': lambda df, b2c: (df['Taxability'] == 'Taxable') & (df['Status of recipient'] == 'Registered')
+                               & ~df['Type of supply'].isin(['Employee recoveries'] + EXPORT_SUPPLIES),
+        'b2cs': lambda df, b2c: (df['Taxability'] == 'Taxable') & (df['Status of recipient'] == 'Unregistered')
+                                & (b2c == 'B2CS'),
+        'b2cl': lambda df, b2c: (df['Taxability'] == 'Taxable') & (df['Status of recipient'] == 'Unregistered')
+                                & (b2c == 'B2CL'),
+        'exp': lambda df, b2c: b2c == 'EXPORT',
+        'exemp': lambda df, b2c: df['Taxability'] == 'Taxable',
+    },
+    "Amendments(Invoices)": {
+        'b2ba': lambda df, b2c: df['Revised type of supply'].notna() & (df['Revised status of recipient'] == 'Registered')
+                                & ~df['Revised type of supply'].isin(EXPORT_SUPPLIES + ['Highseas sale']),
+        'b2cla': lambda df, b2c: (df['Revised status of recipient'] == 'Unregistered') & b2c.isin(['EXPORT', 'B2CL']),
+        'expa': lambda df, b2c: df['Revised type of supply'].isin(EXPORT_SUPPLIES + ['WOPAY', 'WPAY']),
+    },
+    "Debit&CreditNotes": {
+        'cdnr': lambda df, b2c: (df['Status of recipient'] == 'Registered') & ~df['Type of supply'].isin(EXPORT_SUPPLIES),
+        'cdnur': lambda df, b2c: (df['Status of recipient'] == 'Unregistered') & b2c.isin(['EXPORT', 'B2CL']),
+        'cdnur_b2cs': lambda df, b2c: (df['Status of recipient'] == 'Unregistered') & (b2c == 'B2CS')
+                                      & df['Type of supply'].isin(REGULAR_SUPPLIES),
+    },
+    "Amendments (CDN)": {
+        'cdnra': lambda df, b2c: df['Original status of recipient'] == 'Unregistered',
+        'cdnura': lambda df, b2c: (df['Original status of recipient'] == 'Unregistered') & b2c.isin(['EXPORT', 'B2CL']),
+    },
+}
+
+# Sections of every row of a sheet in one pass (its B2C class computed once for all of them), as a code with a bit set
+# for each section the row is in, then the positions of the rows of each section (in sheet order) by their bit. The
+# tables take their rows from the sheet when they are built, so only one section is copied at a time.
+def partition_sections(df, sheet):
+    sections = GSTR1_SECTIONS[sheet]
+    b2c = b2c_classes(df, *B2C_CLASS_COLUMNS[sheet])
+    codes = np.zeros(len(df), dtype=np.int64)
+    for bit, rule in enumerate(sections.values()):
+        codes |= np.asarray(rule(df, b2c), dtype=bool).astype(np.int64) << bit
+    return {name: np.flatnonzero(codes >> bit & 1) for bit, name in enumerate(sections)}
+
+# Columns of the step 2 tables: the step 1 sheet and GSTR-1 section (None for all its rows) a table is taken from, then
+# its columns in order by header. A (header, value) pair is a new column holding the value, or computed from the
+# table's columns when the value is a function.
+STEP2_TABLES = {
+    'b2b': ('Outward supply', 'b2b', ['Recipients GSTIN \n(Bill to party GSTIN)', 'Recipient Name (Billing party)',
+        'Document number', 'Document date', 'Invoice value (Rs.)', 'Place Of Supply',
+        'Applicability of Reverse Charge', ('Applicable % of Tax Rate', None), 'Type of supply',
+        'GSTIN of E-commerce Operator', 'GST Rate (%)', 'Taxable Value (Rs.)', 'Cess Amount\n(Rs.)', 'IGST \n(Rs.)',
+        'CGST \n(Rs.)', 'SGST/UTGST \n(Rs.)', 'Status of recipient']),
+    'b2cs': ('Outward supply', 'b2cs', [('blank column', None), 'Place Of Supply', 'GST Rate (%)',
+        ('Applicable % of Tax Rate', None), 'Taxable Value (Rs.)', 'Cess Amount\n(Rs.)',
+        'GSTIN of E-commerce Operator', 'IGST \n(Rs.)', 'CGST \n(Rs.)', 'SGST/UTGST \n(Rs.)', 'Type of supply',
+        'Status of recipient']),
+    'b2cl': ('Outward supply', 'b2cl', ['Document number', 'Document date', 'Invoice value (Rs.)', 'Place Of Supply',
+        ('Applicable % of Tax Rate', None), 'GST Rate (%)', 'Taxable Value (Rs.)', 'Cess Amount\n(Rs.)',
+        'GSTIN of E-commerce Operator', 'IGST \n(Rs.)', 'CGST \n(Rs.)', 'SGST/UTGST \n(Rs.)', 'Type of supply',
+        'Status of recipient']),
+    'exp': ('Outward supply', 'exp', ['Type of supply', 'Document number', 'Document date', 'Invoice value (Rs.)',
+        'Port code', 'Shipping bill number', 'Shipping bill date', 'GST Rate (%)', 'Taxable Value (Rs.)',
+        'Cess Amount\n(Rs.)', 'IGST \n(Rs.)', 'CGST \n(Rs.)', 'SGST/UTGST \n(Rs.)', 'Status of recipient']),
+    'exemp': ('Outward supply', 'exemp', ['Status of recipient', 'Type of supply', 'Taxability',
+        'Taxable Value (Rs.)']),
+    'b2ba': ('Amendments(Invoices)', 'b2ba', ['Revised recipients GSTIN \n(Bill to party GSTIN)',
+        'Revised recipient Name (Bill to party)', 'Original document number', 'Original document date',
+        'Revised document number', 'Revised document date', 'Revised Invoice value (Rs.)', 'Revised place Of Supply',
+        'Revised applicability of Reverse Charge', ('Applicable % of Tax Rate', None), 'Revised type of supply',
+        'Revised GSTIN of E-commerce Operator', 'Revised rate (%)', 'Revised taxable Value (Rs.)',
+        'Revised Cess Amount\n(Rs.)', 'Revised IGST \n(Rs.)', 'Revised CGST \n(Rs.)', 'Revised SGST/UTGST \n(Rs.)',
+        'Original status of recipient', 'Original type of supply', 'Revised status of recipient']),
+    'b2cla': ('Amendments(Invoices)', 'b2cla', ['Original document number', 'Original document date',
+        'Revised place Of Supply', 'Revised document number', 'Revised document date', 'Revised Invoice value (Rs.)',
+        'Revised rate (%)', 'Revised taxable Value (Rs.)', 'Revised IGST \n(Rs.)', 'Revised CGST \n(Rs.)',
+        'Revised SGST/UTGST \n(Rs.)', 'Revised Cess Amount\n(Rs.)', 'Revised status of recipient',
+        'Revised type of supply', ('Applicable % of Tax Rate', None)]),
+    'expa': ('Amendments(Invoices)', 'expa', ['Revised type of document', 'Original document number',
+        'Original document date', 'Revised document number', 'Revised document date', 'Revised Invoice value (Rs.)',
+        'Revised port code', 'Revised shipping bill number', 'Revised rate (%)', 'Revised taxable Value (Rs.)',
+        'Revised IGST \n(Rs.)', 'Revised Cess Amount\n(Rs.)', 'Revised shipping bill date']),
+    'cdnr': ('Debit&CreditNotes', 'cdnr', ['GSTIN of recipient', ('blank1', None), 'Note number', 'Note date',
+        'Note type', 'Place of Supply', ('Applicability of Reverse charge', 'N'), 'Type of supply',
+        'Invoice value (Rs.)', ('blank2', None), 'Rate (%)', 'Taxable Value (Rs.)', 'IGST \n(Rs.)', 'CGST \n(Rs.)',
+        'SGST/UTGST \n(Rs.)', 'Cess \n(Rs.)', 'Document number', 'Document date', 'Status of recipient']),
+    'cdnur': ('Debit&CreditNotes', 'cdnur', ['Type of supply', 'Note number', 'Note date', 'Note type',
+        'Place of Supply', 'Invoice value (Rs.)', ('blank1', None), 'Rate (%)', 'Taxable Value (Rs.)', 'Cess \n(Rs.)',
+        'IGST \n(Rs.)', 'CGST \n(Rs.)', 'SGST/UTGST \n(Rs.)', 'Document number', 'Document date',
+        'Status of recipient']),
+    'cdnur_b2cs': ('Debit&CreditNotes', 'cdnur_b2cs', ['Type of supply', 'Note number', 'Note date', 'Note type',
+        'Place of Supply', 'Invoice value (Rs.)', ('blank1', None), 'Rate (%)', 'Taxable Value (Rs.)', 'Cess \n(Rs.)',
+        'IGST \n(Rs.)', 'CGST \n(Rs.)', 'SGST/UTGST \n(Rs.)', 'Document number', 'Document date',
+        'Status of recipient']),
+    'cdnra': ('Amendments (CDN)', 'cdnra', ['Revised GSTIN of recipient', ('Blank1', None), 'Revised document number',
+        'Revised document date', 'Revised note number', 'Revised note date', 'Revised note type',
+        ('Place of Supply', lambda df: df['Revised GSTIN of recipient'].str[:2]), ('Reverse Charge', None),
+        'Original type of supply', 'Invoice value (Rs.)', ('Applicable Rate', None), 'Revised rate (%)',
+        'Taxable Value (Rs.)', 'Cess\n(Rs.)', 'IGST \n(Rs.)', 'CGST \n(Rs.)', 'SGST \n(Rs.)',
+        'Original status of recipient']),
+    'cdnura': ('Amendments (CDN)', 'cdnura', ['Original type of supply', 'Original note number', 'Original note date',
+        'Revised note number', 'Revised note date', 'Revised note type', ('Place of Supply', None),
+        'Invoice value (Rs.)', ('blank1', None), 'Cess\n(Rs.)', 'Revised rate (%)', 'Taxable Value (Rs.)',
+        'IGST \n(Rs.)', 'Original status of recipient']),
+    'at': ('Advances', None, ['Place Of Supply', ('Applicable Rate', None), 'GST Rate(%)', 'Taxable Value (Rs.)',
+        'Cess Amount\n(Rs.)', 'IGST \n(Rs.)', 'CGST \n(Rs.)', 'SGST/UTGST \n(Rs.)', 'Type of supply',
+        'Receipt voucher number', 'Receipt voucher date']),
+    'atadj': ('Advances', None, ['Place Of Supply', 'GST Rate(%)', ('Applicable Rate', None), 'Taxable Value (Rs.).1',
+        'Cess \n(Rs.)', 'IGST \n(Rs.).2', 'CGST \n(Rs.).3', 'SGST/UTGST \n(Rs.).1', 'Type of supply',
+        'Type of document', 'Document number', 'Document date']),
+    'ata': ('Amendment(Advances)', None, ['Original document date', 'Revised place Of Supply',
+        ('Applicable Rate', None), 'Revised GST rate(%)', 'Revised taxable Value (Rs.)', 'Revised Cess\n(Rs.)',
+        'Revised IGST \n(Rs.)', 'Revised CGST \n(Rs.)', 'Revised SGST \n(Rs.)', 'Original GSTIN of recipient',
+        'Original document number']),
+    'atadja': ('Amendment(Advances)', None, ['Original document date', 'Revised place Of Supply',
+        'Revised GST rate(%)', ('Applicable Rate', None), 'Revised taxable Value (Rs.)', 'Revised Cess\n(Rs.)',
+        'Revised IGST \n(Rs.)', 'Revised CGST \n(Rs.)', 'Revised SGST \n(Rs.)', 'Original document number']),
+}
+
+# Keys and amounts of the HSN cube, and the headers each section (a step 1 sheet) holds them under, in that order. The
+# outward supply sheet has no note type.
+HSN_CUBE_KEYS = ['Section', 'Note type', 'HSN', 'UQC', 'Rate']
+HSN_CUBE_AMOUNTS = ['Quantity', 'Taxable Value (Rs.)', 'IGST (Rs.)', 'CGST (Rs.)', 'SGST/UGST (Rs.)', 'Cess Amount (Rs.)']
+HSN_CUBE_SECTIONS = {
+    "Outward supply": [None, 'HSN', 'Unit Quantity Code', 'GST Rate (%)', 'Quantity', 'Taxable Value (Rs.)',
+                       'IGST \n(Rs.)', 'CGST \n(Rs.)', 'SGST/UTGST \n(Rs.)', 'Cess Amount\n(Rs.)'],
+    "Debit&CreditNotes": ['Note type', 'HSN ', 'UQC', 'Rate (%)', 'Quantity', 'Taxable Value (Rs.)', 'IGST \n(Rs.)',
+                          'CGST \n(Rs.)', 'SGST/UTGST \n(Rs.)', 'Cess \n(Rs.)'],
+}
+
+# Headers of the step 1 sheets step 2 looks at besides the ones its tables keep: the section rules and the document
+# numbers of docs
+STEP2_RULE_COLUMNS = {
+    "Outward supply": ['Status of recipient', 'Type of supply', 'Taxability', 'Invoice value (Rs.)', 'Document number'],
+    "Amendments(Invoices)": ['Revised status of recipient', 'Revised type of supply', 'Revised Invoice value (Rs.)'],
+    "Debit&CreditNotes": ['Status of recipient', 'Type of supply', 'Invoice value (Rs.)', 'Document number'],
+    "Amendments (CDN)": ['Original status of recipient', 'Original type of supply', 'Invoice value (Rs.)'],
+    "Advances": ['Document number'],
+    "Amendment(Advances)": [],
+}
+
+# Headers step 2 reads from each step 1 sheet, the other columns are not parsed
+STEP2_INPUT_COLUMNS = {
+    sheet: set(headers) | {column for column in HSN_CUBE_SECTIONS.get(sheet, []) if column}
+                        | {column for table_sheet, _, columns in STEP2_TABLES.values() if table_sheet == sheet
+                           for column in columns if isinstance(column, str)}
+    for sheet, headers in STEP2_RULE_COLUMNS.items()
+}
+
+# A step 2 table, its rows (the ones of its section) and columns taken from the sheet at once
+def step2_table(sheets, sections, table):
+    sheet, section, columns = STEP2_TABLES[table]
+    df = sheets[sheet]
+    positions = [df.columns.get_loc(column) for column in columns if isinstance(column, str)]
+    if section is None:
+        result = df.take(positions, axis=1)
+    else:
+        result = df.iloc[sections[sheet][section], positions]
+    for position, column in enumerate(columns):
+        if not isinstance(column, str):
+            header, value = column
+            result.insert(position, header, value(result) if callable(value) else value, allow_duplicates=True)
+    return result
+
+# A document number split into the text before its serial, the serial and the text after it. The serial is the last
+# run of digits (at most 18 so it fits an int64) unless the number ends with a financial year such as "/2023-24",
+# then it is the run before that year
+DOCUMENT_SERIAL = re.compile(r'^(.*?)(\d{1,18})(\D*(?:(?:\d{4}|\d{2})-\d{2}\D*)?)$')
+
+# A document series ends where more than this many serials are missing before the next number
+DOCUMENT_SERIES_GAP = int(os.environ.get('GST_DOCUMENT_SERIES_GAP', 100))
+
+# Longest text an Excel cell holds
+CELL_TEXT_LIMIT = 32767
+
+# The series of a column of document numbers: the first and last serial, the number of distinct documents, how many
+# serials in between are missing (cancelled) and those missing serials as runs such as "13, 15-17". Numbers sharing
+# the text around their serial (shown as "#") are one numbering, numbers made only of digits are numbered by their
+# width; a numbering is split into series where a gap is wider than DOCUMENT_SERIES_GAP. A series of plain numbers
+# is labelled with the leading digits its first and last number share (its number when it has one document). Whole
+# numbers read as floats count as the integer. Numbers without any digits have no serial and are left out.
+def document_series(numbers):
+    numbers = numbers.dropna().astype(object).map(
+        lambda value: int(value) if isinstance(value, float) and value.is_integer() else value)
+    parts = numbers.astype(str).str.strip().str.extract(DOCUMENT_SERIAL).dropna()
+    parts[3] = parts[1].str.len().where((parts[0] == '') & (parts[2] == ''), 0)
+    numberings = parts.groupby([0, 2, 3]).ngroup().to_numpy()
+    serials = parts[1].astype('int64').to_numpy()
+
+    # Sort by numbering then serial, keep each serial once and find where every series starts and ends
+    order = np.lexsort((serials, numberings))
+    numberings, serials, parts = numberings[order], serials[order], parts.take(order)
+    distinct = np.ones(len(serials), dtype=bool)
+    distinct[1:] = (numberings[1:] != numberings[:-1]) | (serials[1:] != serials[:-1])
+    numberings, serials, parts = numberings[distinct], serials[distinct], parts[distinct]
+    first = np.ones(len(serials), dtype=bool)
+    first[1:] = (numberings[1:] != numberings[:-1]) | (np.diff(serials) - 1 > DOCUMENT_SERIES_GAP)
+    last = np.ones(len(serials), dtype=bool)
+    last[:-1] = first[1:]
+    starts, ends = np.flatnonzero(first), np.flatnonzero(last)
+    series = np.cumsum(first) - 1
+    count = ends - starts + 1
+
+    # A gap sits between two serials of a series more than one apart
+    gaps = np.flatnonzero(~first[1:] & (np.diff(serials) > 1)) + 1
+    low, high = serials[gaps - 1] + 1, serials[gaps] - 1
+    runs = pd.Series(low).astype(str) + ('-' + pd.Series(high).astype(str)).where(high > low, '')
+    missing = runs.groupby(series[gaps]).agg(', '.join).reindex(range(len(starts)), fill_value='')
+    too_long = missing.str.len() > CELL_TEXT_LIMIT
+    missing[too_long] = missing[too_long].str.slice(0, CELL_TEXT_LIMIT - 5).str.rsplit(', ', n=1).str[0] + ', ...'
+
+    labels = [prefix + '#' + suffix if not width
+              else str(start).zfill(width) if start == end
+              else os.path.commonprefix([str(start).zfill(width), str(end).zfill(width)])[:width - 1] + '#'
+              for prefix, suffix, width, start, end in zip(parts[0].to_numpy()[starts], parts[2].to_numpy()[starts],
+                                                           parts[3].to_numpy()[starts], serials[starts], serials[ends])]
+
+    return pd.DataFrame({
+        'Invoice Number': pd.Series(labels, dtype=object),
+        'start': serials[starts],
+        'end': serials[ends],
+        'count': count,
+        'Cancelled': serials[ends] - serials[starts] + 1 - count,
+        'Missing serials': missing.to_numpy(),
+    })
 
-    selected_columns_reordered15 = [5,15,19,44,20,24,21,22,23,4]  # Indices of the columns you want to select (0-based index)
-    atadja = atadja.iloc[:, selected_columns_reordered15]
+# The HSN cube: the amounts of every section summed per section, note type, HSN, UQC and rate with one groupby over
+# the rows of all sections. Rows missing a key keep their own group, so the section totals still count them.
+def hsn_cube(sheets):
+    frames = []
+    for section, columns in HSN_CUBE_SECTIONS.items():
+        df = sheets[section]
+        frame = pd.DataFrame({name: np.nan if column is None else df[column]
+                              for name, column in zip(HSN_CUBE_KEYS[1:] + HSN_CUBE_AMOUNTS, columns)}, index=df.index)
+        frame.insert(0, 'Section', section)
+        frames.append(frame)
+    cube = pd.concat(frames, ignore_index=True)
+    return cube.groupby(HSN_CUBE_KEYS, dropna=False, sort=False)[HSN_CUBE_AMOUNTS].sum().reset_index()
+
+# The cube of one section rolled up to some of its keys, named the way the section's sheet names them. Rows missing
+# any of those keys are left out.
+def hsn_rollup(cube, section, keys):
+    names = dict(zip(HSN_CUBE_KEYS[1:], HSN_CUBE_SECTIONS[section]))
+    rows = cube[cube['Section'] == section].dropna(subset=keys)
+    rollup = rows.groupby(keys)[HSN_CUBE_AMOUNTS].sum().reset_index()
+    return rollup.rename(columns={**{key: names[key] for key in keys},
+                                  **{amount: 'Sum of ' + amount for amount in HSN_CUBE_AMOUNTS}})
+
+# The HSN table: the outward supply totals, the credit and debit note totals and the net "Total HSN" (the outward
+# supply plus the credit notes less the debit notes), each with its total duty and total value
+def hsn_summary(cube):
+    amounts = {'Taxable Value (Rs.)': 'Taxable_count', 'IGST (Rs.)': 'IGST_count', 'CGST (Rs.)': 'CGST_count',
+               'SGST/UGST (Rs.)': 'SGST_count'}
+    outward = cube.loc[cube['Section'] == "Outward supply", list(amounts)].sum()
+    notes = cube[cube['Section'] == "Debit&CreditNotes"].groupby('Note type')[list(amounts)].sum()
+    notes = notes.reindex(NOTE_TYPES, fill_value=0)
+    hsn = pd.DataFrame([outward, notes.loc['Credit note'], notes.loc['Debit note'],
+                        outward + notes.loc['Credit note'] - notes.loc['Debit note']]).rename(columns=amounts)
+    hsn.insert(0, 'Type', ['HSN', 'Credit note', 'Debit note', 'Total HSN'])
+    hsn['Total duty'] = hsn['IGST_count'] + hsn['CGST_count'] + hsn['SGST_count']
+    hsn['Total value'] = hsn['Taxable_count'] + hsn['IGST_count'] + hsn['CGST_count'] + hsn['SGST_count']
+    return hsn.reset_index(drop=True)
+
+def process_step2(file_path, output_path=None):
+    if output_path is None:
+        output_path = file_path
+    write_sheets(output_path, step2_sheets(*read_sheets(file_path, STEP2_INPUT_SHEETS, columns=STEP2_INPUT_COLUMNS)))
+    return output_path
+
+def step2_sheets(df1, df3, df4, df5, df6, df7):
+    df1, df3, df4, df5, df6, df7 = [apply_schema(df, sheet) for df, sheet in zip([df1, df3, df4, df5, df6, df7], STEP2_INPUT_SHEETS)]
+
+    # The rows of every section, each sheet partitioned once, then every table built from its projection
+    sheets = dict(zip(STEP2_INPUT_SHEETS, [df1, df3, df4, df5, df6, df7]))
+    sections = {sheet: partition_sections(df, sheet) for sheet, df in sheets.items() if sheet in GSTR1_SECTIONS}
+
+    b2b = step2_table(sheets, sections, 'b2b')
+    b2cs = step2_table(sheets, sections, 'b2cs')
+    b2cl = step2_table(sheets, sections, 'b2cl')
+    b2ba = step2_table(sheets, sections, 'b2ba')
+    b2cla = step2_table(sheets, sections, 'b2cla')
+    exp = step2_table(sheets, sections, 'exp')
+    exemp = step2_table(sheets, sections, 'exemp')
+    expa = step2_table(sheets, sections, 'expa')
+
+    # The document series of the outward supply, debit/credit note and advances sheets
+    docs_1 = document_series(df1['Document number'])
+    docs_2 = document_series(df4['Document number'])
+    docs_3 = document_series(df6['Document number'])
+
+
+    cdnr = step2_table(sheets, sections, 'cdnr')
+    cdnur = step2_table(sheets, sections, 'cdnur')
+    cdnur_b2cs = step2_table(sheets, sections, 'cdnur_b2cs')
+    cdnra = step2_table(sheets, sections, 'cdnra')
+    cdnura = step2_table(sheets, sections, 'cdnura')
+    at = step2_table(sheets, sections, 'at')
+    atadj = step2_table(sheets, sections, 'atadj')
+    ata = step2_table(sheets, sections, 'ata')
+    atadja = step2_table(sheets, sections, 'atadja')
 
     docs = pd.concat([docs_1, docs_2, docs_3], ignore_index=True)
-    hsn = pd.concat([hsn_CDNR, hsn_OUTWARD], ignore_index=True)
-
-    hsn.iloc[:, 1:] = hsn.iloc[:, 1:].apply(pd.to_numeric, errors='coerce')
-    
-    transposed_hsn = hsn.T
-    transposed_hsn.columns = transposed_hsn.iloc[0]  # Promote the first row to headers
-    transposed_hsn = transposed_hsn[1:]
-
-    transposed_hsn['Total HSN'] = transposed_hsn['HSN'] + transposed_hsn['Credit note'] - transposed_hsn['Debit note']
-    selected_columns_reordered16 = ['HSN', 'Credit note', 'Debit note', 'Total HSN']  # Indices of the columns you want to select (0-based index)
-    transposed_hsn = transposed_hsn[selected_columns_reordered16]
-    hsn = transposed_hsn.T
-    hsn['Type'] = ['HSN', 'Credit note', 'Debit note', 'Total HSN']
-    selected_columns_reordered17 = ['Type', 'Taxable_count', 'IGST_count', 'CGST_count', 'SGST_count', 'Total duty', 'Total value']  # Indices of the columns you want to select (0-based index)
-    hsn = hsn[selected_columns_reordered17]
-    hsn.reset_index(drop=True, inplace=True)
-
-    source_outward_supply = df1.copy()
-    selected_columns_reordered18 = [14,15,16,17,18,19,21,23,25,27,29]
-    source_outward_supply = source_outward_supply.iloc[:, selected_columns_reordered18]
-
-    # Group by multiple columns and calculate sum for each group
-    grouped_df = source_outward_supply.groupby(['HSN', 'Unit Quantity Code', 'GST Rate (%)']).agg({
-        source_outward_supply.columns[3]: 'sum',   # Quantity
-        source_outward_supply.columns[5]: 'sum',   # Taxable Value (Rs.)
-        source_outward_supply.columns[6]: 'sum',   # IGST #(lf)(Rs.)
-        source_outward_supply.columns[7]: 'sum',   # CGST #(lf)(Rs.)
-        source_outward_supply.columns[8]: 'sum',   # SGST/UTGST #(lf)(Rs.)
-        source_outward_supply.columns[9]: 'sum'    # Cess Amount#(lf)(Rs.)
-    }).reset_index()
 
-    # Rename the columns to match the M code
-    grouped_df.rename(columns={
-        source_outward_supply.columns[3]: 'Sum of Quantity',
-        source_outward_supply.columns[5]: 'Sum of Taxable Value (Rs.)',
-        source_outward_supply.columns[6]: 'Sum of IGST (Rs.)',
-        source_outward_supply.columns[7]: 'Sum of CGST (Rs.)',
-        source_outward_supply.columns[8]: 'Sum of SGST/UGST (Rs.)',
-        source_outward_supply.columns[9]: 'Sum of Cess Amount (Rs.)'
-    }, inplace=True)
-
-    # Update the original DataFrame with the grouped and aggregated data
-    source_outward_supply = grouped_df.copy()
-
-    source_debit_credit_notes = df4.copy()
-    selected_columns_reordered19 = [9,12,13,14,15,16,17,18,19,20,21]
-    source_debit_credit_notes = source_debit_credit_notes.iloc[:, selected_columns_reordered19]
-
-    # Group by multiple columns and calculate sum for each group
-    grouped_df2 = source_debit_credit_notes.groupby(['Note type','HSN ', 'UQC', 'Rate (%)']).agg({
-        source_debit_credit_notes.columns[3]: 'sum',   # Quantity
-        source_debit_credit_notes.columns[5]: 'sum',   # Taxable Value (Rs.)
-        source_debit_credit_notes.columns[6]: 'sum',   # IGST #(lf)(Rs.)
-        source_debit_credit_notes.columns[7]: 'sum',   # CGST #(lf)(Rs.)
-        source_debit_credit_notes.columns[8]: 'sum',   # SGST/UTGST #(lf)(Rs.)
-        source_debit_credit_notes.columns[9]: 'sum'    # Cess Amount#(lf)(Rs.)
-    }).reset_index()
+    # Every HSN view is a roll-up of the one HSN cube
+    cube = hsn_cube(sheets)
+    hsn = hsn_summary(cube)
+    source_outward_supply = hsn_rollup(cube, "Outward supply", ['HSN', 'UQC', 'Rate'])
+    source_debit_credit_notes = hsn_rollup(cube, "Debit&CreditNotes", ['Note type', 'HSN', 'UQC', 'Rate'])
+
+    return [
+        ('Source_Outward_supply', source_outward_supply),
+        ('Source_Debit_Credit_Notes', source_debit_credit_notes),
+        ('HSN', hsn),
+        ('b2b,sez,de', b2b),
+        ('b2ba', b2ba),
+        ('cdnur_b2cs', cdnur_b2cs),
+        ('b2cs', b2cs),
+        ('b2cl', b2cl),
+        ('b2cla', b2cla),
+        ('cdnura', cdnura),
+        ('cdnr', cdnr),
+        ('cdnra', cdnra),
+        ('cdnur', cdnur),
+        ('exemp', exemp),
+        ('exp', exp),
+        ('expa', expa),
+        ('docs', docs),
+        ('at', at),
+        ('ata', ata),
+        ('atadj', atadj),
+        ('atadja', atadja),
+        # ('docs (1)', docs_1),
+        # ('docs (2)', docs_2),
+        # ('docs (3)', docs_3),
+    ]
 
-    # Rename the columns to match the M code
-    grouped_df2.rename(columns={
-        source_debit_credit_notes.columns[3]: 'Sum of Quantity',
-        source_debit_credit_notes.columns[5]: 'Sum of Taxable Value (Rs.)',
-        source_debit_credit_notes.columns[6]: 'Sum of IGST (Rs.)',
-        source_debit_credit_notes.columns[7]: 'Sum of CGST (Rs.)',
-        source_debit_credit_notes.columns[8]: 'Sum of SGST/UGST (Rs.)',
-        source_debit_credit_notes.columns[9]: 'Sum of Cess Amount (Rs.)'
-    }, inplace=True)
-
-    # Update the original DataFrame with the grouped and aggregated data
-    source_debit_credit_notes = grouped_df2.copy()
-
-
-
-    with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
-        source_outward_supply.to_excel(writer, sheet_name='Source_Outward_supply', index=False)
-        source_debit_credit_notes.to_excel(writer, sheet_name='Source_Debit_Credit_Notes', index=False)
-        hsn.to_excel(writer, sheet_name='HSN', index=False)
-        b2b.to_excel(writer, sheet_name='b2b,sez,de', index=False)
-        b2ba.to_excel(writer, sheet_name='b2ba', index=False)
-        cdnur_b2cs.to_excel(writer, sheet_name='cdnur_b2cs', index=False)
-        b2cs.to_excel(writer, sheet_name='b2cs', index=False)
-        b2cl.to_excel(writer, sheet_name='b2cl', index=False)
-        b2cla.to_excel(writer, sheet_name='b2cla', index=False)
-        cdnura.to_excel(writer, sheet_name='cdnura', index=False)
-        cdnr.to_excel(writer, sheet_name='cdnr', index=False)
-        cdnra.to_excel(writer, sheet_name='cdnra', index=False)
-        cdnur.to_excel(writer, sheet_name='cdnur', index=False)
-        exemp.to_excel(writer, sheet_name='exemp', index=False)
-        exp.to_excel(writer, sheet_name='exp', index=False)
-        expa.to_excel(writer, sheet_name='expa', index=False)
-        docs.to_excel(writer, sheet_name='docs', index=False)
-        at.to_excel(writer, sheet_name='at', index=False)
-        ata.to_excel(writer, sheet_name='ata', index=False)
-        atadj.to_excel(writer, sheet_name='atadj', index=False)
-        atadja.to_excel(writer, sheet_name='atadja', index=False)
-        # hsn_OUTWARD.to_excel(writer, sheet_name='hsn_OUTWARD', index=False)
-        # hsn_CDNR.to_excel(writer, sheet_name='hsn_CDNR', index=False)
-        # docs_1.to_excel(writer, sheet_name='docs (1)', index=False)
-        # docs_2.to_excel(writer, sheet_name='docs (2)', index=False)
-        # docs_3.to_excel(writer, sheet_name='docs (3)', index=False)
-
-    return file_path
-
-def compare_excel_files(company_file_path, government_file_path):
-    company = pd.ExcelFile(company_file_path)
-    government = pd.ExcelFile(government_file_path)
-    
-    df1 = pd.read_excel(company, sheet_name="b2b,sez,de")
-    df2 = pd.read_excel(company, sheet_name="cdnur")
-    df3 = pd.read_excel(company, sheet_name="cdnr")
-    df4 = pd.read_excel(company, sheet_name="exp")
-    df5 = pd.read_excel(government, sheet_name="b2b, sez, de")
-    df6 = pd.read_excel(government, sheet_name="cdnur")
-    df7 = pd.read_excel(government, sheet_name="cdnr")
-    df8 = pd.read_excel(government, sheet_name="exp")
-
-    df5 = df5.iloc[2:]
-    # Step 3: Set the 6th row as the header.
-    header_row = df5.iloc[0]
-    df5 = df5[1:]
-    df5.columns = header_row
-    b2b_match = pd.merge(
-        df1,
-        df5,
-        how='outer',
-        left_on=["Document number", df1.columns[0]],
-        right_on=["Invoice number", "GSTIN/UIN of Recipient"],
-        suffixes=('_b2b', '_b2b_govt')
-    )
-
-    selected_columns_reordered = [0,2,8,11,13,14,15,17,19,25,28,29,30,31]
-    b2b_match = b2b_match.iloc[:, selected_columns_reordered]
-
-    # Define a function to apply the conditions and generate remarks
-    def generate_remark(row):
-        if pd.isnull(row.iloc[0]):
-            return "Unmatched / Its not present in Optitax's data"
-        elif pd.isnull(row.iloc[7]):
-            return "Unmatched / Its not present in Govt template"
-        elif row.iloc[0] == row.iloc[7]:
-            return "Matched"
-        else:
-            return "Unmatched / GSTIN"
-
-    # Add a new column "Remark GSTIN of recipient" using the custom function
-    b2b_match["Remark GSTIN of recipient"] = b2b_match.apply(generate_remark, axis=1)
-
-    # Define a function to apply the conditions and generate remarks for "Remark Taxable Value"
-    def generate_taxable_value_remark(row):
-        if pd.isnull(row["Taxable Value (Rs.)"]):
-            return "Unmatched / Its not present in Optitax's data"
-        elif pd.isnull(row["Taxable Value"]):
-            return "Unmatched / Its not present in Govt template"
-        elif row["Taxable Value (Rs.)"] == row["Taxable Value"]:
-            return "Matched"
-        else:
-            return "Unmatched / Taxable value"
-
-    # Add a new column "Remark Taxable Value" using the custom function
-    b2b_match["Remark Taxable Value"] = b2b_match.apply(generate_taxable_value_remark, axis=1)
-
-    def generate_igst_remark(row):
-        if pd.isnull(row.iloc[13]):
-            return "Unmatched / Its not present in Optitax's data"
-        elif pd.isnull(row["Integrated Tax"]):
-            return "Unmatched / Its not present in Govt template"
-        elif row.iloc[13] == row["Integrated Tax"]:
-            return "Matched"
-        else:
-            return "Unmatched / IGST"
-
-    # Add a new column "Remark IGST" using the custom function
-    b2b_match["Remark IGST"] = b2b_match.apply(generate_igst_remark, axis=1)
-
-    # Define a function to apply the conditions and generate remarks for "Remark CGST"
-    def generate_cgst_remark(row):
-        if pd.isnull(row.iloc[14]):
-            return "Unmatched / Its not present in Optitax's data"
-        elif pd.isnull(row["Central Tax"]):
-            return "Unmatched / Its not present in Govt template"
-        elif row.iloc[13] == row["Central Tax"]:
-            return "Matched"
-        else:
-            return "Unmatched / CGST"
-
-    # Add a new column "Remark CGST" using the custom function
-    b2b_match["Remark CGST"] = b2b_match.apply(generate_cgst_remark, axis=1)
-
-    # Define a function to apply the conditions and generate remarks for "Remark SGST"
-    def generate_sgst_remark(row):
-        if pd.isnull(row.iloc[15]):
-            return "Unmatched / Its not present in Optitax's data"
-        elif pd.isnull(row["State/UT Tax"]):
-            return "Unmatched / Its not present in Govt template"
-        elif row.iloc[15] == row["State/UT Tax"]:
-            return "Matched"
-        else:
-            return "Unmatched / SGST"
-
-    # Add a new column "Remark SGST" using the custom function
-    b2b_match["Remark SGST"] = b2b_match.apply(generate_sgst_remark, axis=1)
-
-    # Define a function to apply the conditions and generate remarks for "Remark Type of Supply"
-    def generate_type_of_supply_remark(row):
-        if pd.isnull(row["Type of supply"]):
-            return "Unmatched / Its not present in Optitax's data"
-        elif pd.isnull(row["Invoice Type"]):
-            return "Unmatched / Its not present in Govt template"
-        elif row["Type of supply"] == row["Invoice Type"]:
-            return "Matched"
-        else:
-            return "Unmatched / Type of supply"
-
-    # Add a new column "Remark Type of Supply" using the custom function
-    b2b_match["Remark Type of Supply"] = b2b_match.apply(generate_type_of_supply_remark, axis=1)
-
-    b2b_match["Taxable Value (Rs.)"] = pd.to_numeric(b2b_match["Taxable Value (Rs.)"], errors='coerce')
-    b2b_match["Taxable Value"] = pd.to_numeric(b2b_match["Taxable Value"], errors='coerce')
-    b2b_match.iloc[:, 13] = pd.to_numeric(b2b_match.iloc[:, 13], errors='coerce')
-    b2b_match["Integrated Tax"] = pd.to_numeric(b2b_match["Integrated Tax"], errors='coerce')
-    b2b_match.iloc[:, 14] = pd.to_numeric(b2b_match.iloc[:, 14], errors='coerce')
-    b2b_match["Central Tax"] = pd.to_numeric(b2b_match["Central Tax"], errors='coerce')
-    b2b_match.iloc[:, 15] = pd.to_numeric(b2b_match.iloc[:, 15], errors='coerce')
-    b2b_match["State/UT Tax"] = pd.to_numeric(b2b_match["State/UT Tax"], errors='coerce')
-
-    # Define a function to calculate the "Amount difference"
-    def calculate_amount_difference(row):
-        taxable_value_diff = row["Taxable Value (Rs.)"] - row["Taxable Value"]
-        igst_diff = row.iloc[13] - row["Integrated Tax"]
-        cgst_diff = row.iloc[14] - row["Central Tax"]
-        sgst_diff = row.iloc[15] - row["State/UT Tax"]
-        
-        # Check for NaN values before rounding
-        taxable_value_diff = 0 if pd.isna(taxable_value_diff) else taxable_value_diff
-        igst_diff = 0 if pd.isna(igst_diff) else igst_diff
-        cgst_diff = 0 if pd.isna(cgst_diff) else cgst_diff
-        sgst_diff = 0 if pd.isna(sgst_diff) else sgst_diff
-        
-        # Round the sum of differences to the nearest integer
-        amount_difference = round(taxable_value_diff + igst_diff + cgst_diff + sgst_diff)
-        return amount_difference
-
-    # Add a new column "Amount difference" using the custom function
-    b2b_match["Amount difference"] = b2b_match.apply(calculate_amount_difference, axis=1)
-
-    df6 = df6.iloc[2:]
-    # Step 3: Set the 6th row as the header.
-    header_row = df6.iloc[0]
-    df6 = df6[1:]
-    df6.columns = header_row
+# -------------------------------------------* Reconciliation *----------------------------------------------------
+
+# Remarks of a reconciled value missing on one side
+NOT_IN_COMPANY = "Unmatched / Its not present in Optitax's data"
+NOT_IN_GOVERNMENT = "Unmatched / Its not present in Govt template"
+
+# Amounts that differ by at most GST_AMOUNT_TOLERANCE rupees, or by GST_AMOUNT_RELATIVE_TOLERANCE of the larger
+# amount, are "Matched within tolerance" instead of unmatched. With GST_AMOUNT_ROUNDING=rupee both amounts are first
+# rounded to the rupee (halves away from zero) as the portal shows them. By default only equal amounts match.
+AMOUNT_TOLERANCE = float(os.environ.get('GST_AMOUNT_TOLERANCE', 0))
+AMOUNT_RELATIVE_TOLERANCE = float(os.environ.get('GST_AMOUNT_RELATIVE_TOLERANCE', 0))
+AMOUNT_ROUNDING_MODES = ['rupee']
+AMOUNT_ROUNDING = os.environ.get('GST_AMOUNT_ROUNDING') or None
+
+if AMOUNT_ROUNDING is not None and AMOUNT_ROUNDING not in AMOUNT_ROUNDING_MODES:
+    raise ValueError(f"GST_AMOUNT_ROUNDING should be one of {', '.join(AMOUNT_ROUNDING_MODES)}")
+
+# Remarks comparing amounts, the ones the tolerances apply to
+AMOUNT_REMARKS = ["Remark Taxable Value", "Remark IGST", "Remark CGST", "Remark SGST"]
+MATCHED_WITHIN_TOLERANCE = "Matched within tolerance"
+
+# Column of a reconciled sheet by header, or by position where the header repeats
+def match_column(df, column):
+    if isinstance(column, int):
+        return df.iloc[:, column]
+    return df[column]
+
+# Remark of every row at once: the side where the value is blank, else "Matched" or the mismatch remark. The values
+# compared can be other columns than the ones checked for blanks (`compare`), they are only looked up when a row has both.
+# Rows the amounts fall within the tolerances can be given as `within_tolerance`, they are "Matched within tolerance"
+# unless the values are equal.
+def match_remark(df, company, government, mismatch, compare=None, within_tolerance=None):
+    company_value = match_column(df, company)
+    government_value = match_column(df, government)
+    matched = company_value.notna() & government_value.notna()
+    if matched.any():
+        compared_company, compared_government = compare or (company, government)
+        matched = same_values(match_column(df, compared_company), match_column(df, compared_government))
+    rules = [
+        (company_value.isna(), NOT_IN_COMPANY),
+        (government_value.isna(), NOT_IN_GOVERNMENT),
+        (matched, "Matched"),
+    ]
+    if within_tolerance is not None:
+        rules.append((within_tolerance, MATCHED_WITHIN_TOLERANCE))
+    return evaluate_rules(df, rules, mismatch)
+
+# Whole rupees, halves rounded away from zero
+def rupees(amounts):
+    return np.sign(amounts) * np.floor(np.abs(amounts) + 0.5)
+
+# Amounts of a reconciled column as floats. Positions past the reconciled columns are the remark columns added after
+# them, text that is never an amount.
+def amount_values(df, column):
+    if isinstance(column, int) and column >= len(df.columns):
+        return np.full(len(df), np.nan)
+    return to_number(match_column(df, column)).to_numpy(dtype=float)
+
+# Rows x pairs mask of the (company, government) amount pairs that are both numbers and agree within the tolerances,
+# all the tax columns compared in one pass
+def amounts_within_tolerance(df, pairs):
+    company = np.column_stack([amount_values(df, column) for column, _ in pairs])
+    government = np.column_stack([amount_values(df, column) for _, column in pairs])
+    if AMOUNT_ROUNDING == 'rupee':
+        company, government = rupees(company), rupees(government)
+    allowed = np.maximum(AMOUNT_TOLERANCE,
+                         AMOUNT_RELATIVE_TOLERANCE * np.maximum(np.abs(company), np.abs(government)))
+    return np.abs(company - government) <= allowed
+
+# Company less government amount for each (company, government) pair, a lone company column where the government
+# sheet has none. Blank differences count as 0 and the total is rounded to the rupee (halves to even, like round()).
+def amount_difference(df, amounts):
+    total = 0
+    for company, government in amounts:
+        difference = to_number(match_column(df, company))
+        if government is not None:
+            difference = difference - to_number(match_column(df, government))
+        total = total + difference.fillna(0)
+    return pd.Series(np.rint(total).astype(np.int64), index=df.index)
+
+# Invoice numbers left unmatched by the exact join are matched again when they are the same number once case,
+# whitespace, separators and leading zeros are ignored ("inv/0012" and "INV-12"). A separator between two digits still
+# splits the number ("A/1/23" is not "A/12/3"), whichever separator it is. With GST_FUZZY_MATCH_DISTANCE set,
+# numbers still unmatched then match the closest number within that many edits. It is off by default since the
+# neighbouring invoices of a customer usually differ by one character.
+FUZZY_MATCH_DISTANCE = int(os.environ.get('GST_FUZZY_MATCH_DISTANCE', 0))
+
+# "Match confidence" of a pair of rows: 1 for the exact join, NORMALIZED_MATCH_CONFIDENCE for the same normalized number,
+# and that scaled down by the share of the number edited for a fuzzy match
+NORMALIZED_MATCH_CONFIDENCE = 0.95
+
+INVOICE_SEPARATORS = re.compile(r'[\s/\\_.-]+')
+LEADING_ZEROS = re.compile(r'(?<!\d)0+(?=\d)')
+
+# A run of separators between two digits becomes a single "/", any other run is dropped
+def separator_key(match):
+    text, start, end = match.string, match.start(), match.end()
+    if 0 < start and end < len(text) and text[start - 1].isdigit() and text[end].isdigit():
+        return '/'
+    return ''
+
+# Invoice number (or GSTIN) compared by the second pass, None for blanks
+def invoice_key(value, strip_zeros=True):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    key = INVOICE_SEPARATORS.sub(separator_key, str(value).upper())
+    if strip_zeros:
+        key = LEADING_ZEROS.sub('', key)
+    return key or None
+
+# Number of single character insertions, deletions and substitutions turning one text into the other
+def edit_distance(first, second):
+    previous = list(range(len(second) + 1))
+    for i, first_char in enumerate(first, 1):
+        current = [i]
+        for j, second_char in enumerate(second, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (first_char != second_char)))
+        previous = current
+    return previous[-1]
+
+# BK-tree of invoice numbers: [number, row labels, {distance: child}]. Searching only visits the children whose distance
+# can hold a number close enough (triangle inequality), so a block is not compared number by number.
+def bk_add(tree, key, label):
+    if tree is None:
+        return [key, [label], {}]
+    node = tree
+    while True:
+        distance = edit_distance(key, node[0])
+        if distance == 0:
+            node[1].append(label)
+            return tree
+        if distance not in node[2]:
+            node[2][distance] = [key, [label], {}]
+            return tree
+        node = node[2][distance]
+
+def bk_search(tree, key, max_distance):
+    found = []
+    nodes = [tree] if tree is not None else []
+    while nodes:
+        node = nodes.pop()
+        distance = edit_distance(key, node[0])
+        if distance <= max_distance:
+            found.append((distance, node[0], node[1]))
+        nodes.extend(child for gap, child in node[2].items() if distance - max_distance <= gap <= distance + max_distance)
+    return found
+
+# Pairs (company row, government row, confidence) among the rows left unmatched, each row paired at most once. Rows are
+# blocked by their second key (the GSTIN) so only numbers of the same recipient are compared, and rows are taken in order.
+def residue_pairs(company_rows, government_rows, max_distance=FUZZY_MATCH_DISTANCE):
+    blocks = {}
+    for label, number, block in government_rows.itertuples(name=None):
+        key, block = invoice_key(number), invoice_key(block, strip_zeros=False)
+        if key is not None and block is not None:
+            blocks.setdefault(block, {}).setdefault(key, []).append(label)
+
+    pairs = []
+    used = set()
+    unpaired = []
+    for label, number, block in company_rows.itertuples(name=None):
+        key, block = invoice_key(number), invoice_key(block, strip_zeros=False)
+        if key is None or block is None or block not in blocks:
+            continue
+        candidates = [candidate for candidate in blocks[block].get(key, []) if candidate not in used]
+        if candidates:
+            used.add(candidates[0])
+            pairs.append((label, candidates[0], NORMALIZED_MATCH_CONFIDENCE))
+        else:
+            unpaired.append((label, key, block))
+
+    if max_distance > 0 and unpaired:
+        trees = {}
+        for label, key, block in unpaired:
+            if block not in trees:
+                tree = None
+                for number, labels in blocks[block].items():
+                    for candidate in labels:
+                        if candidate not in used:
+                            tree = bk_add(tree, number, candidate)
+                trees[block] = tree
+            found = []
+            for distance, number, labels in bk_search(trees[block], key, max_distance):
+                labels = [candidate for candidate in labels if candidate not in used]
+                if labels:
+                    found.append((distance, labels[0], number))
+            if found:
+                distance, candidate, number = min(found)
+                used.add(candidate)
+                pairs.append((label, candidate, NORMALIZED_MATCH_CONFIDENCE * (1 - distance / max(len(key), len(number)))))
+    return pairs
+
+# Put the government columns of each paired government-only row on its company-only row and drop the government row
+def pair_residue(match, split, confidence, company_keys, government_keys):
+    company_only = match[match['_merge'] == 'left_only']
+    government_only = match[match['_merge'] == 'right_only']
+    pairs = residue_pairs(company_only[company_keys], government_only[government_keys])
+    if not pairs:
+        return match, confidence
+
+    company_labels, government_labels, scores = zip(*pairs)
+    paired = pd.concat([match.loc[list(company_labels)].iloc[:, :split].reset_index(drop=True),
+                        match.loc[list(government_labels)].iloc[:, split:].reset_index(drop=True)], axis=1)
+    paired.index = list(company_labels)
+    order = match.index.drop(list(government_labels))
+    match = pd.concat([match.drop(index=list(company_labels) + list(government_labels)), paired]).reindex(order)
+    confidence = confidence.copy()
+    confidence[list(company_labels)] = scores
+    return match.reset_index(drop=True), confidence.reindex(order).reset_index(drop=True)
+
+# A key with several rows on a side would join each of them with every row of the key on the other side, multiplying
+# the rows and counting their amounts more than once. With GST_DUPLICATE_KEYS=rank (the default) the rows of a key are
+# taken in the order of their amounts on each side, and the nth of one side only pairs with the nth of the other, so
+# the lines of an invoice (one per tax rate) pair up whatever order the sheets list them in. With sum the rows of a key are first added up into one (the
+# amounts summed, the other columns of its first row), and with join they are joined as they are.
+DUPLICATE_KEY_MODES = ['rank', 'sum', 'join']
+DUPLICATE_KEYS = os.environ.get('GST_DUPLICATE_KEYS') or 'rank'
+
+if DUPLICATE_KEYS not in DUPLICATE_KEY_MODES:
+    raise ValueError(f"GST_DUPLICATE_KEYS should be one of {', '.join(DUPLICATE_KEY_MODES)}")
+
+DUPLICATE_RANK = '_duplicate_rank'
+
+# Rows of every key on both sides, with the rows a plain join of them would make against the rows when duplicates
+# are paired one to one. "Explosion factor" is the first over the second.
+def key_multiplicity(company, government, company_keys, government_keys):
+    company_counts = company.groupby(company_keys, dropna=False, observed=True).size()
+    government_counts = government.groupby(government_keys, dropna=False, observed=True).size()
+    government_counts.index = government_counts.index.set_names(company_counts.index.names)
+    counts = pd.concat([company_counts, government_counts], axis=1).fillna(0)
+    company_rows, government_rows = counts.iloc[:, 0], counts.iloc[:, 1]
+    joined = np.where((company_rows > 0) & (government_rows > 0), company_rows * government_rows,
+                      company_rows + government_rows).sum()
+    paired = np.maximum(company_rows, government_rows).sum()
+    return {
+        'Company rows': len(company),
+        'Government rows': len(government),
+        'Duplicated keys': int(((company_rows > 1) | (government_rows > 1)).sum()),
+        'Joined rows': int(joined),
+        'Paired rows': int(paired),
+        'Explosion factor': round(joined / paired, 2) if paired else 1.0,
+    }
+
+# Side (0 for the company sheet, 1 for the government one) and position there of an amount column of a reconciliation.
+# Positions refer to the kept columns of the join (company columns first), headers are found on the side that has
+# them. Positions past the kept columns are remark columns and have no side (None).
+def amount_side(company, government, columns, column):
+    if isinstance(column, int):
+        if column >= len(columns):
+            return None
+        position = columns[column]
+        if position < len(company.columns):
+            return 0, position
+        return 1, position - len(company.columns)
+    if column in company.columns:
+        return 0, company.columns.get_loc(column)
+    return 1, government.columns.get_loc(column)
+
+# Positions in the company and in the government sheet of the amount columns of a reconciliation
+def side_amount_columns(company, government, columns, amounts):
+    sides = ([], [])
+    for column in (column for pair in amounts for column in pair if column is not None):
+        side = amount_side(company, government, columns, column)
+        if side is not None:
+            sides[side[0]].append(side[1])
+    return sides
+
+# Positions in the company and in the government sheet of the amount pairs that compare a company column with a
+# government one, in the order of the pairs
+def paired_amount_columns(company, government, columns, amounts):
+    company_columns, government_columns = [], []
+    for pair in amounts:
+        sides = [amount_side(company, government, columns, column) for column in pair if column is not None]
+        if len(sides) == 2 and sides[0] is not None and sides[1] is not None and (sides[0][0], sides[1][0]) == (0, 1):
+            company_columns.append(sides[0][1])
+            government_columns.append(sides[1][1])
+    return company_columns, government_columns
+
+# Rank of every row within its key, the rows of a key taken in the order of their amounts (positions, compared as
+# numbers, blanks last) and then in the order of the sheet
+def duplicate_rank(df, keys, amount_columns):
+    amounts = pd.DataFrame({i: to_number(df.iloc[:, position]).to_numpy() for i, position in enumerate(amount_columns)})
+    order = np.arange(len(df))
+    if amount_columns:
+        order = amounts.sort_values(list(amounts.columns), kind='stable', na_position='last').index.to_numpy()
+    ranks = np.empty(len(df), dtype='int64')
+    ranks[order] = df.take(order).groupby(keys, dropna=False, observed=True).cumcount().to_numpy()
+    return ranks
+
+# One row per key: its first row with the amount columns (positions) summed over the rows of the key
+def sum_duplicates(df, keys, amount_columns):
+    first = ~df.duplicated(keys)
+    if first.all():
+        return df
+    groups = df.groupby(keys, dropna=False, sort=False, observed=True).ngroup()
+    summed = df[first].copy()
+    for position in amount_columns:
+        totals = to_number(df.iloc[:, position]).groupby(groups).sum(min_count=1)
+        summed.iloc[:, position] = totals.reindex(groups[first]).to_numpy()
+    return summed
+
+# Outer join of a company sheet with the government one on their keys (keeping the given columns), then every remark
+# (name, company column, government column, mismatch remark[, compared columns]) and the amount difference computed
+# column by column. The amount columns are stored as numbers once the remarks, which compare the values as read, are done.
+# With `second_pass` the first keys (the invoice numbers) of the rows left unmatched are matched again within the
+# same second key (the GSTIN), and a "Match confidence" column is added. Duplicated keys are handled as
+# GST_DUPLICATE_KEYS says, the key multiplicity of the sheets (with the reconciled rows) is returned with the sheet.
+def reconcile(company, government, company_keys, government_keys, suffixes, columns, remarks, amounts, second_pass=False):
+    multiplicity = key_multiplicity(company, government, company_keys, government_keys)
+    split = len(company.columns)
+    multiplied = multiplicity['Joined rows'] > multiplicity['Paired rows']
+    if DUPLICATE_KEYS == 'sum' and multiplied:
+        company_amounts, government_amounts = side_amount_columns(company, government, columns, amounts)
+        company = sum_duplicates(company, company_keys, company_amounts)
+        government = sum_duplicates(government, government_keys, government_amounts)
+    elif DUPLICATE_KEYS == 'rank' and multiplied:
+        company_amounts, government_amounts = paired_amount_columns(company, government, columns, amounts)
+        company = company.assign(**{DUPLICATE_RANK: duplicate_rank(company, company_keys, company_amounts)})
+        government = government.assign(**{DUPLICATE_RANK: duplicate_rank(government, government_keys, government_amounts)})
+        company_keys, government_keys = company_keys + [DUPLICATE_RANK], government_keys + [DUPLICATE_RANK]
+
+    match = pd.merge(company, government, how='outer', left_on=company_keys, right_on=government_keys, suffixes=suffixes,
+                     indicator=True)
+    if DUPLICATE_RANK in match.columns:
+        match = match.drop(columns=DUPLICATE_RANK)
+        company_keys, government_keys = company_keys[:-1], government_keys[:-1]
+    confidence = pd.Series(np.where(match['_merge'] == 'both', 1.0, np.nan), index=match.index)
+    if second_pass:
+        match, confidence = pair_residue(match, split, confidence, company_keys, government_keys)
+    match = match.iloc[:, columns]
+
+    # The amount remarks get their tolerance masks from one comparison, made before any remark column is added
+    within_tolerance = {}
+    amount_remarks = [remark for remark in remarks if remark[0] in AMOUNT_REMARKS]
+    if amount_remarks and (AMOUNT_TOLERANCE or AMOUNT_RELATIVE_TOLERANCE or AMOUNT_ROUNDING):
+        pairs = [compare[0] if compare else (company_column, government_column)
+                 for _, company_column, government_column, _, *compare in amount_remarks]
+        mask = amounts_within_tolerance(match, pairs)
+        within_tolerance = {remark[0]: pd.Series(mask[:, i], index=match.index) for i, remark in enumerate(amount_remarks)}
+
+    for name, company_column, government_column, mismatch, *compare in remarks:
+        match[name] = match_remark(match, company_column, government_column, mismatch, *compare,
+                                   within_tolerance=within_tolerance.get(name))
+
+    for pair in amounts:
+        for column in pair:
+            if isinstance(column, int):
+                match.iloc[:, column] = pd.to_numeric(match.iloc[:, column], errors='coerce')
+            elif column is not None:
+                match[column] = pd.to_numeric(match[column], errors='coerce')
+
+    match["Amount difference"] = amount_difference(match, amounts)
+    if second_pass:
+        match["Match confidence"] = confidence.values
+    multiplicity['Reconciled rows'] = len(match)
+    return match, multiplicity
+
+# Sheets of the step 2 workbook and of the government workbook read by the comparison
+COMPARE_COMPANY_SHEETS = ["b2b,sez,de", "cdnur", "cdnr", "exp"]
+COMPARE_GOVERNMENT_SHEETS = ["b2b, sez, de", "cdnur", "cdnr", "exp"]
+
+def compare_excel_files(company_file_path, government_file_path, output_path=None):
+    if output_path is None:
+        output_path = company_file_path
+    write_sheets(output_path, compare_sheets(*read_sheets(company_file_path, COMPARE_COMPANY_SHEETS),
+                                             *read_sheets(government_file_path, COMPARE_GOVERNMENT_SHEETS)))
+    return output_path
+
+# The government sheets have two rows above their header
+def government_sheet(df):
+    df = df.iloc[2:]
+    header_row = df.iloc[0]
+    df = df[1:]
+    df.columns = header_row
+    return df
+
+def compare_sheets(df1, df2, df3, df4, df5, df6, df7, df8):
+
+    # b2b on document number and recipient GSTIN, then on near invoice numbers of the same GSTIN for the rows left over.
+    # The CGST remark compares the IGST (column 13) with the central tax.
+    b2b_match, b2b_multiplicity = reconcile(df1, government_sheet(df5),
+        ["Document number", df1.columns[0]], ["Invoice number", "GSTIN/UIN of Recipient"], ('_b2b', '_b2b_govt'),
+        [0,2,8,11,13,14,15,17,19,25,28,29,30,31],
+        [
+            ("Remark GSTIN of recipient", 0, 7, "Unmatched / GSTIN"),
+            ("Remark Taxable Value", "Taxable Value (Rs.)", "Taxable Value", "Unmatched / Taxable value"),
+            ("Remark IGST", 13, "Integrated Tax", "Unmatched / IGST"),
+            ("Remark CGST", 14, "Central Tax", "Unmatched / CGST", (13, "Central Tax")),
+            ("Remark SGST", 15, "State/UT Tax", "Unmatched / SGST"),
+            ("Remark Type of Supply", "Type of supply", "Invoice Type", "Unmatched / Type of supply"),
+        ],
+        [("Taxable Value (Rs.)", "Taxable Value"), (13, "Integrated Tax"), (14, "Central Tax"), (15, "State/UT Tax")],
+        second_pass=True)
+
+    # cdnur on type of supply and note number, the government sheet has no CGST/SGST
+    cdnur_match, cdnur_multiplicity = reconcile(df2, government_sheet(df6),
+        ["Type of supply", "Note number"], ["UR Type", "Note Number"], ('_cdnur', '_cdnur_govt'),
+        [0,1,3,8,10,11,12,16,17,19,24,25],
+        [
+            ("Remark Taxable Value", "Taxable Value (Rs.)", "Taxable Value", "Unmatched / Taxable value"),
+            ("Remark IGST", 4, "Integrated Tax", "Unmatched / IGST"),
+            ("Remark Type of Supply", "Type of supply", "UR Type", "Unmatched / Type of supply"),
+        ],
+        [("Taxable Value (Rs.)", "Taxable Value"), (4, "Integrated Tax"), (5, None), (6, None)])
+
+    # cdnr on recipient GSTIN and note number
+    cdnr_match, cdnr_multiplicity = reconcile(df3, government_sheet(df7),
+        ["GSTIN of recipient", "Note number"], ["GSTIN/UIN of Recipient", "Note Number"], ('_cdnr', '_cdnr_govt'),
+        [0,2,7,11,12,13,14,19,21,23,26,30,31,32,33],
+        [
+            ("Remark Taxable Value", "Taxable Value (Rs.)", "Taxable Value", "Unmatched"),
+            ("Remark GSTIN of recipient", "GSTIN of recipient", "GSTIN/UIN of Recipient", "Unmatched",
+             ("GSTIN of recipient", "Govt cdnr.GSTIN/UIN of Recipient")),
+            ("Remark IGST", 4, "Integrated Tax", "Unmatched"),
+            ("Remark CGST", 5, "Central Tax", "Unmatched"),
+            ("Remark SGST", 6, "State/UT Tax", "Unmatched"),
+            ("Remark Type of Supply", "Type of supply", "Note Supply Type", "Unmatched"),
+        ],
+        [("Taxable Value (Rs.)", "Taxable Value"), (4, "Integrated Tax"), (5, "Central Tax"), (6, "State/UT Tax")])
+
+    # exp on document number, the government invoice numbers are read as whole numbers
+    df8 = government_sheet(df8)
+    df8["Invoice Number"] = pd.to_numeric(df8["Invoice Number"], errors='coerce').astype(pd.Int64Dtype())
 
-    cdnur_match = pd.merge(
-        df2,
-        df6,
-        how='outer',
-        left_on=["Type of supply", "Note number"],
-        right_on=["UR Type", "Note Number"],
-        suffixes=('_cdnur', '_cdnur_govt')
-    )
-
-    selected_columns_reordered2 = [0,1,3,8,10,11,12,16,17,19,24,25]
-    cdnur_match = cdnur_match.iloc[:, selected_columns_reordered2]
-
-    # Define a function to apply the conditions and generate remarks for "Remark Taxable Value"
-    def generate_taxable_value_remark(row):
-        if pd.isnull(row["Taxable Value (Rs.)"]):
-            return "Unmatched / Its not present in Optitax's data"
-        elif pd.isnull(row["Taxable Value"]):
-            return "Unmatched / Its not present in Govt template"
-        elif row["Taxable Value (Rs.)"] == row["Taxable Value"]:
-            return "Matched"
-        else:
-            return "Unmatched / Taxable value"
-
-    # Add a new column "Remark Taxable Value" using the custom function
-    cdnur_match["Remark Taxable Value"] = cdnur_match.apply(generate_taxable_value_remark, axis=1)
-
-    def generate_igst_remark(row):
-        if pd.isnull(row.iloc[4]):
-            return "Unmatched / Its not present in Optitax's data"
-        elif pd.isnull(row["Integrated Tax"]):
-            return "Unmatched / Its not present in Govt template"
-        elif row.iloc[4] == row["Integrated Tax"]:
-            return "Matched"
-        else:
-            return "Unmatched / IGST"
-
-    # Add a new column "Remark IGST" using the custom function
-    cdnur_match["Remark IGST"] = cdnur_match.apply(generate_igst_remark, axis=1)
-
-    # Define a function to apply the conditions and generate remarks for "Remark Type of Supply"
-    def generate_type_of_supply_remark(row):
-        if pd.isnull(row["Type of supply"]):
-            return "Unmatched / Its not present in Optitax's data"
-        elif pd.isnull(row["UR Type"]):
-            return "Unmatched / Its not present in Govt template"
-        elif row["Type of supply"] == row["UR Type"]:
-            return "Matched"
-        else:
-            return "Unmatched / Type of supply"
-
-    # Add a new column "Remark Type of Supply" using the custom function
-    cdnur_match["Remark Type of Supply"] = cdnur_match.apply(generate_type_of_supply_remark, axis=1)
-
-    cdnur_match["Taxable Value (Rs.)"] = pd.to_numeric(cdnur_match["Taxable Value (Rs.)"], errors='coerce')
-    cdnur_match["Taxable Value"] = pd.to_numeric(cdnur_match["Taxable Value"], errors='coerce')
-    cdnur_match.iloc[:, 4] = pd.to_numeric(cdnur_match.iloc[:, 4], errors='coerce')
-    cdnur_match["Integrated Tax"] = pd.to_numeric(cdnur_match["Integrated Tax"], errors='coerce')
-    cdnur_match.iloc[:, 5] = pd.to_numeric(cdnur_match.iloc[:, 5], errors='coerce')
-    # cdnur_match["Central Tax"] = pd.to_numeric(cdnur_match["Central Tax"], errors='coerce')
-    cdnur_match.iloc[:, 6] = pd.to_numeric(cdnur_match.iloc[:, 6], errors='coerce')
-    # cdnur_match["State/UT Tax"] = pd.to_numeric(cdnur_match["State/UT Tax"], errors='coerce')
-
-    # Define a function to calculate the "Amount difference"
-    def calculate_amount_difference(row):
-        taxable_value_diff = row["Taxable Value (Rs.)"] - row["Taxable Value"]
-        igst_diff = row.iloc[4] - row["Integrated Tax"]
-        cgst_diff = row.iloc[5]
-        sgst_diff = row.iloc[6]
-        
-        # Check for NaN values before rounding
-        taxable_value_diff = 0 if pd.isna(taxable_value_diff) else taxable_value_diff
-        igst_diff = 0 if pd.isna(igst_diff) else igst_diff
-        cgst_diff = 0 if pd.isna(cgst_diff) else cgst_diff
-        sgst_diff = 0 if pd.isna(sgst_diff) else sgst_diff
-        
-        # Round the sum of differences to the nearest integer
-        amount_difference = round(taxable_value_diff + igst_diff + cgst_diff + sgst_diff)
-        return amount_difference
-
-    # Add a new column "Amount difference" using the custom function
-    cdnur_match["Amount difference"] = cdnur_match.apply(calculate_amount_difference, axis=1)
-
-    df7 = df7.iloc[2:]
-    # Step 3: Set the 6th row as the header.
-    header_row = df7.iloc[0]
-    df7 = df7[1:]
-    df7.columns = header_row
+    exp_match, exp_multiplicity = reconcile(df4, df8,
+        ["Document number"], ["Invoice Number"], ('_exp', '_exp_govt'),
+        [0,1,8,10,11,12,14,15,22,23],
+        [
+            ("Remark Taxable Value", "Taxable Value (Rs.)", "Taxable Value", "Unmatched"),
+            ("Remark IGST", 4, "Integrated Tax", "Unmatched"),
+            ("Remark Type of Supply", "Type of supply", "Export Type", "Unmatched"),
+        ],
+        [("Taxable Value (Rs.)", "Taxable Value"), (4, "Integrated Tax"), (5, None), (6, None)])
+
+    # How often the keys of each sheet repeat and how many rows a plain join of them would have made
+    key_multiplicity_df = pd.DataFrame([
+        {'Sheet': 'b2b', **b2b_multiplicity},
+        {'Sheet': 'cdnur', **cdnur_multiplicity},
+        {'Sheet': 'cdnr', **cdnr_multiplicity},
+        {'Sheet': 'exp', **exp_multiplicity},
+    ])
+    key_multiplicity_df['Duplicate keys'] = DUPLICATE_KEYS
+
+    # The differences DataFrames for the new Excel file
+    return [
+        ('b2b_match', b2b_match),
+        ('cdnur_match', cdnur_match),
+        ('cdnr_match', cdnr_match),
+        ('exp_match', exp_match),
+        ('key_multiplicity', key_multiplicity_df),
+    ]
 
-    cdnr_match = pd.merge(
-        df3,
-        df7,
-        how='outer',
-        left_on=["GSTIN of recipient", "Note number"],
-        right_on=["GSTIN/UIN of Recipient", "Note Number"],
-        suffixes=('_cdnr', '_cdnr_govt')
-    )
-
-    selected_columns_reordered3 = [0,2,7,11,12,13,14,19,21,23,26,30,31,32,33]
-    cdnr_match = cdnr_match.iloc[:, selected_columns_reordered3]
-
-    def generate_taxable_value_remark(row):
-        if pd.isnull(row["Taxable Value (Rs.)"]):
-            return "Unmatched / Its not present in Optitax's data"
-        elif pd.isnull(row["Taxable Value"]):
-            return "Unmatched / Its not present in Govt template"
-        elif row["Taxable Value (Rs.)"] == row["Taxable Value"]:
-            return "Matched"
-        else:
-            return "Unmatched"
-
-    # Add a new column "Remark Taxable Value" using the custom function
-    cdnr_match["Remark Taxable Value"] = cdnr_match.apply(generate_taxable_value_remark, axis=1)
-
-    # Define a function to apply the conditions and generate remarks for "Remark GSTIN of recipient"
-    def generate_gstin_remark(row):
-        if pd.isnull(row["GSTIN of recipient"]):
-            return "Unmatched / Its not present in Optitax's data"
-        elif pd.isnull(row["GSTIN/UIN of Recipient"]):
-            return "Unmatched / Its not present in Govt template"
-        elif row["GSTIN of recipient"] == row["Govt cdnr.GSTIN/UIN of Recipient"]:
-            return "Matched"
-        else:
-            return "Unmatched"
-
-    # Add a new column "Remark GSTIN of recipient" using the custom function
-    cdnr_match["Remark GSTIN of recipient"] = cdnr_match.apply(generate_gstin_remark, axis=1)
-
-    # Define a function to apply the conditions and generate remarks for "Remark IGST"
-    def generate_igst_remark(row):
-        if pd.isnull(row.iloc[4]):
-            return "Unmatched / Its not present in Optitax's data"
-        elif pd.isnull(row["Integrated Tax"]):
-            return "Unmatched / Its not present in Govt template"
-        elif row.iloc[4] == row["Integrated Tax"]:
-            return "Matched"
-        else:
-            return "Unmatched"
-
-    # Add a new column "Remark IGST" using the custom function
-    cdnr_match["Remark IGST"] = cdnr_match.apply(generate_igst_remark, axis=1)
-
-    # Define a function to apply the conditions and generate remarks for "Remark IGST"
-    def generate_cgst_remark(row):
-        if pd.isnull(row.iloc[5]):
-            return "Unmatched / Its not present in Optitax's data"
-        elif pd.isnull(row["Central Tax"]):
-            return "Unmatched / Its not present in Govt template"
-        elif row.iloc[5] == row["Central Tax"]:
-            return "Matched"
-        else:
-            return "Unmatched"
-
-    # Add a new column "Remark IGST" using the custom function
-    cdnr_match["Remark CGST"] = cdnr_match.apply(generate_cgst_remark, axis=1)
-
-    # Define a function to apply the conditions and generate remarks for "Remark IGST"
-    def generate_sgst_remark(row):
-        if pd.isnull(row.iloc[6]):
-            return "Unmatched / Its not present in Optitax's data"
-        elif pd.isnull(row["State/UT Tax"]):
-            return "Unmatched / Its not present in Govt template"
-        elif row.iloc[6] == row["State/UT Tax"]:
-            return "Matched"
-        else:
-            return "Unmatched"
-
-    # Add a new column "Remark IGST" using the custom function
-    cdnr_match["Remark SGST"] = cdnr_match.apply(generate_sgst_remark, axis=1)
-
-    # Define a function to apply the conditions and generate remarks for "Remark Type of Supply"
-    def generate_type_of_supply_remark(row):
-        if pd.isnull(row["Type of supply"]):
-            return "Unmatched / Its not present in Optitax's data"
-        elif pd.isnull(row["Note Supply Type"]):
-            return "Unmatched / Its not present in Govt template"
-        elif row["Type of supply"] == row["Note Supply Type"]:
-            return "Matched"
-        else:
-            return "Unmatched"
-
-    # Add a new column "Remark Type of Supply" using the custom function
-    cdnr_match["Remark Type of Supply"] = cdnr_match.apply(generate_type_of_supply_remark, axis=1)
-
-    cdnr_match["Taxable Value (Rs.)"] = pd.to_numeric(cdnr_match["Taxable Value (Rs.)"], errors='coerce')
-    cdnr_match["Taxable Value"] = pd.to_numeric(cdnr_match["Taxable Value"], errors='coerce')
-    cdnr_match.iloc[:, 4] = pd.to_numeric(cdnr_match.iloc[:, 4], errors='coerce')
-    cdnr_match["Integrated Tax"] = pd.to_numeric(cdnr_match["Integrated Tax"], errors='coerce')
-    cdnr_match.iloc[:, 5] = pd.to_numeric(cdnr_match.iloc[:, 5], errors='coerce')
-    cdnr_match["Central Tax"] = pd.to_numeric(cdnr_match["Central Tax"], errors='coerce')
-    cdnr_match.iloc[:, 6] = pd.to_numeric(cdnr_match.iloc[:, 6], errors='coerce')
-    cdnr_match["State/UT Tax"] = pd.to_numeric(cdnr_match["State/UT Tax"], errors='coerce')
-
-    # Define a function to calculate the "Amount difference"
-    def calculate_amount_difference(row):
-        taxable_value_diff = row["Taxable Value (Rs.)"] - row["Taxable Value"]
-        igst_diff = row.iloc[4] - row["Integrated Tax"]
-        cgst_diff = row.iloc[5] - row["Central Tax"]
-        sgst_diff = row.iloc[6] - row["State/UT Tax"]
-        
-        # Check for NaN values before rounding
-        taxable_value_diff = 0 if pd.isna(taxable_value_diff) else taxable_value_diff
-        igst_diff = 0 if pd.isna(igst_diff) else igst_diff
-        cgst_diff = 0 if pd.isna(cgst_diff) else cgst_diff
-        sgst_diff = 0 if pd.isna(sgst_diff) else sgst_diff
-        
-        # Round the sum of differences to the nearest integer
-        amount_difference = round(taxable_value_diff + igst_diff + cgst_diff + sgst_diff)
-        return amount_difference
-
-    # Add a new column "Amount difference" using the custom function
-    cdnr_match["Amount difference"] = cdnr_match.apply(calculate_amount_difference, axis=1)
-
-    df8 = df8.iloc[2:]
-    # Step 3: Set the 6th row as the header.
-    header_row = df8.iloc[0]
-    df8 = df8[1:]
-    df8.columns = header_row
+# Sheets of the step 2 workbook read by the summary, in the order summary_sheets takes them
+SUMMARY_INPUT_SHEETS = ["b2b,sez,de", "b2cl", "b2cs", "cdnr", "at", "atadj", "exp", "cdnur", "cdnur_b2cs", "exemp",
+                        "b2ba", "b2cla", "b2cla", "ata", "atadja", "expa", "cdnur", "docs", "HSN"]
 
-    # Convert "Invoice Number" to int64 data type
-    df8["Invoice Number"] = pd.to_numeric(df8["Invoice Number"], errors='coerce').astype(pd.Int64Dtype())
+def summary_excel_files(s2_file_path, s3_file_path, output_path=None):
+    if output_path is None:
+        output_path = s2_file_path
+    # The s3 workbook is not used by the summary, only the s2 sheets are read
+    write_sheets(output_path, summary_sheets(*read_sheets(s2_file_path, SUMMARY_INPUT_SHEETS)))
+    return output_path
 
-    # Perform the merge
-    exp_match = pd.merge(
-        df4,
-        df8,
-        how='outer',
-        left_on=["Document number"],
-        right_on=["Invoice Number"],
-        suffixes=('_exp', '_exp_govt')
-    )
-
-    selected_columns_reordered4 = [0,1,8,10,11,12,14,15,22,23]
-    exp_match = exp_match.iloc[:, selected_columns_reordered4]
-
-    def generate_taxable_value_remark(row):
-        if pd.isnull(row["Taxable Value (Rs.)"]):
-            return "Unmatched / Its not present in Optitax's data"
-        elif pd.isnull(row["Taxable Value"]):
-            return "Unmatched / Its not present in Govt template"
-        elif row["Taxable Value (Rs.)"] == row["Taxable Value"]:
-            return "Matched"
-        else:
-            return "Unmatched"
-
-    # Add a new column "Remark Taxable Value" using the custom function
-    exp_match["Remark Taxable Value"] = exp_match.apply(generate_taxable_value_remark, axis=1)
-
-    # Define a function to apply the conditions and generate remarks for "Remark IGST"
-    def generate_igst_remark(row):
-        if pd.isnull(row.iloc[4]):
-            return "Unmatched / Its not present in Optitax's data"
-        elif pd.isnull(row["Integrated Tax"]):
-            return "Unmatched / Its not present in Govt template"
-        elif row.iloc[4] == row["Integrated Tax"]:
-            return "Matched"
-        else:
-            return "Unmatched"
-
-    # Add a new column "Remark IGST" using the custom function
-    exp_match["Remark IGST"] = exp_match.apply(generate_igst_remark, axis=1)
-
-    # Define a function to apply the conditions and generate remarks for "Remark Type of Supply"
-    def generate_type_of_supply_remark(row):
-        if pd.isnull(row["Type of supply"]):
-            return "Unmatched / Its not present in Optitax's data"
-        elif pd.isnull(row["Export Type"]):
-            return "Unmatched / Its not present in Govt template"
-        elif row["Type of supply"] == row["Export Type"]:
-            return "Matched"
-        else:
-            return "Unmatched"
-
-    # Add a new column "Remark Type of Supply" using the custom function
-    exp_match["Remark Type of Supply"] = exp_match.apply(generate_type_of_supply_remark, axis=1)
-
-    exp_match["Taxable Value (Rs.)"] = pd.to_numeric(exp_match["Taxable Value (Rs.)"], errors='coerce')
-    exp_match["Taxable Value"] = pd.to_numeric(exp_match["Taxable Value"], errors='coerce')
-    exp_match.iloc[:, 4] = pd.to_numeric(exp_match.iloc[:, 4], errors='coerce')
-    exp_match["Integrated Tax"] = pd.to_numeric(exp_match["Integrated Tax"], errors='coerce')
-    exp_match.iloc[:, 5] = pd.to_numeric(exp_match.iloc[:, 5], errors='coerce')
-    # cdnur_match["Central Tax"] = pd.to_numeric(cdnur_match["Central Tax"], errors='coerce')
-    exp_match.iloc[:, 6] = pd.to_numeric(exp_match.iloc[:, 6], errors='coerce')
-    # cdnur_match["State/UT Tax"] = pd.to_numeric(cdnur_match["State/UT Tax"], errors='coerce')
-
-    # Define a function to calculate the "Amount difference"
-    def calculate_amount_difference(row):
-        taxable_value_diff = row["Taxable Value (Rs.)"] - row["Taxable Value"]
-        igst_diff = row.iloc[4] - row["Integrated Tax"]
-        cgst_diff = row.iloc[5]
-        sgst_diff = row.iloc[6]
-        
-        # Check for NaN values before rounding
-        taxable_value_diff = 0 if pd.isna(taxable_value_diff) else taxable_value_diff
-        igst_diff = 0 if pd.isna(igst_diff) else igst_diff
-        cgst_diff = 0 if pd.isna(cgst_diff) else cgst_diff
-        sgst_diff = 0 if pd.isna(sgst_diff) else sgst_diff
-        
-        # Round the sum of differences to the nearest integer
-        amount_difference = round(taxable_value_diff + igst_diff + cgst_diff + sgst_diff)
-        return amount_difference
-
-    # Add a new column "Amount difference" using the custom function
-    exp_match["Amount difference"] = exp_match.apply(calculate_amount_difference, axis=1)
-
-    # Write the differences DataFrame to a new Excel file
-    with pd.ExcelWriter(company_file_path, engine='openpyxl') as writer:
-        b2b_match.to_excel(writer, sheet_name='b2b_match', index=False)
-        cdnur_match.to_excel(writer, sheet_name='cdnur_match', index=False)
-        cdnr_match.to_excel(writer, sheet_name='cdnr_match', index=False)
-        exp_match.to_excel(writer, sheet_name='exp_match', index=False)
-
-
-    return company_file_path
-
-def summary_excel_files(s2_file_path, s3_file_path):
-    s2 = pd.ExcelFile(s2_file_path)
-    s3 = pd.ExcelFile(s3_file_path)
-    
-    df1 = pd.read_excel(s2, sheet_name="b2b,sez,de")
-    df2 = pd.read_excel(s2, sheet_name="b2cl")
-    df3 = pd.read_excel(s2, sheet_name="b2cs")
-    df4 = pd.read_excel(s2, sheet_name="cdnr")
-    df5 = pd.read_excel(s2, sheet_name="at")
-    df6 = pd.read_excel(s2, sheet_name="atadj")
-    df7 = pd.read_excel(s2, sheet_name="exp")
-    df8 = pd.read_excel(s2, sheet_name="cdnur")
-    df9 = pd.read_excel(s2, sheet_name="cdnur_b2cs")
-    df10 = pd.read_excel(s2, sheet_name="exemp")
-    df11 = pd.read_excel(s2, sheet_name="b2ba")
-    df12 = pd.read_excel(s2, sheet_name="b2cla")
-    df13 = pd.read_excel(s2, sheet_name="b2cla")
-    df14 = pd.read_excel(s2, sheet_name="ata")
-    df15 = pd.read_excel(s2, sheet_name="atadja")
-    df16 = pd.read_excel(s2, sheet_name="expa")
-    df17 = pd.read_excel(s2, sheet_name="cdnur")
-    df18 = pd.read_excel(s2, sheet_name="docs")
-    df19 = pd.read_excel(s2, sheet_name="HSN")
+def summary_sheets(df1, df2, df3, df4, df5, df6, df7, df8, df9, df10, df11, df12, df13, df14, df15, df16, df17, df18, df19):
 
     df1 = df1.loc[(df1['Type of supply'] != "SEZ supplies with payment") & (df1['Type of supply'] != "SEZ supplies without payment")]
 
@@ -3508,39 +2747,369 @@ def summary_excel_files(s2_file_path, s3_file_path):
     # Reorder the columns in the DataFrame
     atadj = atadj[column_order_atadj]
 
-    with pd.ExcelWriter(s2_file_path, engine='openpyxl') as writer:
-        b2b.to_excel(writer, sheet_name='GSTR-1 summary', index=False)
-        b2cl.to_excel(writer, sheet_name='b2cl', index=False)
-        b2cs.to_excel(writer, sheet_name='b2cs', index=False)
-        cdnr.to_excel(writer, sheet_name='cdnr', index=False)
-        at.to_excel(writer, sheet_name='at', index=False)
-        atadj.to_excel(writer, sheet_name='atadj', index=False)
-        # b2cl.to_excel(writer, sheet_name='GSTR-1 E-Invoice summary', index=False)
+    return [
+        ('GSTR-1 summary', b2b),
+        ('b2cl', b2cl),
+        ('b2cs', b2cs),
+        ('cdnr', cdnr),
+        ('at', at),
+        ('atadj', atadj),
+        # ('GSTR-1 E-Invoice summary', b2cl),
+    ]
 
+# -------------------------------------------* All stages pipeline *----------------------------------------------------
 
-    return s2_file_path
+# Cell value as the next stage reads it from the workbook written by write_sheets (see pandas' openpyxl reader:
+# blanks are "", whole numbers come back as int and dates as datetime)
+def read_back_value(value):
+    value = cell_value(value)
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return int(value) if int(value) == value else float(value)
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return datetime(value.year, value.month, value.day)
+    if isinstance(value, str) and value.startswith('='):
+        return ""
+    return value
+
+# The named sheets as the next stage would read them back from the written workbook, without writing it: the cells
+# go through the same parser pd.read_excel uses, so headers, blanks and dtypes come out the same
+def read_back_sheets(sheets, sheet_names):
+    sheets = dict(sheets)
+    result = []
+    for sheet_name in sheet_names:
+        df = sheets[sheet_name]
+        data = []
+        last_row_with_data = -1
+        for row_number, row in enumerate([tuple(df.columns)] + list(df.itertuples(index=False, name=None))):
+            values = [read_back_value(value) for value in row]
+            while values and values[-1] == "":
+                values.pop()
+            if values:
+                last_row_with_data = row_number
+            data.append(values)
+        data = data[:last_row_with_data + 1]
+        if not data:
+            result.append(pd.DataFrame())
+            continue
+        width = max(len(values) for values in data)
+        data = [values + [""] * (width - len(values)) for values in data]
+        result.append(TextParser(data, header=0, skip_blank_lines=False).read())
+    return result
+
+# Run step 1, step 2, the comparison with the government workbook and the summary one after another on in-memory
+# DataFrames, and write the four workbooks (and their columnar bundles) only at the end, zipped into output_path
+def run_all_stages(outward_file_path, government_file_path, output_path=None, workers=STEP1_WORKERS):
+    if output_path is None:
+        output_path = os.path.splitext(outward_file_path)[0] + '_all_stages.zip'
+    step1 = step1_sheets(outward_file_path, workers)
+    step2 = step2_sheets(*read_back_sheets(step1, STEP2_INPUT_SHEETS))
+    step3 = compare_sheets(*read_back_sheets(step2, COMPARE_COMPANY_SHEETS), *read_sheets(government_file_path, COMPARE_GOVERNMENT_SHEETS))
+    summary = summary_sheets(*read_back_sheets(step2, SUMMARY_INPUT_SHEETS))
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_path))) as folder:
+        with zipfile.ZipFile(output_path + '.tmp', 'w', zipfile.ZIP_DEFLATED) as archive:
+            for stage, sheets in [('step1', step1), ('step2', step2), ('step3', step3), ('Summary', summary)]:
+                write_sheets(os.path.join(folder, f"{stage}.xlsx"), sheets)
+            for file_name in sorted(os.listdir(folder)):
+                archive.write(os.path.join(folder, file_name), file_name)
+    os.replace(output_path + '.tmp', output_path)
+    return output_path
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+# -------------------------------------------* Result cache *----------------------------------------------------
+
+# Processed workbooks are cached on disk under a key made from the uploaded bytes, the step and the code version
+CACHE_FOLDER = os.path.join(UPLOAD_FOLDER, 'cache')
+CACHE_MAX_BYTES = int(os.environ.get('GST_CACHE_MAX_BYTES', 1024 ** 3))
+
+if not os.path.exists(CACHE_FOLDER):
+    os.makedirs(CACHE_FOLDER)
+
+# SHA-256 of a file, read in chunks so large workbooks are not loaded into memory
+def file_digest(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# Settings that change what the steps write (or, for the intermediate format, which copies are saved with it)
+OUTPUT_SETTINGS = {
+    'GST_INTERMEDIATE_FORMAT': INTERMEDIATE_FORMAT,
+    'GST_B2CL_LIMIT': B2CL_LIMIT,
+    'GST_DOCUMENT_SERIES_GAP': DOCUMENT_SERIES_GAP,
+    'GST_AMOUNT_TOLERANCE': AMOUNT_TOLERANCE,
+    'GST_AMOUNT_RELATIVE_TOLERANCE': AMOUNT_RELATIVE_TOLERANCE,
+    'GST_AMOUNT_ROUNDING': AMOUNT_ROUNDING,
+    'GST_FUZZY_MATCH_DISTANCE': FUZZY_MATCH_DISTANCE,
+    'GST_DUPLICATE_KEYS': DUPLICATE_KEYS,
+}
+
+# Any change to the code, to the reference tables or to the output settings gives new cache keys, so stale results
+# are never served
+CODE_VERSION = hashlib.sha256((''.join(file_digest(os.path.join(os.path.dirname(os.path.abspath(__file__)), name))
+                                       for name in ('app.py', 'unusual_hsn.csv'))
+                               + json.dumps(OUTPUT_SETTINGS, sort_keys=True)).encode()).hexdigest()
+
+def cache_key(step, file_digests):
+    return hashlib.sha256('\n'.join([CODE_VERSION, step] + file_digests).encode()).hexdigest()
+
+# The cached file keeps the extension of the result (.xlsx, or .zip for all the stages) so it is served as what it is
+def cache_path(key, extension):
+    return os.path.join(CACHE_FOLDER, key + extension)
+
+# Path of the cached result, marked as just used (its modification time orders the LRU eviction)
+def cached_result(key, extension):
+    result_path = cache_path(key, extension)
+    try:
+        os.utime(result_path)
+    except FileNotFoundError:
+        return None
+    for format in INTERMEDIATE_FORMATS:
+        if os.path.exists(intermediate_path(result_path, format)):
+            os.utime(intermediate_path(result_path, format))
+    return result_path
+
+# Copy a result (and its columnar bundles) into the cache and evict the least recently used files until the cache
+# fits in CACHE_MAX_BYTES
+def cache_result(key, result_path):
+    if CACHE_MAX_BYTES <= 0:
+        return
+    cached_path = cache_path(key, os.path.splitext(result_path)[1])
+    for format in INTERMEDIATE_FORMATS:
+        if os.path.exists(intermediate_path(result_path, format)):
+            shutil.copyfile(intermediate_path(result_path, format), intermediate_path(cached_path, format) + '.tmp')
+            os.replace(intermediate_path(cached_path, format) + '.tmp', intermediate_path(cached_path, format))
+    shutil.copyfile(result_path, cached_path + '.tmp')
+    os.replace(cached_path + '.tmp', cached_path)
+
+    entries = []
+    for name in os.listdir(CACHE_FOLDER):
+        if not name.endswith('.tmp'):
+            try:
+                stat = os.stat(os.path.join(CACHE_FOLDER, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, os.path.join(CACHE_FOLDER, name)))
+    total_size = sum(size for mtime, size, path in entries)
+    for mtime, size, path in sorted(entries):
+        if total_size <= CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total_size -= size
+
+# -------------------------------------------* Streaming uploads *----------------------------------------------------
+
+# File the multipart parser writes an uploaded file into: a temporary file in the jobs folder, hashed as it is written
+class HashingFile:
+    def __init__(self, folder):
+        self.file = tempfile.NamedTemporaryFile(dir=folder, prefix='upload-', suffix='.tmp', delete=False)
+        self.path = self.file.name
+        self.digest = hashlib.sha256()
+
+    def write(self, data):
+        self.digest.update(data)
+        return self.file.write(data)
+
+    def hexdigest(self):
+        return self.digest.hexdigest()
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+# Request that streams uploaded files straight to disk instead of buffering them before file.save() copies them
+class UploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        upload = HashingFile(JOB_FOLDER)
+        self.__dict__.setdefault('upload_paths', []).append(upload.path)
+        return upload
+
+app.request_class = UploadRequest
+
+# Remove the temporary files of uploads that were not moved into a job
+@app.teardown_request
+def remove_uploads(exception=None):
+    for upload_path in getattr(request, 'upload_paths', []):
+        if os.path.exists(upload_path):
+            os.remove(upload_path)
+
+@app.errorhandler(413)
+def upload_too_large(error):
+    return jsonify(error=f"File upload failed, files larger than {app.config['MAX_CONTENT_LENGTH'] // 1024 ** 2} MB are not accepted."), 413
+
+# Move an uploaded file to file_path and return its SHA-256
+def save_upload(file, file_path):
+    upload = file.stream
+    if isinstance(upload, HashingFile):
+        upload.close()
+        os.replace(upload.path, file_path)
+        return upload.hexdigest()
+    file.save(file_path)
+    return file_digest(file_path)
+
+# -------------------------------------------* Background jobs *----------------------------------------------------
+
+# The processing functions a job can run, by step name
+JOB_STEPS = {
+    'step1': process_step1,
+    'step2': process_step2,
+    'step3': compare_excel_files,
+    'summary': summary_excel_files,
+    'all': run_all_stages,
+}
+
+# Processing runs in a pool of worker processes so the web worker only saves the upload and hands out a job id
+JOB_WORKERS = int(os.environ.get('GST_JOB_WORKERS', 2))
+JOB_POOL = ProcessPoolExecutor(max_workers=JOB_WORKERS)
+JOB_POOL_LOCK = threading.Lock()
+
+def job_folder(job_id):
+    return os.path.join(JOB_FOLDER, job_id)
+
+# Remove job folders, and upload files left behind, that were last updated more than JOB_TTL seconds ago
+def remove_expired_jobs():
+    expiry = time.time() - JOB_TTL
+    for name in os.listdir(JOB_FOLDER):
+        path = os.path.join(JOB_FOLDER, name)
+        status_path = os.path.join(path, 'status.json')
+        try:
+            updated = os.path.getmtime(status_path if os.path.exists(status_path) else path)
+        except FileNotFoundError:
+            continue
+        if updated >= expiry:
+            continue
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+# Job status is kept in a status.json file in the job folder, so any web worker can answer for any job
+def write_job_status(job_id, **status):
+    status_path = os.path.join(job_folder(job_id), 'status.json')
+    with open(status_path + '.tmp', 'w') as status_file:
+        json.dump(status, status_file)
+    os.replace(status_path + '.tmp', status_path)
+
+def read_job_status(job_id):
+    status_path = os.path.join(job_folder(job_id), 'status.json')
+    if not os.path.exists(status_path):
+        return None
+    with open(status_path) as status_file:
+        return json.load(status_file)
+
+# Runs in a worker process: process the saved files, cache the result and record where it is
+def run_job(job_id, step, file_paths, download_name, key):
+    write_job_status(job_id, status='running', download_name=download_name)
+    try:
+        result_path = JOB_STEPS[step](*file_paths, output_path=os.path.join(job_folder(job_id), 'output', 'result' + os.path.splitext(download_name)[1]))
+        cache_result(key, result_path)
+    except Exception as e:
+        write_job_status(job_id, status='failed', download_name=download_name, error=str(e))
+        return
+    write_job_status(job_id, status='finished', download_name=download_name, result_path=result_path)
+
+# Called in the web process when a job's future is done. A worker process that died (killed for using too much memory,
+# crashed) never wrote the status of its job, so the job is marked failed here instead of staying running.
+def job_done(job_id, download_name, future):
+    if future.cancelled() or future.exception() is None:
+        return
+    write_job_status(job_id, status='failed', download_name=download_name,
+                     error='The processing stopped unexpectedly, please upload the file again.')
+
+# Queue a job on the pool. A pool whose worker died takes no more jobs, so it is replaced by a new one.
+def submit_to_pool(job_id, step, file_paths, download_name, key):
+    global JOB_POOL
+    with JOB_POOL_LOCK:
+        try:
+            future = JOB_POOL.submit(run_job, job_id, step, file_paths, download_name, key)
+        except BrokenProcessPool:
+            JOB_POOL = ProcessPoolExecutor(max_workers=JOB_WORKERS)
+            future = JOB_POOL.submit(run_job, job_id, step, file_paths, download_name, key)
+    future.add_done_callback(lambda future: job_done(job_id, download_name, future))
+
+# Save the uploaded files in a new job folder and queue the step on the pool. When the same files were already
+# processed by the same step and code, the job is finished straight away with the cached result.
+def submit_job(step, files, download_name):
+    remove_expired_jobs()
+    job_id = uuid.uuid4().hex
+    os.makedirs(os.path.join(job_folder(job_id), 'input'))
+    os.makedirs(os.path.join(job_folder(job_id), 'output'))
+    file_paths = []
+    file_digests = []
+    for file in files:
+        # Numbered so two uploads with the same name do not overwrite each other
+        file_path = os.path.join(job_folder(job_id), 'input', f"{len(file_paths) + 1}_{secure_filename(file.filename)}")
+        file_digests.append(save_upload(file, file_path))
+        file_paths.append(file_path)
+
+    key = cache_key(step, file_digests)
+    result_path = cached_result(key, os.path.splitext(download_name)[1])
+    if result_path is not None:
+        for file_path in file_paths:
+            os.remove(file_path)
+        write_job_status(job_id, status='finished', download_name=download_name, result_path=result_path, cached=True)
+    else:
+        write_job_status(job_id, status='queued', download_name=download_name)
+        submit_to_pool(job_id, step, file_paths, download_name, key)
+    return jsonify(job_id=job_id, status_url=url_for('job_status', job_id=job_id),
+                   result_url=url_for('job_result', job_id=job_id)), 202
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    status = read_job_status(secure_filename(job_id))
+    if status is None:
+        return jsonify(error='Job not found.'), 404
+    status.pop('result_path', None)
+    status['job_id'] = job_id
+    return jsonify(status)
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    status = read_job_status(secure_filename(job_id))
+    if status is None:
+        return jsonify(error='Job not found.'), 404
+    if status['status'] != 'finished':
+        return jsonify(job_id=job_id, status=status['status'], error=status.get('error')), 409
+    # ?format=parquet or ?format=arrow downloads the columnar bundle of the result, to upload to the next stage
+    result_path = status['result_path']
+    download_name = status['download_name']
+    mimetype = 'application/zip' if result_path.endswith('.zip') else XLSX_MIMETYPE
+    format = request.args.get('format')
+    if format:
+        if format not in INTERMEDIATE_FORMATS:
+            return jsonify(error=f"Format should be one of {', '.join(INTERMEDIATE_FORMATS)}."), 400
+        result_path = intermediate_path(result_path, format)
+        download_name = os.path.splitext(download_name)[0] + INTERMEDIATE_FORMATS[format]
+        mimetype = 'application/zip'
+        if not os.path.exists(result_path) and os.path.exists(status['result_path']):
+            return jsonify(job_id=job_id, error=f"No {format} copy was saved for this job."), 404
+    if not os.path.exists(result_path):
+        return jsonify(job_id=job_id, error='The result is no longer available, please upload the file again.'), 410
+    return send_file(os.path.abspath(result_path), as_attachment=True, download_name=download_name, mimetype=mimetype)
+
 @app.route('/upload', methods=['POST'])
 def upload():
     file = request.files['file']
     step = request.form['step']
-    if file:
-        original_filename, file_extension = os.path.splitext(file.filename)
+    if file and step in ('step1', 'step2'):
+        original_filename = upload_stem(file.filename)
         processed_filename = f"{original_filename}_{step}.xlsx"
-        # Save the uploaded file to the 'uploads' folder
-        filename = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
-        file.save(filename)
-        if step == 'step1':
-            process_step1(filename)
-        elif step == 'step2':
-            process_step2(filename)
-            
-        # Send the processed file for download
-        return send_file(filename, as_attachment=True, download_name=processed_filename, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        return submit_job(step, [file], processed_filename)
 
     return 'File upload failed.'
 
@@ -3550,23 +3119,9 @@ def upload1():
     government_file = request.files['governmentFile']
 
     if company_file and government_file:
-        original_filename, file_extension = os.path.splitext(company_file.filename)
+        original_filename = upload_stem(company_file.filename)
         processed_filename = f"{original_filename}_step3.xlsx"
-        # Save the uploaded files to the 'uploads' folder
-        company_filename = secure_filename(company_file.filename)
-        government_filename = secure_filename(government_file.filename)
-
-        company_file_path = os.path.join(app.config['UPLOAD_FOLDER'], company_filename)
-        government_file_path = os.path.join(app.config['UPLOAD_FOLDER'], government_filename)
-
-        company_file.save(company_file_path)
-        government_file.save(government_file_path)
-
-
-        differences_file_path = compare_excel_files(company_file_path, government_file_path)
-
-        # Send the differences file for download
-        return send_file(differences_file_path, as_attachment=True, download_name=processed_filename, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        return submit_job('step3', [company_file, government_file], processed_filename)
 
     return 'File upload failed.'
 
@@ -3576,25 +3131,34 @@ def upload2():
     s3_file = request.files['s3File']
 
     if s2_file and s3_file:
-        original_filename, file_extension = os.path.splitext(s2_file.filename)
+        original_filename = upload_stem(s2_file.filename)
         processed_filename = f"{original_filename}_Summary.xlsx"
-        # Save the uploaded files to the 'uploads' folder
-        s2_filename = secure_filename(s2_file.filename)
-        s3_filename = secure_filename(s3_file.filename)
-
-        s2_file_path = os.path.join(app.config['UPLOAD_FOLDER'], s2_filename)
-        s3_file_path = os.path.join(app.config['UPLOAD_FOLDER'], s3_filename)
-
-        s2_file.save(s2_file_path)
-        s3_file.save(s3_file_path)
+        return submit_job('summary', [s2_file, s3_file], processed_filename)
 
+    return 'File upload failed.'
 
-        differences_file_path = summary_excel_files(s2_file_path, s3_file_path)
+@app.route('/pipeline', methods=['POST'])
+def pipeline():
+    outward_file = request.files['outwardFile']
+    government_file = request.files['governmentFile']
 
-        # Send the differences file for download
-        return send_file(differences_file_path, as_attachment=True, download_name=processed_filename, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    if outward_file and government_file:
+        original_filename = upload_stem(outward_file.filename)
+        processed_filename = f"{original_filename}_all_stages.zip"
+        return submit_job('all', [outward_file, government_file], processed_filename)
 
     return 'File upload failed.'
 
 if __name__ == '__main__':
-    app.run(host = '0.0.0.0', port = 3750)
+    parser = argparse.ArgumentParser(description="Starts the web app, or runs every stage on the given workbooks")
+    parser.add_argument('outward_file', nargs='?', help="outward supply workbook (the step 1 input)")
+    parser.add_argument('government_file', nargs='?', help="government workbook for the comparison")
+    parser.add_argument('-o', '--output', help="zip file for the four processed workbooks (default: <outward file>_all_stages.zip)")
+    args = parser.parse_args()
+
+    if args.outward_file:
+        if not args.government_file:
+            parser.error("the government workbook is needed to run every stage")
+        print(run_all_stages(args.outward_file, args.government_file, args.output))
+    else:
+        app.run(host = '0.0.0.0', port = 3750)
@@ -0,0 +1,52 @@
+// Submit the forms in the background and poll the job until its result can be downloaded
+const POLL_INTERVAL = 2000;
+
+function showStatus(form, message) {
+    let status = form.querySelector('.job-status');
+    if (!status) {
+        status = document.createElement('p');
+        status.className = 'job-status';
+        form.appendChild(status);
+    }
+    status.textContent = message;
+}
+
+function pollJob(form, button, job) {
+    fetch(job.status_url)
+        .then(response => response.json())
+        .then(status => {
+            if (status.status === 'finished') {
+                showStatus(form, 'Done, downloading the processed file.');
+                button.disabled = false;
+                window.location = job.result_url;
+            } else if (status.status === 'failed') {
+                showStatus(form, 'Processing failed: ' + status.error);
+                button.disabled = false;
+            } else {
+                showStatus(form, status.status === 'queued' ? 'Waiting for a free worker...' : 'Processing...');
+                setTimeout(() => pollJob(form, button, job), POLL_INTERVAL);
+            }
+        })
+        .catch(() => setTimeout(() => pollJob(form, button, job), POLL_INTERVAL));
+}
+
+document.querySelectorAll('form').forEach(form => {
+    form.addEventListener('submit', event => {
+        event.preventDefault();
+        const button = form.querySelector('button[type="submit"]');
+        button.disabled = true;
+        showStatus(form, 'Uploading...');
+        fetch(form.action, { method: 'POST', body: new FormData(form) })
+            .then(response => {
+                if (response.status !== 202) {
+                    throw new Error('File upload failed.');
+                }
+                return response.json();
+            })
+            .then(job => pollJob(form, button, job))
+            .catch(error => {
+                showStatus(form, error.message);
+                button.disabled = false;
+            });
+    });
+});
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+import app
+
+# Rows of the docs table as (label, start, end, count, cancelled, missing serials)
+def series(numbers):
+    return [tuple(row) for row in app.document_series(pd.Series(numbers, dtype=object)).itertuples(index=False)]
+
+def test_serial_before_a_year_suffix():
+    assert series(['CN/13/2023-24', 'CN/15/2023-24', 'CN/17/2023-24', '133-GST/22-23', 'INV/23-24/0012',
+                   'INV/23-24/0013']) == [
+        ('#-GST/22-23', 133, 133, 1, 0, ''),
+        ('CN/#/2023-24', 13, 17, 3, 2, '14, 16'),
+        ('INV/23-24/#', 12, 13, 2, 0, ''),
+    ]
+
+def test_plain_numbers_are_numbered_by_width():
+    assert series([222334706, 222334707, 222334709, 222334712, 2223011902, '0001', '0003']) == [
+        ('000#', 1, 3, 2, 1, '2'),
+        ('2223347#', 222334706, 222334712, 4, 3, '222334708, 222334710-222334711'),
+        ('2223011902', 2223011902, 2223011902, 1, 0, ''),
+    ]
+
+def test_wide_gaps_split_a_numbering(monkeypatch):
+    monkeypatch.setattr(app, 'DOCUMENT_SERIES_GAP', 100)
+    assert series([5000026, 5000027, 5000200, 5000302]) == [
+        ('500002#', 5000026, 5000027, 2, 0, ''),
+        ('5000200', 5000200, 5000200, 1, 0, ''),
+        ('5000302', 5000302, 5000302, 1, 0, ''),
+    ]
+    monkeypatch.setattr(app, 'DOCUMENT_SERIES_GAP', 101)
+    assert series([5000200, 5000302]) == [('5000#', 5000200, 5000302, 2, 101, '5000201-5000301')]
+
+def test_mixed_column_of_text_and_whole_floats():
+    assert series(['A1', 'A2', 5000026.0, 5000027.0, np.nan, None, 'ABC', ' A4 ']) == [
+        ('500002#', 5000026, 5000027, 2, 0, ''),
+        ('A#', 1, 4, 3, 1, '3'),
+    ]
+
+def test_repeated_numbers_count_once():
+    assert series(['S/1/2023-24', 'S/1/2023-24', 'S/2/2023-24']) == [('S/#/2023-24', 1, 2, 2, 0, '')]
+
+def test_no_numbers():
+    assert series([]) == []
+    assert series([np.nan, 'ABC']) == []
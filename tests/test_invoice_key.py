@@ -0,0 +1,23 @@
+import pandas as pd
+
+import app
+
+def test_separators_and_leading_zeros_are_ignored():
+    assert app.invoice_key('inv/0012') == app.invoice_key('INV-12') == app.invoice_key('Inv 12')
+    assert app.invoice_key('2023-24/0012') == app.invoice_key('2023_24 - 12')
+    assert app.invoice_key(1200.0) == app.invoice_key('1200')
+
+def test_digit_groups_stay_apart():
+    assert app.invoice_key('A/1/23') != app.invoice_key('A/12/3')
+    assert app.invoice_key('A/1/23') != app.invoice_key('A123')
+
+def test_blanks_have_no_key():
+    assert app.invoice_key(None) is None
+    assert app.invoice_key(float('nan')) is None
+    assert app.invoice_key(' / ') is None
+
+def test_residue_pairs_only_same_digit_groups():
+    company = pd.DataFrame({'Document number': ['A/1/23', 'inv/0012'], 'GSTIN': ['G1', 'G1']})
+    government = pd.DataFrame({'Invoice number': ['A/12/3', 'INV-12'], 'GSTIN/UIN of Recipient': ['G1', 'G1']},
+                              index=[10, 11])
+    assert app.residue_pairs(company, government, max_distance=0) == [(1, 11, app.NORMALIZED_MATCH_CONFIDENCE)]
@@ -0,0 +1,54 @@
+import pandas as pd
+import pytest
+
+import app
+
+COMPANY_KEYS = ['Document number', 'GSTIN']
+GOVERNMENT_KEYS = ['Invoice number', 'GSTIN/UIN of Recipient']
+REMARKS = [("Remark Taxable Value", "Taxable Value (Rs.)", "Taxable Value", "Amount mismatch")]
+AMOUNTS = [("Taxable Value (Rs.)", "Taxable Value")]
+
+# One invoice with a 5% and an 18% line, listed in the opposite order on the two sides
+def multi_rate_invoice():
+    company = pd.DataFrame({'Document number': ['INV1', 'INV1'], 'GSTIN': ['G1', 'G1'], 'Rate': [5, 18],
+                            'Taxable Value (Rs.)': [100, 200]})
+    government = pd.DataFrame({'Invoice number': ['INV1', 'INV1'], 'GSTIN/UIN of Recipient': ['G1', 'G1'],
+                               'Rate': [18, 5], 'Taxable Value': [200, 100]})
+    return company, government
+
+def reconcile(company, government):
+    match, multiplicity = app.reconcile(company, government, COMPANY_KEYS, GOVERNMENT_KEYS, ('_company', '_govt'),
+                                        list(range(8)), REMARKS, AMOUNTS)
+    return match, multiplicity
+
+def test_rank_pairs_reordered_lines_by_amount(monkeypatch):
+    monkeypatch.setattr(app, 'DUPLICATE_KEYS', 'rank')
+    match, multiplicity = reconcile(*multi_rate_invoice())
+    assert sorted(zip(match['Rate_company'], match['Rate_govt'])) == [(5, 5), (18, 18)]
+    assert list(match['Remark Taxable Value']) == ['Matched', 'Matched']
+    assert list(match['Amount difference']) == [0, 0]
+    assert multiplicity['Reconciled rows'] == 2
+
+def test_sum_adds_up_the_lines(monkeypatch):
+    monkeypatch.setattr(app, 'DUPLICATE_KEYS', 'sum')
+    match, multiplicity = reconcile(*multi_rate_invoice())
+    assert list(match['Taxable Value (Rs.)']) == [300]
+    assert list(match['Taxable Value']) == [300]
+    assert list(match['Remark Taxable Value']) == ['Matched']
+    assert multiplicity['Reconciled rows'] == 1
+
+def test_join_keeps_every_combination(monkeypatch):
+    monkeypatch.setattr(app, 'DUPLICATE_KEYS', 'join')
+    match, multiplicity = reconcile(*multi_rate_invoice())
+    remarks = dict(zip(zip(match['Rate_company'], match['Rate_govt']), match['Remark Taxable Value']))
+    assert remarks == {(5, 5): 'Matched', (18, 18): 'Matched', (5, 18): 'Amount mismatch', (18, 5): 'Amount mismatch'}
+    assert multiplicity['Joined rows'] == 4 and multiplicity['Paired rows'] == 2
+
+@pytest.mark.parametrize('mode', app.DUPLICATE_KEY_MODES)
+def test_unique_keys_are_joined_as_they_are(monkeypatch, mode):
+    monkeypatch.setattr(app, 'DUPLICATE_KEYS', mode)
+    company, government = multi_rate_invoice()
+    company['Document number'] = ['INV1', 'INV2']
+    government['Invoice number'] = ['INV2', 'INV1']
+    match, _ = reconcile(company, government)
+    assert list(match['Remark Taxable Value']) == ['Matched', 'Matched']